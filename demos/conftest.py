@@ -0,0 +1,45 @@
+# rates_app is a folder of modules rather than a package, so the tests of
+# both folders import from the demos folder, the way the programs are run
+
+from pathlib import Path
+from typing import Iterator
+import threading
+
+import pytest
+
+from rates_app.database import (
+    DATABASE_PATH_VARIABLE,
+    SessionLocal,
+    engine,
+    use_database,
+)
+from rates_app.migrations import migrate_database
+from rates_app.upstream_stub import StubOptions, UpstreamStubServer
+
+
+@pytest.fixture
+def rates_database(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> Iterator[Path]:
+    """a new database for the rate lookups, instead of rates_app.sqlite3"""
+
+    database_path = tmp_path / "rates_app.sqlite3"
+    # use_database sets the variable, monkeypatch puts the old value back
+    monkeypatch.setenv(DATABASE_PATH_VARIABLE, str(database_path))
+    database_engine = use_database(str(database_path))
+    migrate_database(database_engine)
+    try:
+        yield database_path
+    finally:
+        SessionLocal.configure(bind=engine)
+        database_engine.dispose()
+
+
+@pytest.fixture
+def upstream_stub() -> Iterator[UpstreamStubServer]:
+    """the upstream stub on a free port, its options can be changed"""
+
+    with UpstreamStubServer("127.0.0.1", 0, StubOptions()) as stub_server:
+        threading.Thread(target=stub_server.serve_forever, daemon=True).start()
+        yield stub_server
+        stub_server.shutdown()
@@ -0,0 +1,92 @@
+"""rates ingest benchmark
+
+Compares parse_rates_from_csv with load_rates_parallel for synthetic rates
+files of growing size, with a growing number of worker processes. The
+files have the columns of rates.csv, one row per day newest first, and a
+share of N/A cells, and are written to a temporary folder.
+
+to run the program, change into the `demos` folder, then
+run the following command:
+python -m rates_api.benchmark_ingest
+"""
+
+from pathlib import Path
+from tempfile import TemporaryDirectory
+import os
+import time
+
+import numpy as np
+
+from rates_api.rates_data import parse_rates_from_csv, rates_file_currencies
+from rates_api.rates_ingest import load_rates_parallel
+
+
+def write_synthetic_rates(
+    rates_file_path: Path, currencies: list[str], rows: int
+) -> None:
+    """rows of random rates for the currencies, newest date first"""
+
+    rng = np.random.default_rng(1)
+    # EUR is the base of the file, it has no column
+    file_currencies = currencies[1:]
+    block_rows = 50_000
+
+    with open(rates_file_path, "w", encoding="UTF-8") as rates_file:
+        rates_file.write(f"Date,{','.join(file_currencies)},\n")
+        for block_start in range(0, rows, block_rows):
+            block_size = min(block_rows, rows - block_start)
+            # the day numbers of the block, counting down to 0 at the end
+            days = rows - 1 - block_start - np.arange(block_size)
+            dates = (np.datetime64("1999-01-04") + days).astype(str)
+            rates = rng.uniform(0.5, 150.0, (block_size, len(file_currencies)))
+            rates[rng.random(rates.shape) < 0.1] = np.nan
+
+            lines = [
+                f"{rate_date},{','.join(f'{rate:.4f}' for rate in row_rates)},"
+                for rate_date, row_rates in zip(dates, rates.tolist())
+            ]
+            rates_file.write(
+                "\n".join(lines).replace("nan", "N/A") + "\n"
+            )
+
+
+def main() -> None:
+    currencies = rates_file_currencies(Path("../data/rates.csv"))
+    worker_counts = sorted({1, 2, 4, os.cpu_count() or 1})
+
+    worker_titles = [f"{workers} workers (s)" for workers in worker_counts]
+    print(
+        f"{'rows':>9} {'MB':>7} {'csv (s)':>9} "
+        + " ".join(f"{title:>14}" for title in worker_titles)
+    )
+
+    with TemporaryDirectory() as temp_folder:
+        for rows in [10_000, 100_000, 500_000]:
+            rates_file_path = Path(temp_folder) / f"rates_{rows}.csv"
+            write_synthetic_rates(rates_file_path, currencies, rows)
+
+            start = time.perf_counter()
+            expected = parse_rates_from_csv(rates_file_path)
+            csv_seconds = time.perf_counter() - start
+
+            parallel_seconds: list[float] = []
+            for workers in worker_counts:
+                start = time.perf_counter()
+                rates = load_rates_parallel(rates_file_path, workers=workers)
+                parallel_seconds.append(time.perf_counter() - start)
+
+                if rates.dates != expected.dates or not np.array_equal(
+                    rates.rates, expected.rates, equal_nan=True
+                ):
+                    raise RuntimeError(f"{workers} workers loaded other rates")
+
+            print(
+                f"{rows:>9} "
+                f"{rates_file_path.stat().st_size / 1e6:>7.1f} "
+                f"{csv_seconds:>9.3f} "
+                + " ".join(f"{seconds:>14.3f}" for seconds in parallel_seconds)
+            )
+
+
+if __name__ == "__main__":
+    main()
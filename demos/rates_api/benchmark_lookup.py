@@ -0,0 +1,81 @@
+"""rates lookup micro-benchmark
+
+Compares the per-request cost of finding a date's rates with a linear scan
+over the history against the date-keyed RatesIndex, for growing history
+sizes. The histories are synthetic so the sizes can go beyond rates.csv.
+
+to run the program, change into the `demos` folder, then
+run the following command:
+python -m rates_api.benchmark_lookup
+"""
+
+from datetime import date, timedelta
+from typing import Any
+import random
+import timeit
+
+from rates_api.rates_data import RatesHistory
+from rates_api.rates_index import RatesIndex
+
+
+def make_history(size: int) -> RatesHistory:
+    start_date = date(1999, 1, 4)
+    return [
+        {"Date": str(start_date + timedelta(days=day)), "EUR": 1.0}
+        for day in range(size)
+    ]
+
+
+def scan_lookup(rates: RatesHistory, rate_date: str) -> dict[str, Any] | None:
+    for rate in rates:
+        if rate["Date"] == rate_date:
+            return rate
+    return None
+
+
+def index_lookup(
+    rates: RatesHistory, rates_index: RatesIndex, rate_date: str
+) -> dict[str, Any] | None:
+    position = rates_index.find(rate_date)
+    return None if position is None else rates[position]
+
+
+def main() -> None:
+    lookups = 1000
+    print(
+        f"{'history size':>12} {'scan (us)':>12} {'index (us)':>12} "
+        f"{'miss scan (us)':>15} {'miss index (us)':>16}"
+    )
+
+    for size in [1_000, 5_700, 10_000, 50_000, 100_000]:
+        rates = make_history(size)
+        rates_index = RatesIndex([rate["Date"] for rate in rates])
+        hit_dates = [rate["Date"] for rate in random.choices(rates, k=lookups)]
+        miss_date = "1900-01-01"
+
+        scan_time = timeit.timeit(
+            lambda: [scan_lookup(rates, d) for d in hit_dates], number=1
+        )
+        index_time = timeit.timeit(
+            lambda: [index_lookup(rates, rates_index, d) for d in hit_dates],
+            number=1,
+        )
+        miss_scan_time = timeit.timeit(
+            lambda: scan_lookup(rates, miss_date), number=lookups
+        )
+        miss_index_time = timeit.timeit(
+            lambda: index_lookup(rates, rates_index, miss_date),
+            number=lookups,
+        )
+
+        print(
+            f"{size:>12,} "
+            f"{scan_time / lookups * 1e6:>12.2f} "
+            f"{index_time / lookups * 1e6:>12.2f} "
+            f"{miss_scan_time / lookups * 1e6:>15.2f} "
+            f"{miss_index_time / lookups * 1e6:>16.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
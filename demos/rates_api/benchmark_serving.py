@@ -0,0 +1,132 @@
+"""rates api serving benchmark
+
+Compares the requests per second of the Flask development server with the
+prefork server, for the same mix of rates_by_date requests. Each server is
+started and stopped with rates_api.api_server. The clients run as threads
+spread over a few processes, each thread with its own keep-alive session.
+
+On a host with a single CPU the prefork server is not faster: one run
+answered 284 requests/s with the development server and 223 requests/s with
+4 prefork workers. The workers and the 16 client threads share the one CPU,
+so forking adds process switches without adding parallelism. The prefork
+server gains from more CPUs, run the benchmark on the serving hardware.
+
+to run the program, change into the `demos` folder, then
+run the following command:
+python -m rates_api.benchmark_serving
+"""
+
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable
+import random
+import socket
+import time
+
+import requests
+
+from rates_api.api_server import api_server
+from rates_api.prefork_server import start_rates_api_prefork
+from rates_api.rates_app import start_rates_api
+from rates_api.rates_data import load_rates_from_history
+
+base_url = "http://127.0.0.1:8080"
+
+
+def run_client(urls: list[str], deadline: float) -> tuple[int, int]:
+    """requests and errors until the deadline"""
+
+    request_count = 0
+    errors = 0
+    with requests.Session() as session:
+        while time.monotonic() < deadline:
+            try:
+                resp = session.get(random.choice(urls), timeout=10)
+                errors += resp.status_code != 200
+            except requests.RequestException:
+                errors += 1
+            request_count += 1
+    return request_count, errors
+
+
+def run_client_process(
+    urls: list[str], clients: int, deadline: float
+) -> tuple[int, int]:
+    with ThreadPoolExecutor(max_workers=clients) as executor:
+        client_results = list(
+            executor.map(
+                lambda _: run_client(urls, deadline), range(clients)
+            )
+        )
+    return (
+        sum(request_count for request_count, _ in client_results),
+        sum(errors for _, errors in client_results),
+    )
+
+
+def run_load(
+    urls: list[str],
+    client_processes: int,
+    clients_per_process: int,
+    duration_seconds: float,
+) -> tuple[int, int]:
+    deadline = time.monotonic() + duration_seconds
+    with ProcessPoolExecutor(max_workers=client_processes) as executor:
+        process_results = list(
+            executor.map(
+                run_client_process,
+                [urls] * client_processes,
+                [clients_per_process] * client_processes,
+                [deadline] * client_processes,
+            )
+        )
+    return (
+        sum(request_count for request_count, _ in process_results),
+        sum(errors for _, errors in process_results),
+    )
+
+
+def wait_for_port_closed(host: str, port: int) -> None:
+    """wait until the previous server no longer accepts connections"""
+
+    while True:
+        try:
+            with socket.create_connection((host, port), timeout=1):
+                time.sleep(0.1)
+        except OSError:
+            return
+
+
+def main() -> None:
+    # write the snapshot once, so both servers start by mapping it
+    rates = load_rates_from_history(Path("../data/rates.csv"))
+    dates = rates.dates[-1000:]
+    urls = [
+        f"{base_url}/api/{rate_date}?base={base}&symbols=EUR,JPY,GBP"
+        for rate_date in dates
+        for base in ("USD", "INR")
+    ]
+
+    servers: list[tuple[str, Callable[[], None]]] = [
+        ("development server", start_rates_api),
+        ("prefork server", start_rates_api_prefork),
+    ]
+    duration_seconds = 10.0
+
+    for server_name, start_func in servers:
+        with api_server(f"{base_url}/check", start_func):
+            # fill the response caches first, the first pass is not counted
+            run_load(urls, 4, 4, 2.0)
+            request_count, errors = run_load(urls, 4, 4, duration_seconds)
+        wait_for_port_closed("127.0.0.1", 8080)
+
+        print(
+            f"{server_name}: {request_count} requests in "
+            f"{duration_seconds:.0f}s, "
+            f"{request_count / duration_seconds:,.0f} requests/s, "
+            f"{errors} errors"
+        )
+
+
+if __name__ == "__main__":
+    main()
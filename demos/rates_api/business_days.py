@@ -1,17 +1,179 @@
-from datetime import date, timedelta
+from datetime import date
+from functools import lru_cache
 import holidays
+import numpy as np
+import numpy.typing as npt
 
-def business_days(start: date, end: date) -> list[date]:
-    us_holidays = holidays.CountryHoliday("US")
-    date_diff = end - start
-    business_days_list = []
-    for day in range(date_diff.days + 1):
-        the_date = start + timedelta(day)
-        if the_date.weekday() < 5 and the_date not in us_holidays:
-            business_days_list.append(the_date)
-    return business_days_list
+# the default calendar covers the rates history with room to grow, so most
+# callers share one cached calendar per country
+DEFAULT_START_YEAR = 1990
+DEFAULT_END_YEAR = 2050
 
-if __name__ == "__main__":
-    print(business_days(date(2024, 5, 1), date(2024, 5, 6)))
 
+class BusinessDayCalendar:
+    """precomputed business days for a country and a range of years
+
+    The business days are held as a sorted array of date ordinals, so the
+    queries below are binary searches instead of a loop over the days.
+    The country is a country code such as "US", or a financial market code
+    such as "ECB" (the TARGET calendar the ECB publishes rates on).
+    """
+
+    def __init__(self, country: str, start_year: int, end_year: int) -> None:
+        self.country = country
+        self.first_day = date(start_year, 1, 1)
+        self.last_day = date(end_year, 12, 31)
+
+        years = range(start_year, end_year + 1)
+        if country in holidays.list_supported_financial():
+            country_holidays = holidays.financial_holidays(
+                country, years=years
+            )
+        else:
+            country_holidays = holidays.country_holidays(country, years=years)
+
+        day_ordinals = np.arange(
+            self.first_day.toordinal(),
+            self.last_day.toordinal() + 1,
+            dtype=np.int64,
+        )
+        # ordinal 1 (0001-01-01) is a Monday, so weekdays 0 to 4 are
+        # Monday to Friday
+        is_weekday = (day_ordinals - 1) % 7 < 5
+        is_holiday = np.isin(
+            day_ordinals,
+            np.array([day.toordinal() for day in country_holidays]),
+        )
+        self.ordinals: npt.NDArray[np.int64] = day_ordinals[
+            is_weekday & ~is_holiday
+        ]
+
+    def __check_range(self, the_date: date) -> int:
+        if not self.first_day <= the_date <= self.last_day:
+            raise ValueError(
+                f"{the_date} is outside of the calendar range "
+                f"{self.first_day} to {self.last_day}"
+            )
+        return the_date.toordinal()
+
+    def is_business_day(self, the_date: date) -> bool:
+        ordinal = self.__check_range(the_date)
+        position = int(np.searchsorted(self.ordinals, ordinal))
+        return (
+            position < len(self.ordinals)
+            and int(self.ordinals[position]) == ordinal
+        )
+
+    def business_days_between(self, start: date, end: date) -> int:
+        """number of business days from start to end, inclusive"""
+
+        start_position, end_position = np.searchsorted(
+            self.ordinals,
+            [self.__check_range(start), self.__check_range(end)],
+            side="left",
+        )
+        if self.is_business_day(end):
+            end_position += 1
+        return max(0, int(end_position - start_position))
+
+    def next_business_day(self, the_date: date) -> date:
+        """first business day after the date"""
+
+        position = int(
+            np.searchsorted(
+                self.ordinals, self.__check_range(the_date), side="right"
+            )
+        )
+        if position == len(self.ordinals):
+            raise ValueError(f"no business day after {the_date} in calendar")
+        return date.fromordinal(int(self.ordinals[position]))
+
+    def previous_business_day(
+        self, the_date: date, inclusive: bool = False
+    ) -> date:
+        """last business day before the date
+
+        With inclusive=True the date itself is returned if it is a business
+        day, which is the fallback date for a request on a non-business day.
+        """
+
+        position = int(
+            np.searchsorted(
+                self.ordinals,
+                self.__check_range(the_date),
+                side="right" if inclusive else "left",
+            )
+        )
+        if position == 0:
+            raise ValueError(f"no business day before {the_date} in calendar")
+        return date.fromordinal(int(self.ordinals[position - 1]))
+
+    def nth_business_day(self, start: date, n: int) -> date:
+        """business day n business days from start
 
+        n=0 is start itself when it is a business day, otherwise the next
+        business day. Negative n counts backwards.
+        """
+
+        position = (
+            int(np.searchsorted(self.ordinals, self.__check_range(start)))
+            + n
+        )
+        if not 0 <= position < len(self.ordinals):
+            raise ValueError(
+                f"business day {n} from {start} is outside of the calendar"
+            )
+        return date.fromordinal(int(self.ordinals[position]))
+
+    def ordinal_range(self, start: date, end: date) -> npt.NDArray[np.int64]:
+        """business day ordinals from start to end, inclusive"""
+
+        start_position = np.searchsorted(
+            self.ordinals, self.__check_range(start), side="left"
+        )
+        end_position = np.searchsorted(
+            self.ordinals, self.__check_range(end), side="right"
+        )
+        return self.ordinals[start_position:end_position]
+
+    def business_days(self, start: date, end: date) -> list[date]:
+        return [
+            date.fromordinal(ordinal)
+            for ordinal in self.ordinal_range(start, end).tolist()
+        ]
+
+    def date_range(self, start: date, end: date) -> npt.NDArray[np.str_]:
+        """business days from start to end as ISO date strings"""
+
+        epoch = np.datetime64(date(1970, 1, 1), "D")
+        return np.datetime_as_string(
+            epoch + (self.ordinal_range(start, end) - epoch.item().toordinal())
+        )
+
+
+@lru_cache(maxsize=16)
+def get_calendar(
+    country: str = "US",
+    start_year: int = DEFAULT_START_YEAR,
+    end_year: int = DEFAULT_END_YEAR,
+) -> BusinessDayCalendar:
+    return BusinessDayCalendar(country, start_year, end_year)
+
+
+def calendar_for(country: str, start: date, end: date) -> BusinessDayCalendar:
+    """cached calendar covering the dates"""
+
+    return get_calendar(
+        country,
+        min(start.year, DEFAULT_START_YEAR),
+        max(end.year, DEFAULT_END_YEAR),
+    )
+
+
+def business_days(start: date, end: date, country: str = "US") -> list[date]:
+    if end < start:
+        return []
+    return calendar_for(country, start, end).business_days(start, end)
+
+if __name__ == "__main__":
+    print(business_days(date(2024, 5, 1), date(2024, 5, 6)))
@@ -1,27 +1,25 @@
 from datetime import date
-import requests
 from rates_api.business_days import business_days
+from rates_api.rates_fetcher import RatesFetcher
 
 
 def main() -> None:
     start_date = date(2021, 3, 1)
     end_date = date(2021, 3, 15)
 
-    rates_api_responses: list[str] = []
-    for business_day in business_days(start_date, end_date):
-        resp = requests.get(
-            (
-                f"http://127.0.0.1:8080/api/{business_day}"
-                "?base=USD&symbols=EUR"
+    with RatesFetcher(max_workers=4) as rates_fetcher:
+        # responses are in business day order, None for days the rates api
+        # has no rates for
+        rates_api_responses = [
+            resp
+            for resp in rates_fetcher.fetch_rates(
+                business_days(start_date, end_date), "USD", ["EUR"]
             )
-        )
+            if resp is not None
+        ]
 
-        if resp.status_code != 200:
-            continue
-
-        rates_api_responses.append(resp.json())
-
-    print(rates_api_responses)
+        print(rates_api_responses)
+        print(rates_fetcher.stats)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,52 @@
+"""json responses module
+
+Pre-encoded JSON bodies with a strong ETag, for responses that never
+change once built. orjson encodes them when it is installed, the standard
+json module otherwise.
+"""
+
+from dataclasses import dataclass
+from hashlib import blake2b
+from typing import Any
+import json
+
+from flask import Request, Response
+
+try:
+    import orjson
+
+    def encode_json(document: Any) -> bytes:
+        return orjson.dumps(document)
+
+except ImportError:
+
+    def encode_json(document: Any) -> bytes:
+        return json.dumps(document, separators=(",", ":")).encode("UTF-8")
+
+
+# historical rates rarely change, but rates.csv can be corrected, so caches
+# keep a response for a day and then revalidate it with its ETag
+RATES_CACHE_CONTROL = "public, max-age=86400"
+
+
+@dataclass(frozen=True, slots=True)
+class EncodedJson:
+    body: bytes
+    # the quoted strong ETag of the body
+    etag: str
+
+    @classmethod
+    def encode(cls, document: Any) -> "EncodedJson":
+        body = encode_json(document)
+        return cls(body, f'"{blake2b(body, digest_size=16).hexdigest()}"')
+
+    def response(self, request: Request, cache_control: str) -> Response:
+        """the body, or a 304 when the request already has this ETag"""
+
+        headers = {"ETag": self.etag, "Cache-Control": cache_control}
+        # If-None-Match compares ETags weakly, so W/ tags match as well
+        if request.if_none_match.contains_weak(self.etag[1:-1]):
+            return Response(status=304, headers=headers)
+        return Response(
+            self.body, mimetype="application/json", headers=headers
+        )
@@ -0,0 +1,151 @@
+"""prefork server module
+
+Production serving for the rates api. The rates history is loaded once, the
+listening socket is opened once with a configurable backlog, and then the
+worker processes are forked. Each worker accepts from the shared socket and
+answers every request on its own thread. The workers share the rates
+history: a memory-mapped snapshot through the OS page cache, a parsed CSV
+copy-on-write, as no worker writes to it. The response caches are per
+worker.
+
+The parent process restarts workers that exit and stops them all when it
+is terminated, so rates_api.api_server can manage it like the development
+server, including the /check readiness probe.
+
+to run the server, change into the `demos` folder, then
+run the following command:
+python -m rates_api.prefork_server
+"""
+
+from dataclasses import dataclass
+from multiprocessing.connection import wait
+from multiprocessing.process import BaseProcess
+from pathlib import Path
+from types import FrameType
+import multiprocessing as mp
+import signal
+import socket
+
+from flask import Flask
+from werkzeug.serving import WSGIRequestHandler, make_server
+
+from rates_api.rates_app import create_app
+from rates_api.rates_data import load_rates_from_history
+from rates_api.rates_reloader import RatesReloader
+
+# the workers must be forked, spawned workers would each load a copy of the
+# rates history
+fork_context = mp.get_context("fork")
+
+
+@dataclass
+class PreforkOptions:
+    host: str = "127.0.0.1"
+    port: int = 8080
+    workers: int = 4
+    # connections the kernel queues while every worker is busy accepting
+    backlog: int = 1024
+
+
+class QuietRequestHandler(WSGIRequestHandler):
+    def log_request(
+        self, code: int | str = "-", size: int | str = "-"
+    ) -> None:
+        # one line per request would cost more than answering it
+        pass
+
+
+def listen_socket(host: str, port: int, backlog: int) -> socket.socket:
+    listener = socket.create_server((host, port), backlog=backlog)
+    listener.set_inheritable(True)
+    return listener
+
+
+def serve_worker(app: Flask, options: PreforkOptions, fd: int) -> None:
+    """answer requests from the shared listening socket, a thread each"""
+
+    # the parent stops the workers with SIGTERM, Ctrl+C is for the parent
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    worker_server = make_server(
+        options.host,
+        options.port,
+        app,
+        threaded=True,
+        request_handler=QuietRequestHandler,
+        fd=fd,
+    )
+    worker_server.serve_forever()
+
+
+def start_worker(
+    app: Flask, options: PreforkOptions, listener: socket.socket
+) -> BaseProcess:
+    worker_process = fork_context.Process(
+        target=serve_worker,
+        args=(app, options, listener.fileno()),
+        daemon=True,
+    )
+    worker_process.start()
+    return worker_process
+
+
+def stop_workers(worker_processes: list[BaseProcess]) -> None:
+    for worker_process in worker_processes:
+        if worker_process.is_alive():
+            worker_process.terminate()
+    for worker_process in worker_processes:
+        worker_process.join()
+
+
+def prefork_serve(app: Flask, options: PreforkOptions) -> None:
+    """run the workers until the process is terminated"""
+
+    def terminate(signal_number: int, frame: FrameType | None) -> None:
+        raise SystemExit(0)
+
+    # api_server stops the server with terminate, unwind so the workers
+    # are stopped too
+    signal.signal(signal.SIGTERM, terminate)
+
+    listener = listen_socket(options.host, options.port, options.backlog)
+    with listener:
+        worker_processes = [
+            start_worker(app, options, listener)
+            for _ in range(options.workers)
+        ]
+        print(
+            f"rates api is listening on {options.host}:{options.port} "
+            f"with {options.workers} workers"
+        )
+
+        try:
+            while True:
+                wait([worker.sentinel for worker in worker_processes])
+                for position, worker_process in enumerate(worker_processes):
+                    if not worker_process.is_alive():
+                        print(
+                            f"worker {worker_process.pid} exited with "
+                            f"{worker_process.exitcode}, restarting it"
+                        )
+                        worker_processes[position] = start_worker(
+                            app, options, listener
+                        )
+        except KeyboardInterrupt:
+            pass
+        finally:
+            stop_workers(worker_processes)
+
+
+def start_rates_api_prefork() -> None:
+    rates_file_path = Path("../data/rates.csv")
+    rates = load_rates_from_history(rates_file_path)
+    print(len(rates))
+
+    # each worker checks the file and reloads the new dates on its own
+    rates_reloader = RatesReloader(rates_file_path, rates)
+    prefork_serve(create_app(rates_reloader.current_rates), PreforkOptions())
+
+
+if __name__ == "__main__":
+    start_rates_api_prefork()
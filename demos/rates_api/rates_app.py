@@ -1,55 +1,298 @@
+from datetime import date
+from functools import lru_cache
+from typing import Callable, Iterator
+import json
 import math
+
 from flask import Flask, Response, abort, jsonify, request
 from pathlib import Path
+import numpy as np
+import numpy.typing as npt
 
-from rates_api.rates_data import load_rates_from_history
+from rates_api.json_responses import EncodedJson, RATES_CACHE_CONTROL
+from rates_api.rates_data import RatesStore, load_rates_from_history
+from rates_api.rates_reloader import RatesReloader
+from rates_api.rates_stats import RollingStats
 
 
-def start_rates_api() -> None:
-    rates_file_path = Path("../data/rates.csv")
-    rates = load_rates_from_history(rates_file_path)
-    print(len(rates))
+def nan_to_null(values: npt.NDArray[np.float64]) -> list[float | None]:
+    return [None if math.isnan(value) else value for value in values.tolist()]
+
+
+def create_app(current_rates: Callable[[], RatesStore]) -> Flask:
+    """the rates api application
+
+    current_rates returns the rates history to answer a request from, it
+    is called once per request so the history can be swapped for a
+    reloaded one while the api runs.
+    """
 
     app = Flask(__name__)
 
+    # the response caches below are keyed on the history they were built
+    # from, they are cleared when a reloaded history is first seen so they
+    # do not keep the replaced one in memory
+    newest_version = 0
+
+    def request_rates() -> RatesStore:
+        nonlocal newest_version
+        rates = current_rates()
+        if rates.version > newest_version:
+            newest_version = rates.version
+            encoded_rates.cache_clear()
+            cross_rate_matrix.cache_clear()
+            rolling_stats.cache_clear()
+        return rates
+
+    def rate_position(rates: RatesStore, rate_date: str) -> int:
+        # "fallback=previous" returns the rates for the nearest previous
+        # business day when there are no rates for the requested date
+        if request.args.get("fallback") == "previous":
+            position = rates.date_index.find_previous(rate_date)
+        else:
+            position = rates.date_index.find(rate_date)
+
+        if position is None:
+            abort(404)
+        return position
+
     @app.route("/check")
     def health_check() -> str:
         return "READY"
 
     # URL: http://127.0.0.1:5050/api/2021-04-08?base=INR&symbols=USD,EUR
 
+    # the rates for a date never change, so each response body is encoded
+    # once and kept with its ETag, keyed on the date it was built from
+    # (after any fallback) and the sorted symbols, set maxsize=0 to encode
+    # every response
+    @lru_cache(maxsize=4096)
+    def encoded_rates(
+        rates: RatesStore,
+        rate_date: str,
+        base_country: str,
+        symbols: tuple[str, ...] | None,
+    ) -> EncodedJson:
+        position = rates.date_index.find(rate_date)
+        assert position is not None
+
+        # the whole row is converted to the base currency in one
+        # vectorized division
+        country_rates = rates.convert(position, base_country, symbols)
+
+        return EncodedJson.encode(
+            {
+                "date": rate_date,
+                "base": base_country,
+                "rates": country_rates,
+            }
+        )
+
     @app.route("/api/<rate_date>")
     def rates_by_date(rate_date: str) -> Response:
-        for rate in rates:
-            if rate["Date"] == rate_date:
-                base_country = request.args.get("base", "EUR")
-
-                if "symbols" in request.args:
-                    country_symbols = request.args["symbols"].split(",")
-                else:
-                    # if the "symbols" is omitted from the request, then
-                    # return all symbols
-                    country_symbols = [col for col in rate if col != "Date"]
-
-                country_rates = {
-                    country_code: country_rate / rate[base_country]
-                    for (country_code, country_rate) in rate.items()
-                    if country_code != "Date"
-                    and country_code in country_symbols
-                    and not math.isnan(country_rate)
-                }
-
-                return jsonify(
-                    {
-                        "date": rate["Date"],
-                        "base": base_country,
-                        "rates": country_rates,
-                    }
-                )
-
-        abort(404)
-
-    app.run(port=8080)
+        rates = request_rates()
+        position = rate_position(rates, rate_date)
+
+        base_country = request.args.get("base", "EUR")
+
+        if base_country not in rates.currency_index:
+            abort(400)
+
+        country_symbols: tuple[str, ...] | None = None
+        if "symbols" in request.args:
+            country_symbols = tuple(
+                sorted(set(request.args["symbols"].split(",")))
+            )
+        # if the "symbols" is omitted from the request, then
+        # return all symbols
+
+        encoded = encoded_rates(
+            rates, rates.dates[position], base_country, country_symbols
+        )
+
+        # a fallback answer changes once the requested date has rates
+        if rates.dates[position] == rate_date:
+            return encoded.response(request, RATES_CACHE_CONTROL)
+        return encoded.response(request, "public, max-age=3600")
+
+    # a history does not change once loaded, so the matrices for the most
+    # recently asked dates and symbols are kept until it is reloaded, set
+    # maxsize=0 to compute every matrix
+    @lru_cache(maxsize=256)
+    def cross_rate_matrix(
+        rates: RatesStore, position: int, symbols: tuple[str, ...]
+    ) -> npt.NDArray[np.float64]:
+        matrix = rates.cross_rates(position, symbols)
+        matrix.setflags(write=False)
+        return matrix
+
+    # URL: http://127.0.0.1:8080/api/2021-04-08/matrix?symbols=USD,EUR,JPY
+    # add "&format=binary" for the matrix as little-endian float64 values,
+    # row by row, with the date and symbols in the response headers
+
+    @app.route("/api/<rate_date>/matrix")
+    def cross_rates_by_date(rate_date: str) -> Response:
+        rates = request_rates()
+        position = rate_position(rates, rate_date)
+
+        if "symbols" in request.args:
+            symbols = tuple(dict.fromkeys(request.args["symbols"].split(",")))
+        else:
+            symbols = tuple(rates.currencies)
+
+        # only the history's currencies, so a matrix is at most
+        # len(rates.currencies) square and the cached matrices stay small
+        if not all(symbol in rates.currency_index for symbol in symbols):
+            abort(400)
+
+        matrix = cross_rate_matrix(rates, position, symbols)
+
+        if request.args.get("format") == "binary":
+            return Response(
+                matrix.astype("<f8", copy=False).tobytes(),
+                mimetype="application/octet-stream",
+                headers={
+                    "X-Rates-Date": rates.dates[position],
+                    "X-Rates-Symbols": ",".join(symbols),
+                },
+            )
+
+        # JSON has no NaN, missing cross rates are null
+        return jsonify(
+            {
+                "date": rates.dates[position],
+                "symbols": symbols,
+                "rates": [nan_to_null(row) for row in matrix],
+            }
+        )
+
+    # URL: http://127.0.0.1:8080/api/range?start=2021-03-01&end=2021-03-15
+    #   &base=USD&symbols=EUR,JPY
+    # add "&format=ndjson" to stream one JSON object per date
+
+    @app.route("/api/range")
+    def rates_by_range() -> Response:
+        rates = request_rates()
+        try:
+            start_date = date.fromisoformat(request.args["start"]).isoformat()
+            end_date = date.fromisoformat(request.args["end"]).isoformat()
+        except (KeyError, ValueError):
+            abort(400)
+
+        base_country = request.args.get("base", "EUR")
+
+        if base_country not in rates.currency_index:
+            abort(400)
+
+        country_symbols: list[str] | None = None
+        if "symbols" in request.args:
+            country_symbols = request.args["symbols"].split(",")
+
+        # the rows are in date order, so the range is one slice of the
+        # rates matrix
+        range_rates = rates.convert_range(
+            rates.date_range(start_date, end_date),
+            base_country,
+            country_symbols,
+        )
+
+        if request.args.get("format") == "ndjson":
+
+            def ndjson_lines() -> Iterator[str]:
+                for rate_date, country_rates in range_rates:
+                    yield json.dumps(
+                        {
+                            "date": rate_date,
+                            "base": base_country,
+                            "rates": country_rates,
+                        }
+                    ) + "\n"
+
+            return Response(ndjson_lines(), mimetype="application/x-ndjson")
+
+        return jsonify(
+            {
+                "start": start_date,
+                "end": end_date,
+                "base": base_country,
+                "rates": dict(range_rates),
+            }
+        )
+
+    # the prefix sums and sparse tables of a currency are built on its
+    # first stats request for a base, and kept until the history is
+    # reloaded, so every later window costs a few lookups
+    @lru_cache(maxsize=128)
+    def rolling_stats(
+        rates: RatesStore, base_country: str, symbol: str
+    ) -> RollingStats:
+        base_column = rates.currency_index[base_country]
+        return RollingStats(
+            rates.rates[:, rates.currency_index[symbol]]
+            / rates.rates[:, base_column]
+        )
+
+    # URL: http://127.0.0.1:8080/api/stats?start=2021-01-01&end=2021-03-31
+    #   &window=20&base=USD&symbols=EUR,JPY
+    # the window is a number of business days (rows) ending at each date
+
+    @app.route("/api/stats")
+    def rolling_stats_by_range() -> Response:
+        rates = request_rates()
+
+        try:
+            start_date = date.fromisoformat(request.args["start"]).isoformat()
+            end_date = date.fromisoformat(request.args["end"]).isoformat()
+            window = int(request.args.get("window", "20"))
+        except (KeyError, ValueError):
+            abort(400)
+
+        base_country = request.args.get("base", "EUR")
+
+        if base_country not in rates.currency_index or window < 1:
+            abort(400)
+
+        country_symbols: list[str] | None = None
+        if "symbols" in request.args:
+            country_symbols = request.args["symbols"].split(",")
+
+        rows = rates.date_range(start_date, end_date)
+        ends = np.arange(rows.start, rows.stop)
+
+        stats: dict[str, dict[str, list[float | None]]] = {}
+        for column in rates.columns(country_symbols):
+            symbol = rates.currencies[column]
+            window_stats = rolling_stats(rates, base_country, symbol).window(
+                ends, window
+            )
+            # JSON has no NaN, windows without rates are null
+            stats[symbol] = {
+                name: nan_to_null(values)
+                for name, values in window_stats.items()
+            }
+
+        return jsonify(
+            {
+                "start": start_date,
+                "end": end_date,
+                "base": base_country,
+                "window": window,
+                "dates": rates.dates[rows],
+                "stats": stats,
+            }
+        )
+
+    return app
+
+
+def start_rates_api() -> None:
+    rates_file_path = Path("../data/rates.csv")
+    rates = load_rates_from_history(rates_file_path)
+    print(len(rates))
+
+    # dates added to the file are picked up without a restart
+    rates_reloader = RatesReloader(rates_file_path, rates)
+    create_app(rates_reloader.current_rates).run(port=8080)
 
 
 if __name__ == "__main__":
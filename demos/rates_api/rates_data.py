@@ -1,34 +1,447 @@
-from typing import Any
+from typing import Any, Iterator, Sequence, overload
 from pathlib import Path
 import csv
 import math
 
+import numpy as np
+import numpy.typing as npt
+
+from rates_api.rates_index import RatesIndex
+from rates_api.rates_snapshot import (
+    read_snapshot,
+    snapshot_path_for,
+    write_snapshot,
+)
+
 RatesHistory = list[dict[str, Any]]
 
-def load_rates_from_history(rates_file_path: Path) -> RatesHistory:
-    rate_history: RatesHistory = []
+
+class RatesStore(Sequence[dict[str, Any]]):
+    """columnar rates history
+
+    The rates are held in one contiguous float64 matrix with a row per date
+    (sorted oldest to newest) and a column per currency. Rates that are "N/A"
+    in the file are stored as NaN. Indexing or iterating the store returns
+    the old dict per row, so code written against RatesHistory still works.
+    """
+
+    def __init__(
+        self,
+        dates: list[str],
+        currencies: list[str],
+        rates: npt.NDArray[np.float64],
+        date_index: RatesIndex | None = None,
+        version: int = 0,
+    ) -> None:
+        self.dates = dates
+        self.currencies = currencies
+        self.currency_index = {
+            currency: column for column, currency in enumerate(currencies)
+        }
+        self.rates = rates
+        self.date_index = date_index or RatesIndex(dates)
+        # one more for every reload, so the api can tell a newer history
+        # from the one it has cached responses for
+        self.version = version
+        self.__currency_names = np.array(currencies)
+
+    def __len__(self) -> int:
+        return len(self.dates)
+
+    @overload
+    def __getitem__(self, position: int) -> dict[str, Any]:
+        ...
+
+    @overload
+    def __getitem__(self, position: slice) -> RatesHistory:
+        ...
+
+    def __getitem__(
+        self, position: int | slice
+    ) -> dict[str, Any] | RatesHistory:
+        if isinstance(position, slice):
+            return [
+                self.row(row_position)
+                for row_position in range(len(self))[position]
+            ]
+        return self.row(position)
+
+    def __iter__(self) -> Iterator[dict[str, Any]]:
+        for position in range(len(self)):
+            yield self.row(position)
+
+    def row(self, position: int) -> dict[str, Any]:
+        """the rates for one date as a dict (compatibility view)"""
+
+        rate_entry: dict[str, Any] = {"Date": self.dates[position]}
+        rate_entry.update(zip(self.currencies, self.rates[position].tolist()))
+        return rate_entry
+
+    def extended(
+        self, dates: list[str], rates: npt.NDArray[np.float64]
+    ) -> "RatesStore":
+        """a new store with rows for newer dates appended
+
+        The dates must be sorted and newer than the last date of the store.
+        The store itself is not changed, so requests still reading it are
+        not affected. The rows are copied into one new matrix, a copy of the
+        history per reload, so every request reads one contiguous matrix.
+        """
+
+        return RatesStore(
+            self.dates + dates,
+            self.currencies,
+            np.concatenate((self.rates, rates)),
+            self.date_index.extended(dates, len(self.dates)),
+            self.version + 1,
+        )
+
+    def columns(self, symbols: Sequence[str] | None) -> list[int]:
+        """matrix columns for the symbols, unknown symbols are skipped"""
+
+        if symbols is None:
+            return list(range(len(self.currencies)))
+        return [
+            self.currency_index[symbol]
+            for symbol in dict.fromkeys(symbols)
+            if symbol in self.currency_index
+        ]
+
+    def convert(
+        self, position: int, base: str, symbols: Sequence[str] | None = None
+    ) -> dict[str, float]:
+        """rates for one date converted to the base currency
+
+        Raises KeyError if the base currency is not in the history. Symbols
+        without a rate on that date are left out.
+        """
+
+        base_column = self.currency_index[base]
+        columns = self.columns(symbols)
+
+        row = self.rates[position]
+        converted = row[columns] / row[base_column]
+        has_rate = ~np.isnan(converted)
+
+        return dict(
+            zip(
+                self.__currency_names[columns][has_rate].tolist(),
+                converted[has_rate].tolist(),
+            )
+        )
+
+    def cross_rates(
+        self, position: int, symbols: Sequence[str]
+    ) -> npt.NDArray[np.float64]:
+        """N x N cross rates for one date
+
+        Entry [i, j] is the rate of symbols[j] with symbols[i] as the base,
+        so row i is what convert returns for base symbols[i]. The matrix is
+        one outer division of the rates row by itself. Symbols that are not in
+        the history or have no rate on that date have NaN rows and columns.
+        """
+
+        row = np.full(len(symbols), np.nan)
+        for symbol_position, symbol in enumerate(symbols):
+            column = self.currency_index.get(symbol)
+            if column is not None:
+                row[symbol_position] = self.rates[position, column]
+
+        return row[np.newaxis, :] / row[:, np.newaxis]
+
+    def date_range(self, start_date: str, end_date: str) -> slice:
+        """rows for the dates from start to end date, inclusive
+
+        The rows are stored in date order, so the sorted date slice from the
+        index is also the row slice.
+        """
+
+        return self.date_index.sorted_range(start_date, end_date)
+
+    def convert_range(
+        self,
+        rows: slice,
+        base: str,
+        symbols: Sequence[str] | None = None,
+    ) -> Iterator[tuple[str, dict[str, float]]]:
+        """rates for a slice of rows converted to the base currency
+
+        Yields (date, rates) for each row, oldest first. The rows are
+        converted in chunks, so a long range is never converted (or held)
+        all at once. Raises KeyError if the base currency is not in the
+        history.
+        """
+
+        base_column = self.currency_index[base]
+        columns = self.columns(symbols)
+        currency_names = self.__currency_names[columns].tolist()
+        chunk_size = 256
+        rows_start, rows_stop, _ = rows.indices(len(self))
+
+        for chunk_start in range(rows_start, rows_stop, chunk_size):
+            chunk = slice(
+                chunk_start, min(chunk_start + chunk_size, rows_stop)
+            )
+            chunk_rates = self.rates[chunk]
+            converted = chunk_rates[:, columns] / chunk_rates[:, [base_column]]
+
+            for rate_date, row_rates in zip(
+                self.dates[chunk], converted.tolist()
+            ):
+                yield rate_date, {
+                    currency_name: rate
+                    for currency_name, rate in zip(currency_names, row_rates)
+                    if not math.isnan(rate)
+                }
+
+
+def load_rates_from_history(
+    rates_file_path: Path, use_snapshot: bool = True
+) -> RatesStore:
+    """load the rates history
+
+    The first load parses the CSV file and writes a binary snapshot next to
+    it. Later loads memory-map the snapshot, as long as the CSV file has not
+    changed, which skips parsing the CSV file altogether.
+    """
+
+    rates_file_path = Path(rates_file_path)
+
+    if not use_snapshot:
+        return parse_rates_from_csv(rates_file_path)
+
+    snapshot_path = snapshot_path_for(rates_file_path)
+    snapshot = read_snapshot(snapshot_path, rates_file_path)
+    if snapshot is not None:
+        return RatesStore(*snapshot)
+
+    rates = parse_rates_from_csv(rates_file_path)
+    write_snapshot(
+        snapshot_path,
+        rates_file_path,
+        rates.dates,
+        rates.currencies,
+        rates.rates,
+    )
+    return rates
+
+
+def parse_rates_header(header: list[str]) -> tuple[int, list[int], list[str]]:
+    """the date column, the rate columns and the currencies of the file"""
+
+    # the file ends each line with a comma, so skip the empty column
+    rate_cols = [
+        col_index
+        for col_index, rate_col in enumerate(header)
+        if rate_col != "Date" and len(rate_col) > 0
+    ]
+    date_col = header.index("Date")
+    # the file rates are relative to EUR
+    currencies = ["EUR"] + [header[col_index] for col_index in rate_cols]
+    return date_col, rate_cols, currencies
+
+
+def parse_rates_row(rate_row: list[str], rate_cols: list[int]) -> list[float]:
+    return [1.0] + [
+        float("nan")
+        if rate_row[col_index] == "N/A"
+        else float(rate_row[col_index])
+        for col_index in rate_cols
+    ]
+
+
+def parse_rates_from_csv(rates_file_path: Path) -> RatesStore:
+    rate_dates: list[str] = []
+    rate_rows: list[list[float]] = []
 
     # with statement here is used so we don't have to close
-    
+
     with open(rates_file_path, encoding="UTF-8") as rates_file:
-        rates_file_csv = csv.DictReader(rates_file)
+        rates_file_csv = csv.reader(rates_file)
+
+        date_col, rate_cols, currencies = parse_rates_header(
+            next(rates_file_csv)
+        )
 
         for rate_row in rates_file_csv:
-            rate_entry = { "Date": rate_row["Date"], "EUR": 1.0 }
+            rate_dates.append(rate_row[date_col])
+            rate_rows.append(parse_rates_row(rate_row, rate_cols))
+
+    rates = np.array(rate_rows, dtype=np.float64).reshape(
+        len(rate_rows), len(currencies)
+    )
+
+    # the file is newest first, store the rows oldest to newest
+    date_order = sorted(range(len(rate_dates)), key=rate_dates.__getitem__)
+
+    return RatesStore(
+        [rate_dates[position] for position in date_order],
+        currencies,
+        np.ascontiguousarray(rates[date_order]),
+    )
+
+
+def parse_new_rates_from_csv(
+    rates_file_path: Path, rates: RatesStore
+) -> tuple[list[str], npt.NDArray[np.float64]] | None:
+    """the rows of the file for dates after the last date of the store
+
+    The file is newest first, so new dates are added at the top. Only the
+    rows above the store's last date are parsed, and they are returned
+    oldest first. Returns None when the file no longer lines up with the
+    store (other currencies, or the store's last date is not the first old
+    row), then the whole file has to be parsed again.
+    """
+
+    last_date = rates.dates[-1] if rates.dates else ""
+    rate_dates: list[str] = []
+    rate_rows: list[list[float]] = []
+
+    with open(rates_file_path, encoding="UTF-8") as rates_file:
+        rates_file_csv = csv.reader(rates_file)
+
+        date_col, rate_cols, currencies = parse_rates_header(
+            next(rates_file_csv)
+        )
+        if currencies != rates.currencies:
+            return None
+
+        for rate_row in rates_file_csv:
+            rate_date = rate_row[date_col]
+            if rate_date <= last_date:
+                if rate_date != last_date:
+                    return None
+                break
+            if rate_dates and rate_date >= rate_dates[-1]:
+                return None
+            rate_dates.append(rate_date)
+            rate_rows.append(parse_rates_row(rate_row, rate_cols))
+        else:
+            # the last date was not found
+            if rates.dates:
+                return None
+
+    rate_dates.reverse()
+    rate_rows.reverse()
+    return rate_dates, np.array(rate_rows, dtype=np.float64).reshape(
+        len(rate_rows), len(rates.currencies)
+    )
+
+
+def rates_file_currencies(rates_file_path: Path) -> list[str]:
+    """the currencies of the file, from its header only"""
+
+    with open(rates_file_path, encoding="UTF-8") as rates_file:
+        header = rates_file.readline().rstrip("\r\n").split(",")
+    return parse_rates_header(header)[2]
+
+
+def iter_rates_from_csv(
+    rates_file_path: Path,
+    symbols: Sequence[str],
+    start_date: str | None = None,
+    end_date: str | None = None,
+) -> Iterator[tuple[str, list[float]]]:
+    """(date, rates of the symbols) for each row of the file, newest first
+
+    Only the cells of the symbols are converted, and each line is split no
+    further than the last of their columns (the file has no quoted cells).
+    Rows after end_date are skipped without converting any rate, and as the
+    file is newest first, reading stops at the first row before start_date.
+    Raises KeyError for a symbol that is not in the file, and ValueError
+    for a line with too few cells or a date that is not older than the
+    date above it, as stopping early relies on the order.
+    """
+
+    with open(rates_file_path, encoding="UTF-8") as rates_file:
+        date_col, rate_cols, currencies = parse_rates_header(
+            rates_file.readline().rstrip("\r\n").split(",")
+        )
+        file_cols = dict(zip(currencies[1:], rate_cols))
+        # EUR is not a column of the file, its rate is always 1.0
+        symbol_cols = [
+            None if symbol == "EUR" else file_cols[symbol]
+            for symbol in symbols
+        ]
+        last_col = max(
+            [date_col] + [col for col in symbol_cols if col is not None]
+        )
+
+        previous_date: str | None = None
+        # the header is line 1
+        for line_number, line in enumerate(rates_file, 2):
+            cells = line.rstrip("\r\n").split(",", last_col + 1)
+            if len(cells) <= last_col:
+                raise ValueError(
+                    f"{rates_file_path} line {line_number} has "
+                    f"{len(cells)} cells, expected at least {last_col + 1}"
+                )
+
+            rate_date = cells[date_col]
+            if previous_date is not None and rate_date >= previous_date:
+                raise ValueError(
+                    f"{rates_file_path} line {line_number}: {rate_date} is "
+                    f"not older than {previous_date}"
+                )
+            previous_date = rate_date
+
+            if end_date is not None and rate_date > end_date:
+                continue
+            if start_date is not None and rate_date < start_date:
+                break
 
-            for rate_col in rate_row:
-                if rate_col != "Date" and len(rate_col) > 0:
-                    if rate_row[rate_col] == "N/A":
-                        rate_entry[rate_col] = math.nan
-                    else:
-                        rate_entry[rate_col] = float(rate_row[rate_col])
-                
+            yield rate_date, [
+                1.0
+                if col is None
+                else math.nan
+                if cells[col] == "N/A"
+                else float(cells[col])
+                for col in symbol_cols
+            ]
 
-            rate_history.append(rate_entry)
 
+def load_rates_projection(
+    rates_file_path: Path,
+    symbols: Sequence[str] | None = None,
+    start_date: str | None = None,
+    end_date: str | None = None,
+    chunk_rows: int = 1024,
+) -> RatesStore:
+    """a store with only the symbols and the dates from start to end date
 
+    The rows from iter_rates_from_csv are copied into preallocated arrays
+    of chunk_rows rows each, so memory grows with the rows and columns
+    asked for instead of with the file. All the currencies when symbols is
+    None, all the dates when the range is open.
+    """
 
-    return rate_history
+    rates_file_path = Path(rates_file_path)
+    if symbols is None:
+        currencies = rates_file_currencies(rates_file_path)
+    else:
+        currencies = list(dict.fromkeys(symbols))
 
+    rate_dates: list[str] = []
+    chunks: list[npt.NDArray[np.float64]] = []
+    chunk = np.empty((chunk_rows, len(currencies)), dtype=np.float64)
+    chunk_filled = 0
 
+    for rate_date, row_rates in iter_rates_from_csv(
+        rates_file_path, currencies, start_date, end_date
+    ):
+        if chunk_filled == chunk_rows:
+            chunks.append(chunk)
+            chunk = np.empty((chunk_rows, len(currencies)), dtype=np.float64)
+            chunk_filled = 0
+        chunk[chunk_filled] = row_rates
+        chunk_filled += 1
+        rate_dates.append(rate_date)
+    chunks.append(chunk[:chunk_filled])
 
+    # the file is newest first, store the rows oldest to newest
+    rate_dates.reverse()
+    return RatesStore(
+        rate_dates,
+        currencies,
+        np.ascontiguousarray(np.concatenate(chunks)[::-1]),
+    )
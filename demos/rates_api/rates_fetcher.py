@@ -0,0 +1,147 @@
+"""rates fetcher module
+
+Fetches rates from the Rates API for many dates at once. The requests share
+one pooled keep-alive session and run on a bounded pool of worker threads.
+Failed requests are retried with exponential backoff, and the results come
+back in the same order as the dates.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import date
+from typing import Any, Iterable
+import math
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.exceptions import RequestException
+
+
+def percentile(values: list[float], pct: float) -> float:
+    """nearest-rank percentile, 0.0 for no values"""
+
+    if not values:
+        return 0.0
+    sorted_values = sorted(values)
+    rank = max(0, min(len(values) - 1, math.ceil(pct / 100 * len(values)) - 1))
+    return sorted_values[rank]
+
+
+@dataclass
+class FetchStats:
+    requests: int = 0
+    retries: int = 0
+    failures: int = 0
+    elapsed_seconds: float = 0.0
+    latencies: list[float] = field(default_factory=list)
+
+    @property
+    def throughput(self) -> float:
+        """requests per second"""
+        if self.elapsed_seconds == 0:
+            return 0.0
+        return self.requests / self.elapsed_seconds
+
+    def __str__(self) -> str:
+        return (
+            f"{self.requests} requests in {self.elapsed_seconds:.3f}s "
+            f"({self.throughput:.1f} req/s), "
+            f"p50 {percentile(self.latencies, 50) * 1000:.1f}ms, "
+            f"p99 {percentile(self.latencies, 99) * 1000:.1f}ms, "
+            f"{self.retries} retries, {self.failures} failures"
+        )
+
+
+class RatesFetcher:
+    def __init__(
+        self,
+        base_url: str = "http://127.0.0.1:8080",
+        max_workers: int = 8,
+        max_retries: int = 3,
+        backoff_seconds: float = 0.1,
+        timeout_seconds: float = 5.0,
+    ) -> None:
+        self.base_url = base_url
+        self.max_workers = max_workers
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self.timeout_seconds = timeout_seconds
+        self.stats = FetchStats()
+        self.__stats_lock = threading.Lock()
+
+        # one connection per worker is kept alive and reused across requests
+        self.__session = requests.Session()
+        self.__session.mount(
+            "http://",
+            HTTPAdapter(pool_connections=1, pool_maxsize=max_workers),
+        )
+
+    def __enter__(self) -> "RatesFetcher":
+        return self
+
+    def __exit__(self, exc_type: Any, exc_val: Any, exc_tb: Any) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self.__session.close()
+
+    def fetch_json(self, url_path: str) -> Any | None:
+        """GET the path, None if not found or all the retries failed"""
+
+        for attempt in range(self.max_retries + 1):
+            if attempt > 0:
+                with self.__stats_lock:
+                    self.stats.retries += 1
+                # exponential backoff, with jitter so the workers do not
+                # retry in lockstep
+                time.sleep(
+                    self.backoff_seconds * 2 ** (attempt - 1) * random.random()
+                )
+
+            start_time = time.perf_counter()
+            try:
+                resp = self.__session.get(
+                    self.base_url + url_path, timeout=self.timeout_seconds
+                )
+            except RequestException:
+                continue
+            finally:
+                with self.__stats_lock:
+                    self.stats.requests += 1
+                    self.stats.latencies.append(
+                        time.perf_counter() - start_time
+                    )
+
+            if resp.status_code == 200:
+                try:
+                    return resp.json()
+                except ValueError:
+                    # a body that is not JSON will not parse on retry either
+                    break
+            if resp.status_code < 500:
+                # client errors such as 404 will not succeed on retry
+                return None
+
+        with self.__stats_lock:
+            self.stats.failures += 1
+        return None
+
+    def fetch_all(self, url_paths: Iterable[str]) -> list[Any | None]:
+        """GET all the paths concurrently, results are in the same order"""
+
+        start_time = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            results = list(executor.map(self.fetch_json, url_paths))
+        self.stats.elapsed_seconds += time.perf_counter() - start_time
+        return results
+
+    def fetch_rates(
+        self, rate_dates: Iterable[date], base: str, symbols: list[str]
+    ) -> list[Any | None]:
+        return self.fetch_all(
+            f"/api/{rate_date}?base={base}&symbols={','.join(symbols)}"
+            for rate_date in rate_dates
+        )
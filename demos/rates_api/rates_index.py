@@ -0,0 +1,93 @@
+"""rates index module"""
+
+from bisect import bisect_left, bisect_right
+from datetime import date
+from typing import Sequence
+
+
+class RatesIndex:
+    """date-keyed index over the rows of a rates history
+
+    The index maps each ISO date string (YYYY-MM-DD) to the position of its
+    row in the history. ISO dates sort the same way as strings, so the sorted
+    list of dates can be searched with bisect.
+    """
+
+    def __init__(self, rate_dates: Sequence[str]) -> None:
+        # hash lookup for exact dates
+        self.__positions = {
+            rate_date: position
+            for position, rate_date in enumerate(rate_dates)
+        }
+        # sorted dates (and their row positions) for the nearest previous
+        # business day lookup
+        self.__sorted_dates = sorted(self.__positions)
+        self.__sorted_positions = [
+            self.__positions[rate_date] for rate_date in self.__sorted_dates
+        ]
+
+    def extended(
+        self, rate_dates: Sequence[str], first_position: int
+    ) -> "RatesIndex":
+        """a new index with rows appended after first_position
+
+        The dates must be sorted and newer than every date in the index, so
+        the sorted lists are extended instead of sorted again. The index
+        itself is not changed, readers holding it are not affected.
+        """
+
+        new_positions = {
+            rate_date: first_position + offset
+            for offset, rate_date in enumerate(rate_dates)
+        }
+        rates_index = RatesIndex.__new__(RatesIndex)
+        rates_index.__positions = self.__positions | new_positions
+        rates_index.__sorted_dates = self.__sorted_dates + list(new_positions)
+        rates_index.__sorted_positions = self.__sorted_positions + list(
+            new_positions.values()
+        )
+        return rates_index
+
+    def __len__(self) -> int:
+        return len(self.__sorted_dates)
+
+    def __contains__(self, rate_date: object) -> bool:
+        return rate_date in self.__positions
+
+    def find(self, rate_date: str) -> int | None:
+        """row position for the exact date, None if there is no row"""
+
+        return self.__positions.get(rate_date)
+
+    def find_previous(self, rate_date: str) -> int | None:
+        """row position for the date, or the nearest date before it
+
+        Used to fall back to the previous business day when the requested
+        date is a weekend or a holiday. None if the date is before the start
+        of the history, or is not an ISO date.
+        """
+
+        position = self.__positions.get(rate_date)
+        if position is not None:
+            return position
+
+        # only ISO dates sort like the dates they stand for, anything else
+        # would bisect to an arbitrary row
+        try:
+            if date.fromisoformat(rate_date).isoformat() != rate_date:
+                return None
+        except ValueError:
+            return None
+
+        sorted_index = bisect_right(self.__sorted_dates, rate_date)
+        if sorted_index == 0:
+            return None
+        return self.__sorted_positions[sorted_index - 1]
+
+    def sorted_range(self, start_date: str, end_date: str) -> slice:
+        """slice of the sorted dates from start to end date, inclusive"""
+
+        return slice(
+            bisect_left(self.__sorted_dates, start_date),
+            bisect_right(self.__sorted_dates, end_date),
+        )
@@ -0,0 +1,188 @@
+"""rates ingest module
+
+Parallel loading for rates histories far larger than rates.csv. The file
+is split into byte ranges that start and end on line boundaries, and a
+process pool parses the ranges into typed arrays: numpy's C parser reads
+a whole range at once, so no Python object is made per row or per cell.
+The ranges come back as arrays and are merged in date order, whatever the
+order of the rows in the file.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Sequence
+import io
+import os
+
+import numpy as np
+import numpy.typing as npt
+
+from rates_api.rates_data import RatesStore, parse_rates_header
+
+# each worker gets a few ranges, so a slow range does not hold up the load
+ranges_per_worker = 4
+# ranges smaller than this cost more to hand to a worker than to parse
+min_range_bytes = 1 << 20
+
+ParsedRange = tuple[npt.NDArray[np.bytes_], npt.NDArray[np.float64]]
+
+
+def read_rates_header(
+    rates_file_path: Path,
+) -> tuple[int, int, list[int], list[str]]:
+    """the header size in bytes, then the parsed header"""
+
+    with open(rates_file_path, "rb") as rates_file:
+        header_line = rates_file.readline()
+    date_col, rate_cols, currencies = parse_rates_header(
+        header_line.decode("UTF-8").rstrip("\r\n").split(",")
+    )
+    return len(header_line), date_col, rate_cols, currencies
+
+
+def read_date_size(rates_file_path: Path, start: int, date_col: int) -> int:
+    """the size of the date of the first row at start, 0 without rows"""
+
+    with open(rates_file_path, "rb") as rates_file:
+        rates_file.seek(start)
+        first_line = rates_file.readline().rstrip(b"\r\n")
+    cells = first_line.split(b",")
+    return len(cells[date_col]) if len(cells) > date_col else 0
+
+
+def line_ranges(
+    rates_file_path: Path, start: int, range_count: int
+) -> list[tuple[int, int]]:
+    """(start, end) byte ranges of whole lines from start to end of file"""
+
+    file_size = os.path.getsize(rates_file_path)
+    range_bytes = max(
+        min_range_bytes, -(-(file_size - start) // max(1, range_count))
+    )
+
+    ranges: list[tuple[int, int]] = []
+    with open(rates_file_path, "rb") as rates_file:
+        while start < file_size:
+            # move the end past the next newline, so a line is never split
+            rates_file.seek(min(start + range_bytes, file_size))
+            rates_file.readline()
+            end = min(rates_file.tell(), file_size)
+            ranges.append((start, end))
+            start = end
+    return ranges
+
+
+def parse_range(
+    rates_file_path: Path,
+    start: int,
+    end: int,
+    cols: list[int],
+    date_size: int,
+) -> ParsedRange:
+    """the dates and the rates of the columns for a range of lines
+
+    cols is the date column followed by the rate columns. The dates are
+    read into a field one byte longer than date_size, raises ValueError for
+    a date filling it, as numpy cuts longer dates to the field size.
+    """
+
+    with open(rates_file_path, "rb") as rates_file:
+        rates_file.seek(start)
+        range_bytes = rates_file.read(end - start)
+
+    row_type = np.dtype(
+        [
+            ("date", f"S{date_size + 1}"),
+            ("rates", np.float64, (len(cols) - 1,)),
+        ]
+    )
+    rows = np.loadtxt(
+        io.BytesIO(range_bytes.replace(b"N/A", b"nan")),
+        delimiter=",",
+        dtype=row_type,
+        usecols=cols,
+        ndmin=1,
+    )
+    if len(rows) and np.char.str_len(rows["date"]).max() > date_size:
+        raise ValueError(
+            f"a date between bytes {start} and {end} of {rates_file_path} "
+            f"is longer than the {date_size} bytes of the first date"
+        )
+    return rows["date"], rows["rates"]
+
+
+def load_rates_parallel(
+    rates_file_path: Path,
+    symbols: Sequence[str] | None = None,
+    workers: int | None = None,
+) -> RatesStore:
+    """load the rates history with a process pool
+
+    Returns the same store as parse_rates_from_csv, limited to the symbols
+    when they are given. Raises KeyError for a symbol not in the file.
+    """
+
+    rates_file_path = Path(rates_file_path)
+    workers = workers or os.cpu_count() or 1
+    header_size, date_col, rate_cols, currencies = read_rates_header(
+        rates_file_path
+    )
+
+    # EUR is not a column of the file, its rate is always 1.0
+    file_cols = dict(zip(currencies[1:], rate_cols))
+    if symbols is None:
+        symbols = currencies
+    symbols = list(dict.fromkeys(symbols))
+    symbol_cols = [
+        None if symbol == "EUR" else file_cols[symbol] for symbol in symbols
+    ]
+    cols = [date_col] + [col for col in symbol_cols if col is not None]
+
+    # the dates are fixed size fields, sized from the first row
+    date_size = read_date_size(rates_file_path, header_size, date_col)
+
+    ranges = line_ranges(
+        rates_file_path, header_size, workers * ranges_per_worker
+    )
+    if len(ranges) == 1 or workers == 1:
+        parsed_ranges = [
+            parse_range(rates_file_path, start, end, cols, date_size)
+            for start, end in ranges
+        ]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            parsed_ranges = list(
+                executor.map(
+                    parse_range,
+                    [rates_file_path] * len(ranges),
+                    [start for start, _ in ranges],
+                    [end for _, end in ranges],
+                    [cols] * len(ranges),
+                    [date_size] * len(ranges),
+                )
+            )
+
+    if parsed_ranges:
+        dates = np.concatenate([dates for dates, _ in parsed_ranges])
+        file_rates = np.concatenate([rates for _, rates in parsed_ranges])
+    else:
+        dates = np.empty(0, dtype=f"S{date_size + 1}")
+        file_rates = np.empty((0, len(cols) - 1), dtype=np.float64)
+
+    # sort the rows oldest to newest, and put the EUR column back in
+    date_order = np.argsort(dates, kind="stable")
+    rates = np.ones((len(dates), len(symbols)), dtype=np.float64)
+    rates[:, [col is not None for col in symbol_cols]] = file_rates[
+        date_order
+    ]
+
+    # the store keeps its dates as a list of str: RatesIndex holds a dict
+    # keyed by every date, extended appends with +, and the routes slice
+    # and serialize them, so each date becomes a str here or in the index.
+    # One conversion of the whole array is cheaper than iterating it, which
+    # would make an np.str_ per row
+    return RatesStore(
+        dates[date_order].astype(str).tolist(),
+        symbols,
+        rates,
+    )
@@ -0,0 +1,101 @@
+"""rates reloader module
+
+Picks up the dates added to the rates CSV file while the api runs. The
+file is checked at most once every poll_seconds, from the request asking
+for the rates. When the file changed, a background thread parses the new
+rows only, builds the extended store next to the current one and swaps it
+in with one assignment. Requests keep answering from the store they
+started with, none of them waits for the reload.
+
+The check runs in the process answering requests, so it works the same in
+the development server and in every prefork worker.
+"""
+
+from pathlib import Path
+import logging
+import os
+import threading
+import time
+
+from rates_api.rates_data import (
+    RatesStore,
+    parse_new_rates_from_csv,
+    parse_rates_from_csv,
+)
+
+FileSignature = tuple[int, int] | None
+
+
+def file_signature(file_path: Path) -> FileSignature:
+    """modification time and size, None if the file cannot be read"""
+
+    try:
+        file_stat = os.stat(file_path)
+    except OSError:
+        return None
+    return file_stat.st_mtime_ns, file_stat.st_size
+
+
+class RatesReloader:
+    def __init__(
+        self,
+        rates_file_path: Path,
+        rates: RatesStore,
+        poll_seconds: float = 5.0,
+    ) -> None:
+        self.rates_file_path = rates_file_path
+        self.poll_seconds = poll_seconds
+        self.reloads = 0
+        self.__rates = rates
+        self.__signature = file_signature(rates_file_path)
+        self.__next_check = time.monotonic() + poll_seconds
+        self.__reload_lock = threading.Lock()
+
+    def current_rates(self) -> RatesStore:
+        """the current store, starts a reload when the file changed"""
+
+        if time.monotonic() >= self.__next_check:
+            self.__next_check = time.monotonic() + self.poll_seconds
+            if (
+                file_signature(self.rates_file_path) != self.__signature
+                and not self.__reload_lock.locked()
+            ):
+                threading.Thread(target=self.reload, daemon=True).start()
+        return self.__rates
+
+    def reload(self) -> int:
+        """read the new rows of the file, returns how many were added"""
+
+        with self.__reload_lock:
+            # a file written while it is parsed is picked up by the next
+            # check, as the signature is taken first
+            signature = file_signature(self.rates_file_path)
+            rates = self.__rates
+            try:
+                new_rates = parse_new_rates_from_csv(
+                    self.rates_file_path, rates
+                )
+                if new_rates is None:
+                    logging.log(
+                        logging.WARNING,
+                        "Rates file changed, parsing the whole file",
+                    )
+                    reloaded = parse_rates_from_csv(self.rates_file_path)
+                    reloaded.version = rates.version + 1
+                elif new_rates[0]:
+                    reloaded = rates.extended(*new_rates)
+                else:
+                    reloaded = rates
+            except (OSError, ValueError, IndexError, StopIteration) as exc:
+                # a half written file is read again at the next check
+                logging.log(
+                    logging.WARNING, "Rates Reload Failed", exc_info=exc
+                )
+                return 0
+
+            self.__signature = signature
+            if reloaded is rates:
+                return 0
+            self.__rates = reloaded
+            self.reloads += 1
+            return len(reloaded.dates) - len(rates.dates)
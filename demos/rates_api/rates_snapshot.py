@@ -0,0 +1,174 @@
+"""rates snapshot module
+
+A snapshot is a binary copy of the parsed rates CSV file, stored next to it,
+so the float matrix can be memory-mapped instead of parsing the CSV again.
+Processes that map the same snapshot share its pages through the OS page
+cache instead of each holding a private copy of the rates.
+
+Snapshot layout:
+
+    magic      8 bytes   b"RATESNAP"
+    version    uint32    little endian
+    length     uint32    little endian, size of the JSON header in bytes
+    header     JSON      source file stats and hash, dates, currencies, shape
+    padding    zeros up to a 64 byte boundary
+    rates      float64   little endian, C order, rows x cols
+"""
+
+from pathlib import Path
+from typing import Any
+import hashlib
+import json
+import logging
+import os
+import struct
+
+import numpy as np
+import numpy.typing as npt
+
+SNAPSHOT_MAGIC = b"RATESNAP"
+SNAPSHOT_VERSION = 1
+SNAPSHOT_ALIGNMENT = 64
+
+snapshot_prefix = struct.Struct("<8sII")
+
+
+def snapshot_path_for(rates_file_path: Path) -> Path:
+    return rates_file_path.with_name(rates_file_path.name + ".snapshot")
+
+
+def file_sha256(file_path: Path) -> str:
+    file_hash = hashlib.sha256()
+    with open(file_path, "rb") as source_file:
+        for chunk in iter(lambda: source_file.read(1 << 20), b""):
+            file_hash.update(chunk)
+    return file_hash.hexdigest()
+
+
+def read_snapshot_header(snapshot_path: Path) -> dict[str, Any] | None:
+    try:
+        with open(snapshot_path, "rb") as snapshot_file:
+            magic, version, header_length = snapshot_prefix.unpack(
+                snapshot_file.read(snapshot_prefix.size)
+            )
+            if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION:
+                return None
+            header: dict[str, Any] = json.loads(
+                snapshot_file.read(header_length)
+            )
+            return header
+    except (OSError, struct.error, ValueError):
+        return None
+
+
+def read_snapshot(
+    snapshot_path: Path, rates_file_path: Path
+) -> tuple[list[str], list[str], npt.NDArray[np.float64]] | None:
+    """memory-map the snapshot if it is still valid for the CSV file
+
+    The snapshot is valid if the CSV file has the same modification time and
+    size as when the snapshot was written. If they differ (for example the
+    file was copied or touched), the CSV contents hash is compared instead,
+    and on a match the snapshot is written again with the new modification
+    time and size, so the next load does not hash the file again. Returns
+    None when there is no valid snapshot, including a snapshot whose rates
+    are truncated.
+    """
+
+    header = read_snapshot_header(snapshot_path)
+    if header is None:
+        return None
+
+    rates_file_stat = rates_file_path.stat()
+    source_changed = (
+        header["source_mtime_ns"] != rates_file_stat.st_mtime_ns
+        or header["source_size"] != rates_file_stat.st_size
+    )
+    if source_changed:
+        source_sha256 = file_sha256(rates_file_path)
+        if header["source_sha256"] != source_sha256:
+            return None
+
+    try:
+        rows, cols = header["shape"]
+        rates: npt.NDArray[np.float64] = np.memmap(
+            snapshot_path,
+            dtype="<f8",
+            mode="r",
+            offset=header["data_offset"],
+            shape=(rows, cols),
+        )
+    except (OSError, ValueError, TypeError):
+        # the rates are missing or shorter than the header says
+        return None
+
+    if source_changed:
+        write_snapshot(
+            snapshot_path,
+            rates_file_path,
+            header["dates"],
+            header["currencies"],
+            rates,
+            source_sha256,
+        )
+    return header["dates"], header["currencies"], rates
+
+
+def write_snapshot(
+    snapshot_path: Path,
+    rates_file_path: Path,
+    dates: list[str],
+    currencies: list[str],
+    rates: npt.NDArray[np.float64],
+    source_sha256: str | None = None,
+) -> None:
+    """write the snapshot for the CSV file
+
+    The snapshot is written to a temporary file and moved into place, so a
+    process reading the snapshot never sees a partly written file, and maps
+    of the old snapshot stay valid. Failing to write the snapshot is logged
+    and otherwise ignored. source_sha256 skips hashing the CSV file when
+    the caller already has its hash.
+    """
+
+    rates_file_stat = rates_file_path.stat()
+    header = {
+        "source_mtime_ns": rates_file_stat.st_mtime_ns,
+        "source_size": rates_file_stat.st_size,
+        "source_sha256": source_sha256 or file_sha256(rates_file_path),
+        "dates": dates,
+        "currencies": currencies,
+        "shape": list(rates.shape),
+        "data_offset": 0,
+    }
+
+    # the data offset is part of the header, so pad the offset field to a
+    # fixed width before measuring the header
+    header_length = len(json.dumps(header)) + 20
+    data_offset = -(
+        -(snapshot_prefix.size + header_length) // SNAPSHOT_ALIGNMENT
+    ) * SNAPSHOT_ALIGNMENT
+    header["data_offset"] = data_offset
+    header_bytes = json.dumps(header).encode("UTF-8")
+
+    temp_path = snapshot_path.with_name(
+        f"{snapshot_path.name}.{os.getpid()}.tmp"
+    )
+    try:
+        with open(temp_path, "wb") as snapshot_file:
+            snapshot_file.write(
+                snapshot_prefix.pack(
+                    SNAPSHOT_MAGIC, SNAPSHOT_VERSION, len(header_bytes)
+                )
+            )
+            snapshot_file.write(header_bytes)
+            snapshot_file.write(b"\0" * (data_offset - snapshot_file.tell()))
+            snapshot_file.write(
+                np.ascontiguousarray(rates, dtype="<f8").tobytes()
+            )
+        os.replace(temp_path, snapshot_path)
+    except OSError as exc:
+        logging.log(
+            logging.WARNING, "Rates snapshot not written", exc_info=exc
+        )
+        temp_path.unlink(missing_ok=True)
@@ -0,0 +1,95 @@
+"""rates stats module
+
+Rolling window statistics over a series of rates. The series is
+preprocessed once into prefix sums (for the mean and the standard
+deviation) and sparse tables (for the minimum and the maximum), after
+which the statistics of any window are a few array lookups, however long
+the window is.
+"""
+
+import numpy as np
+import numpy.typing as npt
+
+WindowStats = dict[str, npt.NDArray[np.float64]]
+
+
+class RollingStats:
+    """O(1) per window mean, standard deviation, minimum and maximum
+
+    Missing rates (NaN) are left out of every statistic. The values are
+    shifted by their mean before summing the squares, so the variance does
+    not lose its precision to large rates such as IDR.
+    """
+
+    def __init__(self, values: npt.NDArray[np.float64]) -> None:
+        self.size = len(values)
+        has_rate = ~np.isnan(values)
+        self.shift = float(values[has_rate].mean()) if has_rate.any() else 0.0
+        shifted = np.where(has_rate, values - self.shift, 0.0)
+
+        # prefix sums, entry i covers the values before row i, the sums are
+        # kept in extended precision as a window is the difference of two
+        # of them
+        self.counts = np.concatenate(([0], np.cumsum(has_rate)))
+        self.sums = np.concatenate(
+            ([0.0], np.cumsum(shifted, dtype=np.longdouble))
+        )
+        self.squares = np.concatenate(
+            ([0.0], np.cumsum(shifted**2, dtype=np.longdouble))
+        )
+
+        # level k holds the minimum and maximum of the 2**k values from each
+        # row, fmin and fmax skip NaN
+        self.minimums = [values]
+        self.maximums = [values]
+        span = 1
+        while span * 2 <= self.size:
+            self.minimums.append(
+                np.fmin(self.minimums[-1][:-span], self.minimums[-1][span:])
+            )
+            self.maximums.append(
+                np.fmax(self.maximums[-1][:-span], self.maximums[-1][span:])
+            )
+            span *= 2
+
+    def window(self, ends: npt.NDArray[np.intp], window: int) -> WindowStats:
+        """stats of the window rows up to and including each end row
+
+        Windows reaching back before the first row, or without a single
+        rate, are NaN. The standard deviation is the sample one, NaN for
+        windows with a single rate.
+        """
+
+        if window > self.size:
+            missing = np.full(len(ends), np.nan)
+            return {
+                name: missing.copy() for name in ("mean", "std", "min", "max")
+            }
+
+        starts = np.maximum(ends - window + 1, 0)
+        counts = self.counts[ends + 1] - self.counts[starts]
+        sums = self.sums[ends + 1] - self.sums[starts]
+        squares = self.squares[ends + 1] - self.squares[starts]
+
+        # two overlapping power of two spans cover the window
+        level = window.bit_length() - 1
+        span_starts = np.maximum(ends - (1 << level) + 1, 0)
+        minimum = np.fmin(
+            self.minimums[level][starts], self.minimums[level][span_starts]
+        )
+        maximum = np.fmax(
+            self.maximums[level][starts], self.maximums[level][span_starts]
+        )
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            shifted_mean = sums / counts
+            variance = (squares - sums * shifted_mean) / (counts - 1)
+        std = np.sqrt(np.maximum(variance, 0.0)).astype(np.float64)
+        mean = (shifted_mean + self.shift).astype(np.float64)
+
+        no_window = (ends - window + 1 < 0) | (counts == 0)
+        for stat in (mean, minimum, maximum):
+            stat[no_window] = np.nan
+        std[no_window | (counts < 2)] = np.nan
+
+        return {"mean": mean, "std": std, "min": minimum, "max": maximum}
@@ -0,0 +1,70 @@
+from pathlib import Path
+from urllib.error import URLError
+from urllib.request import urlopen
+import json
+import socket
+import time
+
+import numpy as np
+
+from rates_api.prefork_server import (
+    PreforkOptions,
+    fork_context,
+    prefork_serve,
+)
+from rates_api.rates_app import create_app
+from rates_api.rates_data import RatesStore
+
+
+def child_pids(pid: int) -> list[int]:
+    children = Path(f"/proc/{pid}/task/{pid}/children").read_text()
+    return [int(child_pid) for child_pid in children.split()]
+
+
+def get(url: str) -> bytes:
+    with urlopen(url, timeout=5) as resp:
+        body: bytes = resp.read()
+        return body
+
+
+def test_prefork_serve() -> None:
+    rates = RatesStore(
+        ["2021-04-07", "2021-04-08"],
+        ["EUR", "USD"],
+        np.array([[1.0, 1.19], [1.0, 1.1873]]),
+    )
+    with socket.socket() as free_socket:
+        free_socket.bind(("127.0.0.1", 0))
+        port = free_socket.getsockname()[1]
+    base_url = f"http://127.0.0.1:{port}"
+
+    server_process = fork_context.Process(
+        target=prefork_serve,
+        args=(create_app(lambda: rates), PreforkOptions(port=port, workers=2)),
+    )
+    server_process.start()
+    try:
+        deadline = time.monotonic() + 10.0
+        while True:
+            try:
+                assert get(f"{base_url}/check") == b"READY"
+                break
+            except URLError:
+                assert time.monotonic() < deadline
+                time.sleep(0.05)
+
+        assert json.loads(get(f"{base_url}/api/2021-04-08?symbols=USD")) == {
+            "date": "2021-04-08",
+            "base": "EUR",
+            "rates": {"USD": 1.1873},
+        }
+        worker_pids = child_pids(server_process.pid or 0)
+        assert len(worker_pids) == 2
+    finally:
+        server_process.terminate()
+        server_process.join(10)
+
+    assert server_process.exitcode == 0
+    # the workers were stopped and reaped before the server exited
+    for worker_pid in worker_pids:
+        assert not Path(f"/proc/{worker_pid}").exists()
@@ -0,0 +1,162 @@
+from flask.testing import FlaskClient
+import numpy as np
+import pytest
+
+from rates_api.rates_app import create_app
+from rates_api.rates_data import RatesStore
+
+
+@pytest.fixture
+def rates() -> RatesStore:
+    return RatesStore(
+        ["2021-04-07", "2021-04-08", "2021-04-09"],
+        ["EUR", "USD", "JPY"],
+        np.array(
+            [[1.0, 1.19, 130.0], [1.0, 1.1873, 129.71], [1.0, 1.1888, np.nan]]
+        ),
+    )
+
+
+@pytest.fixture
+def client(rates: RatesStore) -> FlaskClient:
+    return create_app(lambda: rates).test_client()
+
+
+def test_rates_by_date(client: FlaskClient) -> None:
+    resp = client.get("/api/2021-04-08?base=USD&symbols=JPY,EUR")
+
+    assert resp.status_code == 200
+    assert resp.json == {
+        "date": "2021-04-08",
+        "base": "USD",
+        "rates": {"EUR": 1 / 1.1873, "JPY": 129.71 / 1.1873},
+    }
+
+
+def test_fallback_previous(client: FlaskClient) -> None:
+    resp = client.get("/api/2021-04-11?fallback=previous&symbols=USD")
+
+    assert resp.json == {
+        "date": "2021-04-09",
+        "base": "EUR",
+        "rates": {"USD": 1.1888},
+    }
+    assert client.get("/api/2021-04-11").status_code == 404
+
+
+def test_fallback_previous_malformed_date(client: FlaskClient) -> None:
+    assert client.get("/api/zzz?fallback=previous").status_code == 404
+    assert client.get("/api/2021-4-8?fallback=previous").status_code == 404
+
+
+def test_cross_rate_matrix(client: FlaskClient) -> None:
+    resp = client.get("/api/2021-04-08/matrix?symbols=USD,EUR,JPY,USD")
+
+    assert resp.json is not None
+    assert resp.json["date"] == "2021-04-08"
+    assert resp.json["symbols"] == ["USD", "EUR", "JPY"]
+    # row i, column j is the rate of symbol j with symbol i as the base
+    symbol_rates = [1.1873, 1.0, 129.71]
+    assert resp.json["rates"] == [
+        [pytest.approx(rate_j / rate_i) for rate_j in symbol_rates]
+        for rate_i in symbol_rates
+    ]
+
+
+def test_cross_rate_matrix_missing_rate(client: FlaskClient) -> None:
+    resp = client.get("/api/2021-04-09/matrix?symbols=EUR,JPY")
+
+    assert resp.json is not None
+    assert resp.json["rates"] == [[1.0, None], [None, None]]
+
+
+def test_cross_rate_matrix_binary(client: FlaskClient) -> None:
+    resp = client.get("/api/2021-04-08/matrix?symbols=EUR,USD&format=binary")
+
+    assert resp.headers["X-Rates-Date"] == "2021-04-08"
+    assert resp.headers["X-Rates-Symbols"] == "EUR,USD"
+    assert len(resp.data) == 2 * 2 * 8
+    matrix = np.frombuffer(resp.data, dtype="<f8").reshape(2, 2)
+    assert matrix.tolist() == [
+        [1.0, 1.1873],
+        [pytest.approx(1 / 1.1873), 1.0],
+    ]
+
+
+def test_cross_rate_matrix_unknown_symbol(client: FlaskClient) -> None:
+    for symbols in ("EUR,XXX", ""):
+        resp = client.get(f"/api/2021-04-08/matrix?symbols={symbols}")
+        assert resp.status_code == 400
+
+
+def test_rates_by_range(client: FlaskClient) -> None:
+    resp = client.get(
+        "/api/range?start=2021-04-08&end=2021-04-10&base=USD&symbols=JPY"
+    )
+
+    assert resp.json == {
+        "start": "2021-04-08",
+        "end": "2021-04-10",
+        "base": "USD",
+        "rates": {"2021-04-08": {"JPY": 129.71 / 1.1873}, "2021-04-09": {}},
+    }
+    assert client.get("/api/range?start=2021-04-08").status_code == 400
+    assert client.get("/api/range?start=x&end=2021-04-10").status_code == 400
+
+
+def test_rates_by_range_ndjson(client: FlaskClient) -> None:
+    resp = client.get(
+        "/api/range?start=2021-04-01&end=2021-04-07&symbols=USD&format=ndjson"
+    )
+
+    assert resp.mimetype == "application/x-ndjson"
+    assert resp.get_data(as_text=True).splitlines() == [
+        '{"date": "2021-04-07", "base": "EUR", "rates": {"USD": 1.19}}'
+    ]
+
+
+def test_etag_revalidation(client: FlaskClient) -> None:
+    resp = client.get("/api/2021-04-08?symbols=USD")
+
+    assert resp.headers["Cache-Control"] == "public, max-age=86400"
+    etag = resp.headers["ETag"]
+
+    for if_none_match in (etag, f"W/{etag}", f'"other", {etag}'):
+        not_modified = client.get(
+            "/api/2021-04-08?symbols=USD",
+            headers={"If-None-Match": if_none_match},
+        )
+        assert not_modified.status_code == 304
+        assert not_modified.headers["ETag"] == etag
+        assert not_modified.get_data() == b""
+
+    other = client.get(
+        "/api/2021-04-08?symbols=JPY", headers={"If-None-Match": etag}
+    )
+    assert other.status_code == 200
+    assert other.headers["ETag"] != etag
+
+
+def test_fallback_is_cached_for_an_hour(client: FlaskClient) -> None:
+    resp = client.get("/api/2021-04-11?fallback=previous&symbols=USD")
+
+    assert resp.headers["Cache-Control"] == "public, max-age=3600"
+    # the same body as the date the fallback answered with
+    assert (
+        resp.headers["ETag"]
+        == client.get("/api/2021-04-09?symbols=USD").headers["ETag"]
+    )
+
+
+def test_rolling_stats(client: FlaskClient) -> None:
+    resp = client.get(
+        "/api/stats?start=2021-04-08&end=2021-04-09&window=2&symbols=JPY"
+    )
+
+    assert resp.json is not None
+    assert resp.json["dates"] == ["2021-04-08", "2021-04-09"]
+    jpy_stats = resp.json["stats"]["JPY"]
+    assert jpy_stats["mean"] == [pytest.approx((130.0 + 129.71) / 2), 129.71]
+    assert jpy_stats["min"] == [129.71, 129.71]
+    assert jpy_stats["std"][1] is None
+    assert client.get("/api/stats?start=2021-04-08").status_code == 400
@@ -0,0 +1,108 @@
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from rates_api.rates_data import (
+    RatesStore,
+    iter_rates_from_csv,
+    load_rates_projection,
+    parse_rates_from_csv,
+)
+
+rates_csv = (
+    "Date,USD,JPY,GBP,\n"
+    "2021-04-09,1.1888,130.42,N/A,\n"
+    "2021-04-08,1.1873,129.71,0.86335,\n"
+    "2021-04-07,1.19,130.0,0.86,\n"
+    "2021-04-06,1.1812,130.35,0.85,\n"
+    "2021-04-01,1.1746,130.05,0.85,\n"
+)
+
+
+@pytest.fixture
+def rates_file_path(tmp_path: Path) -> Path:
+    rates_file_path = tmp_path / "rates.csv"
+    rates_file_path.write_text(rates_csv)
+    return rates_file_path
+
+
+def assert_same_store(store: RatesStore, expected: RatesStore) -> None:
+    assert store.dates == expected.dates
+    assert store.currencies == expected.currencies
+    np.testing.assert_array_equal(store.rates, expected.rates)
+    assert store.rates.flags.c_contiguous
+
+
+@pytest.mark.parametrize("chunk_rows", [1, 2, 1024])
+def test_projection_of_every_column(
+    rates_file_path: Path, chunk_rows: int
+) -> None:
+    assert_same_store(
+        load_rates_projection(rates_file_path, chunk_rows=chunk_rows),
+        parse_rates_from_csv(rates_file_path),
+    )
+
+
+def test_projection_of_symbols_and_dates(rates_file_path: Path) -> None:
+    full = parse_rates_from_csv(rates_file_path)
+    symbols = ["GBP", "EUR", "USD", "GBP"]
+
+    projected = load_rates_projection(
+        rates_file_path, symbols, "2021-04-06", "2021-04-08", chunk_rows=2
+    )
+
+    rows = full.date_range("2021-04-06", "2021-04-08")
+    assert_same_store(
+        projected,
+        RatesStore(
+            full.dates[rows],
+            ["GBP", "EUR", "USD"],
+            full.rates[rows][:, full.columns(["GBP", "EUR", "USD"])],
+        ),
+    )
+
+
+def test_iter_rates_stops_before_start(rates_file_path: Path) -> None:
+    assert [
+        rate_date
+        for rate_date, _ in iter_rates_from_csv(
+            rates_file_path, ["USD"], start_date="2021-04-07"
+        )
+    ] == ["2021-04-09", "2021-04-08", "2021-04-07"]
+
+    with pytest.raises(KeyError):
+        list(iter_rates_from_csv(rates_file_path, ["INR"]))
+
+
+@pytest.mark.parametrize(
+    "bad_line",
+    ["2021-04-05,1.18,\n", "2021-04-07,1.19,130.0,0.86,\n", "\n"],
+    ids=["short", "out of order", "empty"],
+)
+def test_iter_rates_rejects_bad_lines(tmp_path: Path, bad_line: str) -> None:
+    rates_file_path = tmp_path / "rates.csv"
+    # before the last line, so the rows read up to it look fine
+    rates_lines = rates_csv.splitlines(keepends=True)
+    rates_file_path.write_text(
+        "".join(rates_lines[:-1] + [bad_line] + rates_lines[-1:])
+    )
+
+    with pytest.raises(ValueError, match="line 6"):
+        list(iter_rates_from_csv(rates_file_path, ["GBP"]))
+    with pytest.raises(ValueError, match="line 6"):
+        load_rates_projection(rates_file_path)
+
+
+def test_projection_of_the_rates_history() -> None:
+    rates_file_path = Path(__file__).parents[2] / "data" / "rates.csv"
+    if not rates_file_path.exists():
+        pytest.skip("no rates history")
+
+    full = parse_rates_from_csv(rates_file_path)
+    symbols = ["USD", "EUR", "GBP", "JPY"]
+
+    assert_same_store(
+        load_rates_projection(rates_file_path, symbols),
+        RatesStore(full.dates, symbols, full.rates[:, full.columns(symbols)]),
+    )
@@ -0,0 +1,55 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Iterator
+import threading
+
+import pytest
+
+from rates_api.rates_fetcher import RatesFetcher, percentile
+
+
+def test_percentile_nearest_rank() -> None:
+    values = [float(value) for value in range(1, 11)]
+
+    assert percentile([], 50) == 0.0
+    assert percentile(values, 50) == 5.0
+    assert percentile(values, 90) == 9.0
+    assert percentile(values, 91) == 10.0
+    # p99 of a small sample is its largest value
+    assert percentile(values, 99) == 10.0
+    assert percentile(values, 100) == 10.0
+    assert percentile([3.0, 1.0, 2.0], 0) == 1.0
+
+
+class FakeRatesHandler(BaseHTTPRequestHandler):
+    def do_GET(self) -> None:
+        status, body = {
+            "/json": (200, b'{"date": "2021-04-08"}'),
+            "/html": (200, b"<html>not json</html>"),
+            "/missing": (404, b"not found"),
+        }[self.path]
+        self.send_response(status)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args: object) -> None:
+        pass
+
+
+@pytest.fixture
+def base_url() -> Iterator[str]:
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeRatesHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def test_fetch_all_counts_non_json_as_failure(base_url: str) -> None:
+    with RatesFetcher(base_url, max_workers=2) as rates_fetcher:
+        results = rates_fetcher.fetch_all(["/json", "/html", "/missing"])
+
+    assert results == [{"date": "2021-04-08"}, None, None]
+    assert rates_fetcher.stats.requests == 3
+    assert rates_fetcher.stats.retries == 0
+    assert rates_fetcher.stats.failures == 1
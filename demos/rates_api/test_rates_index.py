@@ -0,0 +1,42 @@
+from rates_api.rates_index import RatesIndex
+
+# newest first, like rates.csv
+rate_dates = ["2021-04-09", "2021-04-08", "2021-04-06", "2021-04-01"]
+
+
+def test_find_exact_date() -> None:
+    rates_index = RatesIndex(rate_dates)
+
+    assert rates_index.find("2021-04-08") == 1
+    assert rates_index.find("2021-04-07") is None
+    assert "2021-04-06" in rates_index
+    assert len(rates_index) == 4
+
+
+def test_find_previous_falls_back_to_earlier_date() -> None:
+    rates_index = RatesIndex(rate_dates)
+
+    assert rates_index.find_previous("2021-04-08") == 1
+    assert rates_index.find_previous("2021-04-07") == 2
+    assert rates_index.find_previous("2021-04-11") == 0
+    assert rates_index.find_previous("2021-03-31") is None
+
+
+def test_find_previous_rejects_malformed_dates() -> None:
+    rates_index = RatesIndex(rate_dates)
+
+    assert rates_index.find_previous("zzz") is None
+    assert rates_index.find_previous("2021-4-7") is None
+    assert rates_index.find_previous("20210407") is None
+    assert rates_index.find_previous("") is None
+
+
+def test_sorted_range_is_inclusive() -> None:
+    rates_index = RatesIndex(sorted(rate_dates))
+
+    assert rates_index.sorted_range("2021-04-06", "2021-04-08") == slice(1, 3)
+    assert rates_index.sorted_range("2021-04-02", "2021-04-07") == slice(1, 2)
+    assert rates_index.sorted_range("2021-03-01", "2021-12-31") == slice(0, 4)
+    assert rates_index.sorted_range("2021-04-10", "2021-04-20") == slice(4, 4)
+    # an inverted range is empty
+    assert rates_index.sorted_range("2021-04-09", "2021-04-01") == slice(3, 1)
@@ -0,0 +1,70 @@
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from rates_api import rates_ingest
+from rates_api.rates_data import parse_rates_from_csv
+from rates_api.rates_ingest import load_rates_parallel
+
+header = "Date,USD,JPY,GBP,\n"
+
+
+def write_rates(tmp_path: Path, dates: list[str]) -> Path:
+    rates_file_path = tmp_path / "rates.csv"
+    rates_file_path.write_text(
+        header
+        + "".join(
+            f"{rate_date},{1.1 + row / 100},N/A,{0.8 + row / 100},\n"
+            for row, rate_date in enumerate(dates)
+        )
+    )
+    return rates_file_path
+
+
+@pytest.fixture
+def small_ranges(monkeypatch: pytest.MonkeyPatch) -> None:
+    # a few lines per range, so the small files are split too
+    monkeypatch.setattr(rates_ingest, "min_range_bytes", 64)
+
+
+@pytest.mark.parametrize("workers", [1, 3])
+def test_parallel_load_matches_the_full_parse(
+    tmp_path: Path, small_ranges: None, workers: int
+) -> None:
+    rates_file_path = write_rates(
+        tmp_path, [f"2021-03-{day:02}" for day in range(31, 0, -1)]
+    )
+    full = parse_rates_from_csv(rates_file_path)
+
+    rates = load_rates_parallel(rates_file_path, workers=workers)
+
+    assert rates.dates == full.dates
+    assert rates.currencies == full.currencies
+    np.testing.assert_array_equal(rates.rates, full.rates)
+
+    symbols = ["GBP", "EUR", "USD"]
+    projected = load_rates_parallel(rates_file_path, symbols, workers)
+    assert projected.currencies == symbols
+    np.testing.assert_array_equal(
+        projected.rates, full.rates[:, full.columns(symbols)]
+    )
+
+
+def test_datetime_column(tmp_path: Path, small_ranges: None) -> None:
+    dates = [f"2021-03-{day:02}T16:00:00+01:00" for day in range(20, 0, -1)]
+    rates_file_path = write_rates(tmp_path, dates)
+
+    rates = load_rates_parallel(rates_file_path, workers=2)
+
+    assert rates.dates == dates[::-1]
+    assert rates.dates == parse_rates_from_csv(rates_file_path).dates
+
+
+def test_date_longer_than_the_first_fails(tmp_path: Path) -> None:
+    rates_file_path = write_rates(
+        tmp_path, ["2021-04-09", "2021-04-08T16:00:00", "2021-04-07"]
+    )
+
+    with pytest.raises(ValueError, match="longer than the 10 bytes"):
+        load_rates_parallel(rates_file_path, workers=1)
@@ -0,0 +1,78 @@
+from pathlib import Path
+import gc
+import math
+import weakref
+
+import pytest
+
+from rates_api.rates_app import create_app
+from rates_api.rates_data import RatesStore, parse_rates_from_csv
+from rates_api.rates_reloader import RatesReloader
+
+header = "Date,USD,JPY,\n"
+old_lines = "2021-04-08,1.1873,129.71,\n2021-04-07,1.19,130.0,\n"
+
+
+@pytest.fixture
+def rates_file_path(tmp_path: Path) -> Path:
+    rates_file_path = tmp_path / "rates.csv"
+    rates_file_path.write_text(header + old_lines)
+    return rates_file_path
+
+
+def test_new_dates_are_appended(rates_file_path: Path) -> None:
+    rates = parse_rates_from_csv(rates_file_path)
+    rates_reloader = RatesReloader(rates_file_path, rates)
+
+    rates_file_path.write_text(header + "2021-04-09,1.1888,N/A,\n" + old_lines)
+
+    assert rates_reloader.reload() == 1
+    reloaded = rates_reloader.current_rates()
+    assert reloaded.dates == ["2021-04-07", "2021-04-08", "2021-04-09"]
+    assert reloaded.date_index.find("2021-04-09") == 2
+    assert reloaded.rates[2, 1] == 1.1888
+    assert math.isnan(reloaded.rates[2, 2])
+    assert reloaded.version == 1
+    # requests still reading the old store are not affected
+    assert rates.dates == ["2021-04-07", "2021-04-08"]
+    assert rates.version == 0
+
+    assert rates_reloader.reload() == 0
+    assert rates_reloader.current_rates() is reloaded
+
+
+def test_changed_rows_reload_the_whole_file(rates_file_path: Path) -> None:
+    rates_reloader = RatesReloader(
+        rates_file_path, parse_rates_from_csv(rates_file_path)
+    )
+
+    # the last date of the store is gone from the file
+    rates_file_path.write_text(
+        header + "2021-04-09,1.1888,130.42,\n2021-04-07,1.19,130.0,\n"
+    )
+
+    assert rates_reloader.reload() == 0
+    reloaded = rates_reloader.current_rates()
+    assert reloaded.dates == ["2021-04-07", "2021-04-09"]
+    assert reloaded.version == 1
+
+
+def test_reload_releases_the_cached_history(rates_file_path: Path) -> None:
+    rates = parse_rates_from_csv(rates_file_path)
+    current: list[RatesStore] = [rates]
+    client = create_app(lambda: current[0]).test_client()
+
+    assert client.get("/api/2021-04-08?base=USD").status_code == 200
+    assert client.get("/api/2021-04-08/matrix").status_code == 200
+    assert (
+        client.get("/api/stats?start=2021-04-07&end=2021-04-08").status_code
+        == 200
+    )
+
+    old_rates = weakref.ref(rates)
+    current[0] = rates.extended(["2021-04-09"], rates.rates[-1:])
+    del rates
+    assert client.get("/api/2021-04-09?base=USD").status_code == 200
+
+    gc.collect()
+    assert old_rates() is None
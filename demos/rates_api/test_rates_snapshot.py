@@ -0,0 +1,77 @@
+from pathlib import Path
+import os
+
+import numpy as np
+import pytest
+
+from rates_api.rates_data import load_rates_from_history
+from rates_api.rates_snapshot import (
+    read_snapshot,
+    read_snapshot_header,
+    snapshot_path_for,
+)
+
+rates_csv = """Date,USD,JPY,
+2021-04-09,1.1888,N/A,
+2021-04-08,1.1873,129.71,
+"""
+
+
+@pytest.fixture
+def rates_file_path(tmp_path: Path) -> Path:
+    rates_file_path = tmp_path / "rates.csv"
+    rates_file_path.write_text(rates_csv, encoding="UTF-8")
+    return rates_file_path
+
+
+def test_snapshot_is_written_then_mapped(rates_file_path: Path) -> None:
+    parsed = load_rates_from_history(rates_file_path)
+    mapped = load_rates_from_history(rates_file_path)
+
+    assert snapshot_path_for(rates_file_path).exists()
+    assert not isinstance(parsed.rates, np.memmap)
+    assert isinstance(mapped.rates, np.memmap)
+    assert mapped.dates == ["2021-04-08", "2021-04-09"]
+    assert mapped.currencies == ["EUR", "USD", "JPY"]
+    np.testing.assert_array_equal(mapped.rates, parsed.rates)
+
+
+def test_changed_file_invalidates_snapshot(rates_file_path: Path) -> None:
+    load_rates_from_history(rates_file_path)
+    rates_file_path.write_text(
+        rates_csv.replace("1.1888", "1.2000"), encoding="UTF-8"
+    )
+
+    rates = load_rates_from_history(rates_file_path)
+
+    assert rates.rates[1, 1] == 1.2
+
+
+def test_touched_file_refreshes_snapshot_stat(rates_file_path: Path) -> None:
+    load_rates_from_history(rates_file_path)
+    rates_file_stat = rates_file_path.stat()
+    os.utime(
+        rates_file_path,
+        ns=(rates_file_stat.st_atime_ns, rates_file_stat.st_mtime_ns + 10**9),
+    )
+
+    snapshot_path = snapshot_path_for(rates_file_path)
+    assert read_snapshot(snapshot_path, rates_file_path) is not None
+
+    header = read_snapshot_header(snapshot_path)
+    assert header is not None
+    assert header["source_mtime_ns"] == rates_file_path.stat().st_mtime_ns
+
+
+def test_truncated_snapshot_is_rebuilt(rates_file_path: Path) -> None:
+    load_rates_from_history(rates_file_path)
+    snapshot_path = snapshot_path_for(rates_file_path)
+    header = read_snapshot_header(snapshot_path)
+    assert header is not None
+    os.truncate(snapshot_path, header["data_offset"] + 8)
+
+    assert read_snapshot(snapshot_path, rates_file_path) is None
+
+    rates = load_rates_from_history(rates_file_path)
+    assert rates.dates == ["2021-04-08", "2021-04-09"]
+    assert read_snapshot(snapshot_path, rates_file_path) is not None
@@ -0,0 +1,51 @@
+import numpy as np
+import numpy.typing as npt
+import pytest
+
+from rates_api.rates_stats import RollingStats
+
+
+def brute_force(
+    values: npt.NDArray[np.float64], end: int, window: int
+) -> dict[str, float]:
+    if end - window + 1 < 0:
+        return dict.fromkeys(("mean", "std", "min", "max"), np.nan)
+    window_values = values[end - window + 1 : end + 1]
+    window_values = window_values[~np.isnan(window_values)]
+    if not len(window_values):
+        return dict.fromkeys(("mean", "std", "min", "max"), np.nan)
+    return {
+        "mean": window_values.mean(),
+        "std": window_values.std(ddof=1) if len(window_values) > 1 else np.nan,
+        "min": window_values.min(),
+        "max": window_values.max(),
+    }
+
+
+@pytest.mark.parametrize("window", [1, 2, 3, 7, 16, 50, 100, 101])
+def test_windows_match_brute_force(window: int) -> None:
+    rng = np.random.default_rng(25)
+    # large rates with small moves, as for IDR, and a few missing rates
+    values = 14000.0 + rng.normal(0.0, 5.0, 100)
+    values[rng.choice(100, 15, replace=False)] = np.nan
+    values[40:48] = np.nan
+
+    ends = np.arange(100)
+    window_stats = RollingStats(values).window(ends, window)
+
+    for end in ends:
+        expected = brute_force(values, int(end), window)
+        for name, value in expected.items():
+            np.testing.assert_allclose(
+                window_stats[name][end],
+                value,
+                rtol=1e-9,
+                err_msg=f"{name} of the window ending at {end}",
+            )
+
+
+def test_no_rates() -> None:
+    window_stats = RollingStats(np.full(4, np.nan)).window(np.arange(4), 2)
+
+    for values in window_stats.values():
+        assert np.isnan(values).all()
@@ -0,0 +1,127 @@
+"""cache warmer module
+
+Loads a range of rates into the database before clients ask for them, so
+a fresh or cleared database does not send the first wave of client
+commands to the Rates API one rate at a time. The range is split into
+chunks of at most max_batch_rates rates, each chunk is downloaded with one
+/api/range request and stored with one bulk insert, and a few chunks are
+loaded at a time in the background.
+"""
+
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from datetime import date
+import logging
+import threading
+import time
+
+from rates_api.business_days import get_calendar
+from rates_app.rate_cache import RateCacheKey
+from rates_app.rate_lookup import RateLookup, max_batch_rates
+
+
+def warm_chunks(
+    start_date: str,
+    end_date: str,
+    currency_symbols: list[str],
+    chunk_rates: int = max_batch_rates,
+) -> list[list[RateCacheKey]]:
+    """the (date, currency) keys of the range, in chunks of whole dates"""
+
+    market_dates = (
+        get_calendar("ECB")
+        .date_range(
+            date.fromisoformat(start_date), date.fromisoformat(end_date)
+        )
+        .tolist()
+    )
+    chunk_dates = max(1, chunk_rates // len(currency_symbols))
+
+    return [
+        [
+            (market_date, currency_symbol)
+            for market_date in market_dates[position : position + chunk_dates]
+            for currency_symbol in currency_symbols
+        ]
+        for position in range(0, len(market_dates), chunk_dates)
+    ]
+
+
+@dataclass
+class WarmProgress:
+    start_date: str
+    end_date: str
+    currency_symbols: list[str]
+    total_chunks: int
+    done_chunks: int = 0
+    failed_chunks: int = 0
+    rates: int = 0
+    started: float = field(default_factory=time.perf_counter)
+    finished: float | None = None
+
+    def __str__(self) -> str:
+        elapsed = (self.finished or time.perf_counter()) - self.started
+        return (
+            f"warm {self.start_date} to {self.end_date} "
+            f"{','.join(self.currency_symbols)}: "
+            f"{self.done_chunks} of {self.total_chunks} chunks, "
+            f"{self.failed_chunks} failed, {self.rates} rates, "
+            f"{elapsed:.1f}s{' (finished)' if self.finished else ''}"
+        )
+
+
+class CacheWarmer:
+    """loads ranges of rates in a background thread"""
+
+    def __init__(self, rate_lookup: RateLookup, concurrency: int = 4) -> None:
+        self.rate_lookup = rate_lookup
+        self.concurrency = concurrency
+        self.progress: WarmProgress | None = None
+        self.__thread: threading.Thread | None = None
+
+    @property
+    def running(self) -> bool:
+        return self.__thread is not None and self.__thread.is_alive()
+
+    def warm(
+        self, start_date: str, end_date: str, currency_symbols: list[str]
+    ) -> WarmProgress:
+        """start loading the range, returns the progress it updates"""
+
+        if self.running:
+            raise RuntimeError("the cache is already being warmed")
+
+        chunks = warm_chunks(start_date, end_date, currency_symbols)
+        self.progress = WarmProgress(
+            start_date, end_date, currency_symbols, len(chunks)
+        )
+        self.__thread = threading.Thread(
+            target=self.__warm_chunks,
+            args=(chunks, self.progress),
+            daemon=True,
+        )
+        self.__thread.start()
+        return self.progress
+
+    def __warm_chunks(
+        self, chunks: list[list[RateCacheKey]], progress: WarmProgress
+    ) -> None:
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            chunk_loads = [
+                executor.submit(self.rate_lookup.get_rates, chunk)
+                for chunk in chunks
+            ]
+            for chunk_load in as_completed(chunk_loads):
+                try:
+                    chunk_rates = len(chunk_load.result())
+                except Exception as exc:
+                    logging.log(logging.WARNING, "Warm Failed", exc_info=exc)
+                    progress.failed_chunks += 1
+                    continue
+
+                # only this thread updates the progress
+                progress.done_chunks += 1
+                progress.rates += chunk_rates
+
+        progress.finished = time.perf_counter()
+        print(progress)
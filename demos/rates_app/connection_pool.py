@@ -0,0 +1,169 @@
+"""connection pool module
+
+Admission control for the rate server. Accepted connections wait in a
+bounded queue for one of a fixed number of worker threads, instead of each
+getting a new thread. When the queue is full the backlog policy decides
+what happens to a new connection:
+
+    queue  - wait for room in the queue, the listening socket's backlog
+             holds further connections until the server accepts them
+    reject - answer "Server Busy" and close the new connection
+    shed   - close the connection that has waited on a read the longest to
+             make room for the new one, connections whose commands are
+             being handled are never shed
+"""
+
+from collections.abc import Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass
+from multiprocessing.sharedctypes import Synchronized
+from typing import cast
+import multiprocessing as mp
+import queue
+import socket
+import threading
+import time
+
+BACKLOG_POLICIES = ("queue", "reject", "shed")
+
+SERVER_BUSY_MESSAGE = b"Server Busy"
+
+
+@dataclass
+class ServerOptions:
+    max_connections: int = 64
+    backlog_policy: str = "queue"
+    queue_size: int = 64
+    idle_timeout_seconds: float | None = 300.0
+    listen_backlog: int = 128
+    # set when several server processes listen on the same port, the kernel
+    # spreads the new connections across their listening sockets
+    reuse_port: bool = False
+
+
+class ConnectionStats:
+    """connection counters shared by the server and the admin prompt"""
+
+    def __init__(self) -> None:
+        self.queued: Synchronized = cast(Synchronized, mp.Value("q", 0))
+        self.rejected: Synchronized = cast(Synchronized, mp.Value("q", 0))
+        self.shed: Synchronized = cast(Synchronized, mp.Value("q", 0))
+        self.timed_out: Synchronized = cast(Synchronized, mp.Value("q", 0))
+
+    @staticmethod
+    def add(counter: Synchronized, amount: int = 1) -> None:
+        with counter.get_lock():
+            counter.value += amount
+
+    def __str__(self) -> str:
+        return (
+            f"{self.queued.value} queued, "
+            f"{self.rejected.value} rejected, "
+            f"{self.shed.value} shed, "
+            f"{self.timed_out.value} timed out"
+        )
+
+
+class ConnectionPool:
+    """bounded queue of accepted connections for the worker threads"""
+
+    def __init__(
+        self,
+        options: ServerOptions,
+        stats: ConnectionStats,
+        counter: Synchronized,
+    ) -> None:
+        if options.backlog_policy not in BACKLOG_POLICIES:
+            raise ValueError(
+                f"backlog policy must be one of {', '.join(BACKLOG_POLICIES)}"
+            )
+
+        self.options = options
+        self.stats = stats
+        self.__counter = counter
+        self.__connections: queue.Queue[socket.socket] = queue.Queue(
+            options.queue_size
+        )
+        # last activity time of the connections the workers are serving
+        self.__active: dict[socket.socket, float] = {}
+        # connections whose commands a worker is handling
+        self.__busy: set[socket.socket] = set()
+        self.__active_lock = threading.Lock()
+
+    def admit(self, conn: socket.socket) -> None:
+        """queue a new connection according to the backlog policy"""
+
+        try:
+            self.__connections.put_nowait(conn)
+        except queue.Full:
+            if self.options.backlog_policy == "reject":
+                self.__reject(conn)
+                return
+            if self.options.backlog_policy == "shed":
+                self.__shed_idle_connection()
+            self.__connections.put(conn)
+
+        ConnectionStats.add(self.stats.queued)
+
+    def __reject(self, conn: socket.socket) -> None:
+        ConnectionStats.add(self.stats.rejected)
+        try:
+            conn.sendall(SERVER_BUSY_MESSAGE)
+        except OSError:
+            pass
+        conn.close()
+
+    def __shed_idle_connection(self) -> None:
+        with self.__active_lock:
+            idle_conns = [
+                conn for conn in self.__active if conn not in self.__busy
+            ]
+            if not idle_conns:
+                return
+            idle_conn = min(idle_conns, key=self.__active.__getitem__)
+            del self.__active[idle_conn]
+
+        ConnectionStats.add(self.stats.shed)
+        # the worker blocked on recv sees the connection close, and takes
+        # the next connection from the queue
+        try:
+            idle_conn.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+    def next_connection(self) -> socket.socket:
+        """wait for a queued connection, called by the worker threads"""
+
+        conn = self.__connections.get()
+        ConnectionStats.add(self.stats.queued, -1)
+
+        conn.settimeout(self.options.idle_timeout_seconds)
+        with self.__active_lock:
+            self.__active[conn] = time.monotonic()
+        # the counter is incremented and decremented by the same worker, so
+        # it cannot go negative under connection churn
+        with self.__counter.get_lock():
+            self.__counter.value += 1
+        return conn
+
+    @contextmanager
+    def busy(self, conn: socket.socket) -> Iterator[None]:
+        """mark a connection busy while its commands are handled"""
+
+        with self.__active_lock:
+            self.__busy.add(conn)
+        try:
+            yield
+        finally:
+            with self.__active_lock:
+                self.__busy.discard(conn)
+                if conn in self.__active:
+                    self.__active[conn] = time.monotonic()
+
+    def release(self, conn: socket.socket) -> None:
+        with self.__active_lock:
+            self.__active.pop(conn, None)
+            self.__busy.discard(conn)
+        with self.__counter.get_lock():
+            self.__counter.value -= 1
+        conn.close()
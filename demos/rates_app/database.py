@@ -1,13 +1,57 @@
-from sqlalchemy import create_engine
+from typing import Any
+import os
+from sqlalchemy import Engine, create_engine, event
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
 
-engine = create_engine(
-    "sqlite:///./rates_app.sqlite3",
-    connect_args={"check_same_thread": False},
-    echo=False,
+# the database file of the rates cache, server processes started after
+# use_database inherit the file it set
+DATABASE_PATH_VARIABLE = "RATES_APP_DATABASE"
+
+
+def set_sqlite_pragmas(dbapi_connection: Any, connection_record: Any) -> None:
+    cursor = dbapi_connection.cursor()
+    # WAL lets the server threads read while another thread writes
+    cursor.execute("PRAGMA journal_mode=WAL")
+    # in WAL mode NORMAL is safe from corruption, a power loss can only lose
+    # the last cached rates, which are downloaded again
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    # 16 MB page cache per connection (negative values are in KiB)
+    cursor.execute("PRAGMA cache_size=-16000")
+    # read the database through a 256 MB memory map
+    cursor.execute("PRAGMA mmap_size=268435456")
+    # wait for a lock held by another server process instead of failing
+    cursor.execute("PRAGMA busy_timeout=5000")
+    cursor.close()
+
+
+def create_database_engine(database_path: str) -> Engine:
+    database_engine = create_engine(
+        f"sqlite:///{database_path}",
+        connect_args={"check_same_thread": False},
+        echo=False,
+    )
+    event.listen(database_engine, "connect", set_sqlite_pragmas)
+    return database_engine
+
+
+engine = create_database_engine(
+    os.environ.get(DATABASE_PATH_VARIABLE, "./rates_app.sqlite3")
 )
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
+
+
+def use_database(database_path: str) -> Engine:
+    """switch the sessions of this process and its children to the file
+
+    Forked server processes inherit the switched sessions, spawned ones
+    open the file from the environment variable.
+    """
+
+    os.environ[DATABASE_PATH_VARIABLE] = database_path
+    database_engine = create_database_engine(database_path)
+    SessionLocal.configure(bind=database_engine)
+    return database_engine
@@ -0,0 +1,380 @@
+"""load generator module
+
+Measures the rate server under load. Each connection replays a mix of GET
+commands for hot and cold (date, currency) keys, with the key popularity
+following a Zipf distribution, plus "count" commands and "exit" commands
+that reconnect. The connections run as threads spread over a few worker
+processes, so the load generator is not held to one interpreter either.
+
+main compares the server modes against the upstream stub, each one
+starting from an empty database of its own in a temporary folder, with the
+same seeded command mix. The rates_app.sqlite3 cache is left alone.
+
+to run the program, change into the `demos` folder, then
+run the following command:
+python -m rates_app.load_generator
+"""
+
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import date
+from multiprocessing.sharedctypes import Synchronized
+from pathlib import Path
+from typing import cast
+import multiprocessing as mp
+import socket
+import tempfile
+import time
+
+import numpy as np
+import numpy.typing as npt
+
+from rates_api.business_days import get_calendar
+from rates_app.connection_pool import ConnectionStats, ServerOptions
+from rates_app.database import use_database
+from rates_app.metrics import ServerMetrics
+from rates_app.migrations import migrate_database
+from rates_app.rate_cache import CacheStats, RateCache
+from rates_app.rates_client import RatesConnection
+from rates_app.rates_server import command_start_server, stop_server_processes
+from rates_app.upstream_client import (
+    UpstreamClient,
+    UpstreamOptions,
+    UpstreamStats,
+)
+from rates_app.upstream_stub import StubOptions, upstream_stub
+
+COMMAND_KINDS = ("get", "count", "connect")
+
+
+@dataclass
+class LoadOptions:
+    host: str = "127.0.0.1"
+    port: int = 5050
+    connections: int = 32
+    worker_processes: int = 4
+    # commands sent during the warm up fill the caches and are not measured
+    warmup_seconds: float = 2.0
+    duration_seconds: float = 10.0
+    # keys are every ECB business day of the years times the symbols
+    start_year: int = 2010
+    end_year: int = 2020
+    currency_symbols: tuple[str, ...] = (
+        "EUR",
+        "JPY",
+        "GBP",
+        "CHF",
+        "CAD",
+        "AUD",
+        "SEK",
+        "NOK",
+    )
+    # larger exponents concentrate the GETs on fewer hot keys
+    zipf_exponent: float = 1.1
+    count_ratio: float = 0.01
+    exit_ratio: float = 0.001
+    seed: int = 1
+
+
+@dataclass
+class LoadResult:
+    """latencies in seconds by command kind, and the failure counts"""
+
+    latencies: dict[str, npt.NDArray[np.float64]] = field(
+        default_factory=lambda: {
+            kind: np.empty(0, dtype=np.float64) for kind in COMMAND_KINDS
+        }
+    )
+    errors: int = 0
+    rejected: int = 0
+    # the measured time, after the warm up
+    duration_seconds: float = 0.0
+
+    def merge(self, other: "LoadResult") -> None:
+        for kind in COMMAND_KINDS:
+            self.latencies[kind] = np.concatenate(
+                (self.latencies[kind], other.latencies[kind])
+            )
+        self.errors += other.errors
+        self.rejected += other.rejected
+
+    def __str__(self) -> str:
+        commands = sum(
+            len(self.latencies[kind]) for kind in ("get", "count")
+        )
+        lines = [
+            f"{commands} commands in {self.duration_seconds:.1f}s, "
+            f"{commands / self.duration_seconds:,.0f} commands/s, "
+            f"{self.errors} errors, {self.rejected} rejected connections"
+        ]
+        for kind in COMMAND_KINDS:
+            latencies = self.latencies[kind]
+            if not len(latencies):
+                continue
+            p50, p90, p99 = np.percentile(latencies, [50, 90, 99]) * 1000
+            lines.append(
+                f"  {kind:>7}: {len(latencies):>8} "
+                f"p50 {p50:.3f} ms, p90 {p90:.3f} ms, p99 {p99:.3f} ms, "
+                f"max {latencies.max() * 1000:.3f} ms"
+            )
+        return "\n".join(lines)
+
+
+def load_keys(options: LoadOptions) -> list[tuple[str, str]]:
+    """the keys in popularity order, shuffled with the seed"""
+
+    market_dates = (
+        get_calendar("ECB")
+        .date_range(
+            date(options.start_year, 1, 1), date(options.end_year, 12, 31)
+        )
+        .tolist()
+    )
+    keys = [
+        (market_date, currency_symbol)
+        for market_date in market_dates
+        for currency_symbol in options.currency_symbols
+    ]
+    # the hottest keys are spread over the dates and symbols instead of
+    # being the first dates of the range
+    order = np.random.default_rng(options.seed).permutation(len(keys))
+    return [keys[position] for position in order]
+
+
+def zipf_cumulative_weights(
+    key_count: int, exponent: float
+) -> npt.NDArray[np.float64]:
+    weights = 1.0 / np.arange(1, key_count + 1, dtype=np.float64) ** exponent
+    cumulative_weights = np.cumsum(weights)
+    return cumulative_weights / cumulative_weights[-1]
+
+
+def connect(options: LoadOptions, deadline: float) -> RatesConnection | None:
+    """a new connection, None if the server kept rejecting until deadline"""
+
+    while time.monotonic() < deadline:
+        try:
+            return RatesConnection(options.host, options.port, timeout=30)
+        except OSError:
+            # "Server Busy", or the connection was shed before it started
+            time.sleep(0.01)
+    return None
+
+
+def run_connection(
+    options: LoadOptions,
+    connection_index: int,
+    keys: list[tuple[str, str]],
+    cumulative_weights: npt.NDArray[np.float64],
+    measure_from: float,
+    deadline: float,
+) -> LoadResult:
+    rng = np.random.default_rng((options.seed, connection_index))
+    latencies: dict[str, list[float]] = {kind: [] for kind in COMMAND_KINDS}
+    result = LoadResult()
+
+    def record(kind: str, started: float, error: bool = False) -> None:
+        if time.monotonic() >= measure_from:
+            latencies[kind].append(time.perf_counter() - started)
+            result.errors += error
+
+    started = time.perf_counter()
+    rates_connection = connect(options, deadline)
+    record("connect", started)
+
+    while rates_connection is not None and time.monotonic() < deadline:
+        # the commands are drawn in blocks to keep numpy out of the loop
+        kind_draws = rng.random(1024).tolist()
+        key_positions = np.searchsorted(
+            cumulative_weights, rng.random(1024)
+        ).tolist()
+
+        for kind_draw, key_position in zip(kind_draws, key_positions):
+            if kind_draw < options.exit_ratio:
+                rates_connection.close()
+                started = time.perf_counter()
+                rates_connection = connect(options, deadline)
+                record("connect", started)
+                if rates_connection is None:
+                    break
+                continue
+
+            if kind_draw < options.exit_ratio + options.count_ratio:
+                kind, command, expected = "count", "count", "connected"
+            else:
+                market_date, currency_symbol = keys[key_position]
+                kind = "get"
+                command = f"GET {market_date} {currency_symbol}"
+                expected = f"{currency_symbol}:"
+
+            started = time.perf_counter()
+            try:
+                response = rates_connection.send_command(command)
+            except OSError:
+                record(kind, started, error=True)
+                try:
+                    rates_connection.close()
+                finally:
+                    rates_connection = connect(options, deadline)
+                break
+            record(kind, started, error=expected not in response)
+
+            if time.monotonic() >= deadline:
+                break
+
+    if rates_connection is None:
+        result.rejected += 1
+    else:
+        rates_connection.close()
+
+    for kind in COMMAND_KINDS:
+        result.latencies[kind] = np.array(latencies[kind], dtype=np.float64)
+    return result
+
+
+def run_worker(
+    options: LoadOptions,
+    connection_indexes: list[int],
+    measure_from: float,
+    deadline: float,
+) -> LoadResult:
+    """the connections of one worker process, one thread each"""
+
+    keys = load_keys(options)
+    cumulative_weights = zipf_cumulative_weights(
+        len(keys), options.zipf_exponent
+    )
+
+    result = LoadResult()
+    with ThreadPoolExecutor(max_workers=len(connection_indexes)) as executor:
+        for connection_result in executor.map(
+            lambda connection_index: run_connection(
+                options,
+                connection_index,
+                keys,
+                cumulative_weights,
+                measure_from,
+                deadline,
+            ),
+            connection_indexes,
+        ):
+            result.merge(connection_result)
+    return result
+
+
+def run_load(options: LoadOptions) -> LoadResult:
+    worker_connections = [
+        list(range(worker, options.connections, options.worker_processes))
+        for worker in range(options.worker_processes)
+    ]
+    worker_connections = [
+        connection_indexes
+        for connection_indexes in worker_connections
+        if connection_indexes
+    ]
+
+    # time.monotonic is the same clock in every process on the machine
+    measure_from = time.monotonic() + options.warmup_seconds
+    deadline = measure_from + options.duration_seconds
+
+    result = LoadResult()
+    with ProcessPoolExecutor(max_workers=len(worker_connections)) as executor:
+        for worker_result in executor.map(
+            run_worker,
+            [options] * len(worker_connections),
+            worker_connections,
+            [measure_from] * len(worker_connections),
+            [deadline] * len(worker_connections),
+        ):
+            result.merge(worker_result)
+
+    result.duration_seconds = options.duration_seconds
+    return result
+
+
+def wait_for_port(host: str, port: int, timeout_seconds: float) -> None:
+    deadline = time.monotonic() + timeout_seconds
+    while True:
+        try:
+            with socket.create_connection((host, port), timeout=1):
+                return
+        except OSError:
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(0.1)
+
+
+def start_rate_server(
+    options: LoadOptions,
+    upstream_url: str,
+    server_mode: str,
+    process_count: int,
+    database_path: Path,
+) -> list[mp.Process]:
+    """rate server processes with the default settings of rates_server
+
+    The servers cache the rates in a new database at database_path.
+    """
+
+    # every mode starts from an empty database and empty caches
+    migrate_database(use_database(str(database_path)))
+
+    server_processes = command_start_server(
+        [],
+        options.host,
+        options.port,
+        cast(Synchronized, mp.Value("i", 0)),
+        RateCache(10_000, 3600.0, CacheStats()),
+        UpstreamClient(
+            UpstreamOptions(base_url=upstream_url), UpstreamStats()
+        ),
+        ServerMetrics(),
+        ServerOptions(),
+        ConnectionStats(),
+        server_mode,
+        process_count,
+    )
+    wait_for_port(options.host, options.port, 10)
+    return server_processes
+
+
+def main() -> None:
+    """Main Function"""
+
+    load_options = LoadOptions(connections=32, duration_seconds=10.0)
+    stub_host, stub_port = "127.0.0.1", 8090
+    # every upstream request takes 20 to 30 ms
+    stub_options = StubOptions(latency_seconds=0.02, jitter_seconds=0.01)
+    server_modes = [("thread", 1), ("async", 1), ("thread", 4), ("async", 4)]
+
+    stub_process = mp.Process(
+        target=upstream_stub,
+        args=(stub_host, stub_port, stub_options),
+        daemon=True,
+    )
+    stub_process.start()
+    wait_for_port(stub_host, stub_port, 10)
+
+    try:
+        with tempfile.TemporaryDirectory() as database_folder:
+            for server_mode, process_count in server_modes:
+                server_processes = start_rate_server(
+                    load_options,
+                    f"http://{stub_host}:{stub_port}",
+                    server_mode,
+                    process_count,
+                    Path(database_folder)
+                    / f"rates_app_{server_mode}_{process_count}.sqlite3",
+                )
+                try:
+                    result = run_load(load_options)
+                finally:
+                    stop_server_processes(server_processes)
+
+                print(f"{server_mode} x {process_count}: {result}")
+    finally:
+        stub_process.terminate()
+
+
+if __name__ == "__main__":
+    main()
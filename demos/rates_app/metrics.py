@@ -0,0 +1,206 @@
+"""metrics module"""
+
+from bisect import bisect_left
+from multiprocessing.synchronize import Lock
+import multiprocessing as mp
+import time
+
+# upper bounds of the latency buckets, latencies above the last bound are
+# counted in an overflow bucket
+LATENCY_BUCKETS_SECONDS = (
+    0.00001,
+    0.000025,
+    0.00005,
+    0.0001,
+    0.00025,
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+# the stages of a client command timed by the rate servers, "upstream" is
+# the Rates API requests of cache misses and "command" is the whole command
+# from the start of parsing to the response
+SERVER_STAGES = ("parse", "database", "upstream", "write", "command")
+
+# (stage, seconds) timings collected while answering a batch of commands
+StageTimings = list[tuple[str, float]]
+
+
+class LatencyHistogram:
+    """latency histogram shared by the server processes and the admin prompt
+
+    Latencies are counted in fixed buckets, so recording one is a few
+    integer increments and the counts of every process add up in shared
+    memory. Percentiles are reported as the upper bound of the bucket they
+    fall in. Histograms can share a lock, so a caller holding it can record
+    into several of them at once with add.
+    """
+
+    def __init__(
+        self,
+        buckets: tuple[float, ...] = LATENCY_BUCKETS_SECONDS,
+        lock: Lock | None = None,
+    ) -> None:
+        self.buckets = buckets
+        self.lock = lock or mp.Lock()
+        self.counts = mp.Array("q", len(buckets) + 1, lock=False)
+        self.total_seconds = mp.Value("d", 0.0, lock=False)
+
+    def add(self, bucket_counts: dict[int, int], seconds: float) -> None:
+        """record counts per bucket position, the caller holds the lock"""
+
+        for position, bucket_count in bucket_counts.items():
+            self.counts[position] += bucket_count
+        self.total_seconds.value += seconds
+
+    def observe(self, seconds: float) -> None:
+        position = bisect_left(self.buckets, seconds)
+        with self.lock:
+            self.counts[position] += 1
+            self.total_seconds.value += seconds
+
+    def snapshot(self) -> tuple[list[int], float]:
+        """the bucket counts and the total seconds, read together"""
+
+        with self.lock:
+            return self.counts[:], self.total_seconds.value
+
+    def count(self) -> int:
+        return sum(self.snapshot()[0])
+
+    def percentile(self, fraction: float) -> float:
+        """upper bound of the bucket holding the percentile, in seconds
+
+        inf when the percentile falls in the overflow bucket, 0.0 when
+        nothing was recorded.
+        """
+
+        counts, _ = self.snapshot()
+        total = sum(counts)
+        if not total:
+            return 0.0
+
+        rank = fraction * total
+        seen = 0
+        for bound, bucket_count in zip(self.buckets, counts):
+            seen += bucket_count
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+    def __str__(self) -> str:
+        counts, total_seconds = self.snapshot()
+        total = sum(counts)
+        if not total:
+            return "0 requests"
+        return (
+            f"{total} requests, "
+            f"mean {total_seconds / total * 1000:.3f} ms, "
+            f"p50 <= {self.percentile(0.5) * 1000:g} ms, "
+            f"p99 <= {self.percentile(0.99) * 1000:g} ms"
+        )
+
+    def bucket_lines(self) -> list[str]:
+        """one line per non-empty bucket, for tuning timeouts"""
+
+        counts, _ = self.snapshot()
+        bounds = [f"<= {bound * 1000:g} ms" for bound in self.buckets]
+        bounds.append(f"> {self.buckets[-1] * 1000:g} ms")
+        return [
+            f"{bound:>12}: {bucket_count}"
+            for bound, bucket_count in zip(bounds, counts)
+            if bucket_count
+        ]
+
+    def prometheus_lines(self, name: str, labels: str = "") -> list[str]:
+        """the histogram in the Prometheus text format, without HELP/TYPE"""
+
+        counts, total_seconds = self.snapshot()
+        label_prefix = f"{labels}," if labels else ""
+        lines: list[str] = []
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets, counts):
+            cumulative += bucket_count
+            lines.append(
+                f'{name}_bucket{{{label_prefix}le="{bound:g}"}} {cumulative}'
+            )
+        lines.append(
+            f'{name}_bucket{{{label_prefix}le="+Inf"}} {sum(counts)}'
+        )
+        label_set = f"{{{labels}}}" if labels else ""
+        lines.append(f"{name}_sum{label_set} {total_seconds}")
+        lines.append(f"{name}_count{label_set} {sum(counts)}")
+        return lines
+
+
+class ServerMetrics:
+    """command metrics shared by the server processes and the admin prompt
+
+    The servers collect the stage timings of a batch of pipelined commands
+    in a plain list and record them with commands_finished. The timings are
+    counted per bucket in local dicts first, so the shared memory is locked
+    twice per batch and written once per bucket used instead of once per
+    timing.
+    """
+
+    def __init__(self) -> None:
+        self.lock = mp.Lock()
+        self.latency = {
+            stage: LatencyHistogram(lock=self.lock) for stage in SERVER_STAGES
+        }
+        self.commands = mp.Value("q", 0, lock=False)
+        self.in_flight = mp.Value("q", 0, lock=False)
+        # the previous commands_per_second sample, taken by the admin prompt
+        self.__sample = (0, time.monotonic())
+
+    def observe(self, stage: str, started: float) -> None:
+        """record the time since started, a time.perf_counter value"""
+
+        self.latency[stage].observe(time.perf_counter() - started)
+
+    def commands_started(self, command_count: int) -> None:
+        with self.lock:
+            self.in_flight.value += command_count
+
+    def commands_finished(
+        self, command_count: int, stage_timings: StageTimings
+    ) -> None:
+        bucket_counts: dict[str, dict[int, int]] = {
+            stage: {} for stage in self.latency
+        }
+        stage_seconds = dict.fromkeys(self.latency, 0.0)
+        for stage, seconds in stage_timings:
+            position = bisect_left(LATENCY_BUCKETS_SECONDS, seconds)
+            stage_buckets = bucket_counts[stage]
+            stage_buckets[position] = stage_buckets.get(position, 0) + 1
+            stage_seconds[stage] += seconds
+
+        with self.lock:
+            for stage, histogram in self.latency.items():
+                if bucket_counts[stage]:
+                    histogram.add(bucket_counts[stage], stage_seconds[stage])
+            self.in_flight.value -= command_count
+            self.commands.value += command_count
+
+    def commands_per_second(self) -> float:
+        """commands per second since the previous call"""
+
+        commands = self.commands.value
+        now = time.monotonic()
+        sample_commands, sample_time = self.__sample
+        self.__sample = (commands, now)
+        if now == sample_time:
+            return 0.0
+        return (commands - sample_commands) / (now - sample_time)
@@ -0,0 +1,153 @@
+"""metrics server module
+
+Serves the shared server metrics in the Prometheus text format from the
+admin process. The counters and histograms live in shared memory, so one
+endpoint covers every server process.
+"""
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from multiprocessing.sharedctypes import Synchronized
+from typing import Callable
+import threading
+
+from rates_app.connection_pool import ConnectionStats
+from rates_app.metrics import ServerMetrics
+from rates_app.rate_cache import CacheStats
+from rates_app.upstream_client import UpstreamStats
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def prometheus_text(
+    server_metrics: ServerMetrics,
+    counter: Synchronized,
+    connection_stats: ConnectionStats,
+    cache_stats: CacheStats,
+    upstream_stats: UpstreamStats,
+) -> str:
+    lines: list[str] = []
+
+    def add_metric(
+        name: str, metric_type: str, help_text: str, values: list[str]
+    ) -> None:
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {metric_type}")
+        lines.extend(values)
+
+    add_metric(
+        "rates_server_commands_total",
+        "counter",
+        "Client commands answered.",
+        [f"rates_server_commands_total {server_metrics.commands.value}"],
+    )
+    add_metric(
+        "rates_server_commands_in_flight",
+        "gauge",
+        "Client commands being answered.",
+        [f"rates_server_commands_in_flight {server_metrics.in_flight.value}"],
+    )
+    add_metric(
+        "rates_server_stage_seconds",
+        "histogram",
+        "Time spent in each stage of a client command.",
+        [
+            line
+            for stage, histogram in server_metrics.latency.items()
+            for line in histogram.prometheus_lines(
+                "rates_server_stage_seconds", f'stage="{stage}"'
+            )
+        ],
+    )
+    add_metric(
+        "rates_server_connected_clients",
+        "gauge",
+        "Connected clients.",
+        [f"rates_server_connected_clients {counter.value}"],
+    )
+    add_metric(
+        "rates_server_connections_queued",
+        "gauge",
+        "Connections waiting for a worker.",
+        [f"rates_server_connections_queued {connection_stats.queued.value}"],
+    )
+    add_metric(
+        "rates_server_connections_dropped_total",
+        "counter",
+        "Connections rejected, shed or timed out.",
+        [
+            f'rates_server_connections_dropped_total{{reason="{reason}"}} '
+            f"{dropped.value}"
+            for reason, dropped in (
+                ("rejected", connection_stats.rejected),
+                ("shed", connection_stats.shed),
+                ("timed_out", connection_stats.timed_out),
+            )
+        ],
+    )
+    add_metric(
+        "rates_server_cache_lookups_total",
+        "counter",
+        "In-memory rate cache lookups.",
+        [
+            f'rates_server_cache_lookups_total{{result="hit"}} '
+            f"{cache_stats.hits.value}",
+            f'rates_server_cache_lookups_total{{result="miss"}} '
+            f"{cache_stats.misses.value}",
+        ],
+    )
+    add_metric(
+        "rates_server_cache_evictions_total",
+        "counter",
+        "In-memory rate cache evictions.",
+        [f"rates_server_cache_evictions_total {cache_stats.evictions.value}"],
+    )
+    add_metric(
+        "rates_server_upstream_seconds",
+        "histogram",
+        "Rates API request latency.",
+        upstream_stats.latency.prometheus_lines(
+            "rates_server_upstream_seconds"
+        ),
+    )
+    add_metric(
+        "rates_server_upstream_failures_total",
+        "counter",
+        "Rates API requests that failed or were failed fast.",
+        [
+            f'rates_server_upstream_failures_total{{kind="{kind}"}} '
+            f"{failures.value}"
+            for kind, failures in (
+                ("failed", upstream_stats.failures),
+                ("fast", upstream_stats.fast_failures),
+            )
+        ],
+    )
+
+    return "\n".join(lines) + "\n"
+
+
+def start_metrics_server(
+    host: str, port: int, render: Callable[[], str]
+) -> ThreadingHTTPServer:
+    """serve GET /metrics in a background thread"""
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self) -> None:
+            if self.path != "/metrics":
+                self.send_error(404)
+                return
+
+            body = render().encode("UTF-8")
+            self.send_response(200)
+            self.send_header("Content-Type", PROMETHEUS_CONTENT_TYPE)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format: str, *args: object) -> None:
+            # scrapes are not worth a line at the admin prompt
+            pass
+
+    metrics_server = ThreadingHTTPServer((host, port), MetricsHandler)
+    threading.Thread(target=metrics_server.serve_forever, daemon=True).start()
+    return metrics_server
@@ -0,0 +1,57 @@
+"""database migrations module
+
+SQLite cannot add a constraint to an existing table, so schema changes to
+existing rates_app.sqlite3 files are made here. The schema version is kept
+in SQLite's user_version pragma.
+"""
+
+from sqlalchemy import Engine, text
+
+from rates_app.database import Base
+from rates_app.models import ExchangeRate
+
+SCHEMA_VERSION = 1
+
+
+def migrate_to_unique_rates_index(engine: Engine) -> None:
+    """version 1 - unique (market_date, currency_symbol) index"""
+
+    with engine.begin() as connection:
+        # keep the first row cached for each date and currency
+        connection.execute(
+            text(
+                "DELETE FROM exchange_rates WHERE id NOT IN ("
+                "SELECT MIN(id) FROM exchange_rates "
+                "GROUP BY market_date, currency_symbol)"
+            )
+        )
+        for index in ExchangeRate.__table__.indexes:
+            index.create(connection, checkfirst=True)
+
+
+migrations = [migrate_to_unique_rates_index]
+
+
+def migrate_database(engine: Engine) -> None:
+    """create the tables, or upgrade an existing database"""
+
+    with engine.begin() as connection:
+        schema_version = connection.execute(
+            text("PRAGMA user_version")
+        ).scalar_one()
+
+    if schema_version == 0:
+        with engine.connect() as connection:
+            has_tables = engine.dialect.has_table(connection, "exchange_rates")
+        if not has_tables:
+            # a new database is created with the current schema
+            Base.metadata.create_all(bind=engine)
+            schema_version = SCHEMA_VERSION
+
+    for version, migration in enumerate(migrations, start=1):
+        if schema_version < version:
+            migration(engine)
+            schema_version = version
+
+    with engine.begin() as connection:
+        connection.execute(text(f"PRAGMA user_version={schema_version}"))
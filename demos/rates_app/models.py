@@ -1,10 +1,22 @@
-from sqlalchemy import Column, Integer, String, Float
+from sqlalchemy import Column, Index, Integer, String, Float
 
 from rates_app.database import Base
 
 
 class ExchangeRate(Base):
     __tablename__ = "exchange_rates"
+    __table_args__ = (
+        # rates are looked up by date and currency, and the index is unique
+        # so concurrent cache misses cannot store duplicate rows. It is an
+        # index rather than a table constraint so it can be added to an
+        # existing database, see rates_app.migrations
+        Index(
+            "ix_exchange_rates_market_date_currency_symbol",
+            "market_date",
+            "currency_symbol",
+            unique=True,
+        ),
+    )
 
     id = Column(Integer, primary_key=True)
     market_date = Column(String, nullable=False)
@@ -0,0 +1,130 @@
+"""rate cache module"""
+
+from collections import OrderedDict
+from typing import Any, cast
+import multiprocessing as mp
+from multiprocessing.sharedctypes import Synchronized
+import threading
+import time
+
+RateCacheKey = tuple[str, str]
+
+
+class CacheStats:
+    """cache counters shared by the server process and the admin prompt"""
+
+    def __init__(self) -> None:
+        self.hits: Synchronized = cast(Synchronized, mp.Value("q", 0))
+        self.misses: Synchronized = cast(Synchronized, mp.Value("q", 0))
+        self.evictions: Synchronized = cast(Synchronized, mp.Value("q", 0))
+        # incremented to tell every server process to drop its cache
+        self.generation: Synchronized = cast(Synchronized, mp.Value("q", 0))
+
+    @staticmethod
+    def increment(counter: Synchronized) -> None:
+        with counter.get_lock():
+            counter.value += 1
+
+    def __str__(self) -> str:
+        hits = self.hits.value
+        lookups = hits + self.misses.value
+        hit_ratio = hits / lookups if lookups else 0.0
+        return (
+            f"{hits} hits, {self.misses.value} misses, "
+            f"{self.evictions.value} evictions, "
+            f"{hit_ratio:.1%} hit ratio"
+        )
+
+
+class RateCache:
+    """bounded in-memory LRU cache of rates keyed on (date, currency)
+
+    Each server process holds its own entries. The counters and the
+    invalidation generation are shared through CacheStats, so clearing the
+    cache from the admin prompt empties the cache in every server process.
+    Entries older than ttl_seconds are treated as misses, but are kept
+    until they are evicted so get_stale can answer with them while the
+    Rates API is unavailable.
+    """
+
+    def __init__(
+        self, max_size: int, ttl_seconds: float, stats: CacheStats
+    ) -> None:
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.stats = stats
+        self.__init_entries()
+
+    def __init_entries(self) -> None:
+        # entries hold (rate, expires at), least recently used first
+        self.__entries: OrderedDict[RateCacheKey, tuple[float, float]] = (
+            OrderedDict()
+        )
+        self.__lock = threading.Lock()
+        # the generation is read without its lock, like the sequence of a
+        # seqlock: an aligned 64-bit read is atomic, and a cache that reads
+        # the old value just drops its entries on the next call
+        self.__shared_generation = self.stats.generation.get_obj()
+        self.__generation = self.__shared_generation.value
+
+    def __getstate__(self) -> dict[str, Any]:
+        # only the settings and the shared stats are passed to a new server
+        # process, the entries and the lock belong to this process
+        return {
+            "max_size": self.max_size,
+            "ttl_seconds": self.ttl_seconds,
+            "stats": self.stats,
+        }
+
+    def __setstate__(self, state: dict[str, Any]) -> None:
+        self.__dict__.update(state)
+        self.__init_entries()
+
+    def __len__(self) -> int:
+        return len(self.__entries)
+
+    def __check_generation(self) -> None:
+        # called with the lock held
+        generation = self.__shared_generation.value
+        if generation != self.__generation:
+            self.__entries.clear()
+            self.__generation = generation
+
+    def get(self, key: RateCacheKey) -> float | None:
+        with self.__lock:
+            self.__check_generation()
+            entry = self.__entries.get(key)
+
+            if entry is None or entry[1] < time.monotonic():
+                CacheStats.increment(self.stats.misses)
+                return None
+
+            self.__entries.move_to_end(key)
+            CacheStats.increment(self.stats.hits)
+            return entry[0]
+
+    def get_stale(self, key: RateCacheKey) -> float | None:
+        """the rate even if it has expired, not counted as a lookup"""
+
+        with self.__lock:
+            self.__check_generation()
+            entry = self.__entries.get(key)
+            return None if entry is None else entry[0]
+
+    def put(self, key: RateCacheKey, rate: float) -> None:
+        with self.__lock:
+            self.__check_generation()
+            self.__entries[key] = (rate, time.monotonic() + self.ttl_seconds)
+            self.__entries.move_to_end(key)
+
+            while len(self.__entries) > self.max_size:
+                self.__entries.popitem(last=False)
+                CacheStats.increment(self.stats.evictions)
+
+    def clear(self) -> None:
+        """drop the entries in every process sharing the stats"""
+
+        with self.stats.generation.get_lock():
+            self.stats.generation.value += 1
+        with self.__lock:
+            self.__check_generation()
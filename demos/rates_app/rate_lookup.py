@@ -0,0 +1,381 @@
+"""rate lookup module
+
+Looks up a rate in the in-memory cache, then the database, then the Rates
+API. The steps are separate methods so the asyncio server can run the
+database steps on an executor and fetch from the Rates API without blocking.
+"""
+
+from contextlib import contextmanager
+from datetime import date
+from typing import Any, Iterator
+import time
+
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from rates_api.business_days import get_calendar
+from rates_app.database import SessionLocal
+from rates_app.metrics import ServerMetrics
+from rates_app.models import ExchangeRate
+from rates_app.rate_cache import RateCache, RateCacheKey
+from rates_app.rates_commands import BatchTooLargeError, InvalidDateError
+from rates_app.single_flight import SingleFlight
+from rates_app.upstream_client import (
+    UpstreamClient,
+    UpstreamClientError,
+    UpstreamUnavailableError,
+)
+
+max_batch_rates = 5000
+
+
+def resolve_market_date(market_date: str) -> str:
+    # rates are only published on ECB business days, so a weekend or
+    # holiday resolves to the rates of the previous business day
+    try:
+        return str(
+            get_calendar("ECB").previous_business_day(
+                date.fromisoformat(market_date), inclusive=True
+            )
+        )
+    except ValueError as exc:
+        # not a date, or outside the years of the calendar
+        raise InvalidDateError(market_date) from exc
+
+
+def rates_api_path(market_date: str, currency_symbol: str) -> str:
+    return f"/api/{market_date}?base=USD&symbols={currency_symbol}"
+
+
+def batch_cache_keys(
+    market_date: str, currency_symbol: str
+) -> list[RateCacheKey]:
+    """the (date, currency) keys of a batch command, dates first"""
+
+    if ":" in market_date:
+        start_date, end_date = market_date.split(":")
+        try:
+            market_dates = get_calendar("ECB").date_range(
+                date.fromisoformat(start_date), date.fromisoformat(end_date)
+            ).tolist()
+        except ValueError as exc:
+            raise InvalidDateError(market_date) from exc
+    else:
+        market_dates = [resolve_market_date(market_date)]
+
+    currency_symbols = list(dict.fromkeys(currency_symbol.split(",")))
+
+    rate_count = len(market_dates) * len(currency_symbols)
+    if rate_count > max_batch_rates:
+        raise BatchTooLargeError(rate_count, max_batch_rates)
+
+    return [
+        (batch_date, batch_symbol)
+        for batch_date in market_dates
+        for batch_symbol in currency_symbols
+    ]
+
+
+def response_rate(
+    rates: dict[str, Any], market_date: str, currency_symbol: str
+) -> float:
+    """the rate from an /api/<date> response
+
+    The Rates API leaves out the currencies it does not know, raises
+    UpstreamClientError for those.
+    """
+
+    try:
+        return float(rates["rates"][currency_symbol])
+    except KeyError as exc:
+        raise UpstreamClientError(
+            f"the Rates API has no {currency_symbol} rate for {market_date}"
+        ) from exc
+
+
+def rates_api_batch_path(cache_keys: list[RateCacheKey]) -> str:
+    """one /api/range request covering all the keys"""
+
+    market_dates = [market_date for market_date, _ in cache_keys]
+    currency_symbols = dict.fromkeys(
+        currency_symbol for _, currency_symbol in cache_keys
+    )
+    return (
+        f"/api/range?start={min(market_dates)}&end={max(market_dates)}"
+        f"&base=USD&symbols={','.join(currency_symbols)}"
+    )
+
+
+def batch_rates(
+    cache_keys: list[RateCacheKey], range_response: dict[str, Any]
+) -> dict[RateCacheKey, float]:
+    """the rates for the keys from an /api/range response"""
+
+    range_rates = range_response["rates"]
+    return {
+        (market_date, currency_symbol): float(
+            range_rates[market_date][currency_symbol]
+        )
+        for market_date, currency_symbol in cache_keys
+        if currency_symbol in range_rates.get(market_date, {})
+    }
+
+
+class RateLookup:
+    def __init__(
+        self,
+        rate_cache: RateCache,
+        upstream_client: UpstreamClient,
+        server_metrics: ServerMetrics | None = None,
+    ) -> None:
+        self.rate_cache = rate_cache
+        self.upstream_client = upstream_client
+        self.server_metrics = server_metrics
+        self.__rate_loads: SingleFlight[RateCacheKey, float] = SingleFlight()
+
+    def get_rate(self, market_date: str, currency_symbol: str) -> float:
+        market_date = resolve_market_date(market_date)
+
+        # the hottest rates are served from memory without a database query
+        cache_key = (market_date, currency_symbol)
+        cached_rate = self.rate_cache.get(cache_key)
+        if cached_rate is not None:
+            return cached_rate
+
+        # concurrent misses for the same rate wait for one load instead of
+        # each querying the database and calling the rates api
+        return self.__rate_loads.do(
+            cache_key, lambda: self.load_rate(market_date, currency_symbol)
+        )
+
+    def load_rate(self, market_date: str, currency_symbol: str) -> float:
+        currency_rate = self.query_rate(market_date, currency_symbol)
+        if currency_rate is not None:
+            return currency_rate
+
+        try:
+            currency_rate = self.fetch_rate(market_date, currency_symbol)
+        except UpstreamUnavailableError as exc:
+            return self.stale_rate((market_date, currency_symbol), exc)
+
+        self.store_rate(market_date, currency_symbol, currency_rate)
+        return currency_rate
+
+    def stale_rate(
+        self, cache_key: RateCacheKey, exc: UpstreamUnavailableError
+    ) -> float:
+        """expired cached rate, re-raises exc if there is none"""
+
+        stale_rates = self.stale_rates([cache_key], exc)
+        if cache_key not in stale_rates:
+            raise exc
+        return stale_rates[cache_key]
+
+    def stale_rates(
+        self, cache_keys: list[RateCacheKey], exc: UpstreamUnavailableError
+    ) -> dict[RateCacheKey, float]:
+        """expired cached rates, re-raises exc if there are none"""
+
+        rates: dict[RateCacheKey, float] = {}
+        if self.upstream_client.options.serve_stale:
+            for cache_key in cache_keys:
+                stale_rate = self.rate_cache.get_stale(cache_key)
+                if stale_rate is not None:
+                    rates[cache_key] = stale_rate
+
+        if not rates:
+            raise exc
+
+        upstream_stats = self.upstream_client.stats
+        with upstream_stats.stale.get_lock():
+            upstream_stats.stale.value += len(rates)
+        return rates
+
+    @contextmanager
+    def database_session(self) -> Iterator[Session]:
+        """a database session, timed as the database stage"""
+
+        started = time.perf_counter()
+        try:
+            with SessionLocal() as db_session:
+                yield db_session
+        finally:
+            if self.server_metrics is not None:
+                self.server_metrics.observe("database", started)
+
+    @contextmanager
+    def upstream_request(self) -> Iterator[None]:
+        """a Rates API request, timed as the upstream stage"""
+
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            if self.server_metrics is not None:
+                self.server_metrics.observe("upstream", started)
+
+    def query_rate(
+        self, market_date: str, currency_symbol: str
+    ) -> float | None:
+        """rate from the database, None if it is not cached"""
+
+        with self.database_session() as db_session:
+            exchange_rate = (
+                db_session.query(ExchangeRate)
+                .filter_by(
+                    market_date=market_date, currency_symbol=currency_symbol
+                )
+                .first()
+            )
+
+            if not exchange_rate:
+                return None
+
+            currency_rate = float(exchange_rate.currency_rate)
+
+        self.rate_cache.put((market_date, currency_symbol), currency_rate)
+        return currency_rate
+
+    def fetch_rate(self, market_date: str, currency_symbol: str) -> float:
+        """rate from the rates api"""
+
+        with self.upstream_request():
+            rates = self.upstream_client.get_json(
+                rates_api_path(market_date, currency_symbol)
+            )
+
+        return response_rate(rates, market_date, currency_symbol)
+
+    def store_rate(
+        self, market_date: str, currency_symbol: str, currency_rate: float
+    ) -> None:
+        with self.database_session() as db_session:
+            # another server process may have stored the rate since it was
+            # queried, the unique index keeps the first row
+            db_session.execute(
+                sqlite_insert(ExchangeRate)
+                .values(
+                    market_date=market_date,
+                    currency_symbol=currency_symbol,
+                    currency_rate=currency_rate,
+                )
+                .on_conflict_do_nothing()
+            )
+            db_session.commit()
+
+        self.rate_cache.put((market_date, currency_symbol), currency_rate)
+
+    def get_rates(
+        self, cache_keys: list[RateCacheKey]
+    ) -> dict[RateCacheKey, float]:
+        """rates for a batch command
+
+        The keys missing from the in-memory cache are queried with one
+        database query, and the keys missing from the database are
+        downloaded with one Rates API request and stored with one insert.
+        Keys the Rates API has no rate for are left out.
+        """
+
+        rates = self.cached_rates(cache_keys)
+
+        missing_keys = [key for key in cache_keys if key not in rates]
+        if missing_keys:
+            rates.update(self.query_rates(missing_keys))
+            missing_keys = [key for key in missing_keys if key not in rates]
+
+        if missing_keys:
+            try:
+                fetched_rates = self.fetch_rates(missing_keys)
+            except UpstreamUnavailableError as exc:
+                rates.update(self.stale_rates(missing_keys, exc))
+                return rates
+
+            self.store_rates(fetched_rates)
+            rates.update(fetched_rates)
+
+        return rates
+
+    def cached_rates(
+        self, cache_keys: list[RateCacheKey]
+    ) -> dict[RateCacheKey, float]:
+        rates: dict[RateCacheKey, float] = {}
+        for cache_key in cache_keys:
+            cached_rate = self.rate_cache.get(cache_key)
+            if cached_rate is not None:
+                rates[cache_key] = cached_rate
+        return rates
+
+    def query_rates(
+        self, cache_keys: list[RateCacheKey]
+    ) -> dict[RateCacheKey, float]:
+        """rates from the database with one IN (...) query"""
+
+        wanted_keys = set(cache_keys)
+        rates: dict[RateCacheKey, float] = {}
+
+        with self.database_session() as db_session:
+            exchange_rates = (
+                db_session.query(ExchangeRate)
+                .filter(
+                    ExchangeRate.market_date.in_(
+                        {market_date for market_date, _ in cache_keys}
+                    ),
+                    ExchangeRate.currency_symbol.in_(
+                        {currency_symbol for _, currency_symbol in cache_keys}
+                    ),
+                )
+                .all()
+            )
+
+            for exchange_rate in exchange_rates:
+                cache_key = (
+                    str(exchange_rate.market_date),
+                    str(exchange_rate.currency_symbol),
+                )
+                # the query returns every date and symbol combination, only
+                # keep the ones asked for
+                if cache_key in wanted_keys:
+                    rates[cache_key] = float(exchange_rate.currency_rate)
+
+        for cache_key, currency_rate in rates.items():
+            self.rate_cache.put(cache_key, currency_rate)
+        return rates
+
+    def fetch_rates(
+        self, cache_keys: list[RateCacheKey]
+    ) -> dict[RateCacheKey, float]:
+        """rates from the rates api with one request"""
+
+        with self.upstream_request():
+            range_response = self.upstream_client.get_json(
+                rates_api_batch_path(cache_keys)
+            )
+        return batch_rates(cache_keys, range_response)
+
+    def store_rates(self, rates: dict[RateCacheKey, float]) -> None:
+        """store the rates with one bulk insert"""
+
+        if not rates:
+            return
+
+        with self.database_session() as db_session:
+            db_session.execute(
+                sqlite_insert(ExchangeRate)
+                .values(
+                    [
+                        {
+                            "market_date": market_date,
+                            "currency_symbol": currency_symbol,
+                            "currency_rate": currency_rate,
+                        }
+                        for (market_date, currency_symbol), currency_rate in (
+                            rates.items()
+                        )
+                    ]
+                )
+                .on_conflict_do_nothing()
+            )
+            db_session.commit()
+
+        for cache_key, currency_rate in rates.items():
+            self.rate_cache.put(cache_key, currency_rate)
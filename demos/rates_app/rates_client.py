@@ -1,19 +1,67 @@
+from typing import Any
 import socket
 import sys
 
+from rates_app.rates_protocol import FRAMED_PROTOCOL_REQUEST
 
-def rate_client(host: str, port: int) -> None:
-    try:
-        with socket.socket(
-            socket.AF_INET, socket.SOCK_STREAM
-        ) as socket_client:
-            socket_client.connect((host, port))
 
-            welcome_message_bytes = socket_client.recv(2048)
+class RatesConnection:
+    """framed protocol connection to the rates server
+
+    Commands sent together with send_commands are pipelined: they go out in
+    one send and the responses are read back in the same order.
+    """
+
+    def __init__(
+        self, host: str, port: int, timeout: float | None = None
+    ) -> None:
+        self.__socket = socket.create_connection((host, port), timeout)
+        self.__responses = self.__socket.makefile("rb")
+        try:
+            self.welcome_message = self.__socket.recv(2048).decode("UTF-8")
+            self.__socket.sendall(FRAMED_PROTOCOL_REQUEST)
+            self.__read_response()
+        except BaseException:
+            # a busy server closes the connection before the handshake, the
+            # socket is closed here rather than whenever it is collected
+            self.__responses.close()
+            self.__socket.close()
+            raise
+
+    def __enter__(self) -> "RatesConnection":
+        return self
+
+    def __exit__(self, exc_type: Any, exc_val: Any, exc_tb: Any) -> None:
+        self.close()
 
-            welcome_message = welcome_message_bytes.decode("UTF-8")
+    def __read_response(self) -> str:
+        response = self.__responses.readline()
+        if not response:
+            raise ConnectionResetError("server closed the connection")
+        return response.decode("UTF-8").rstrip("\n")
 
-            print(welcome_message)
+    def send_commands(self, commands: list[str]) -> list[str]:
+        self.__socket.sendall(
+            "".join(command + "\n" for command in commands).encode("UTF-8")
+        )
+        return [self.__read_response() for _ in commands]
+
+    def send_command(self, command: str) -> str:
+        return self.send_commands([command])[0]
+
+    def close(self) -> None:
+        try:
+            self.__socket.sendall(b"exit\n")
+        except OSError:
+            pass
+        self.__responses.close()
+        self.__socket.close()
+
+
+def rate_client(host: str, port: int) -> None:
+    try:
+        with RatesConnection(host, port) as rates_connection:
+            print(rates_connection.welcome_message)
 
             while True:
                 command = input("> ")
@@ -21,8 +69,7 @@ def rate_client(host: str, port: int) -> None:
                 if command == "exit":
                     break
                 else:
-                    socket_client.sendall(command.encode("UTF-8"))
-                    print(socket_client.recv(2048).decode("UTF-8"))
+                    print(rates_connection.send_command(command))
 
     except ConnectionResetError:
         print("Server connection was closed.")
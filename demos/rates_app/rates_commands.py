@@ -0,0 +1,142 @@
+"""rates commands module
+
+Parsing of the client commands, shared by the thread and asyncio servers.
+"""
+
+import logging
+import re
+
+from rates_app.upstream_client import (
+    UpstreamClientError,
+    UpstreamUnavailableError,
+)
+
+# the date may be a START:END range of dates, and the currency symbol a
+# comma separated list of symbols, for example:
+# GET 2021-04-08 EUR
+# GET 2021-04-08 USD,EUR,JPY
+# GET 2021-04-01:2021-04-08 EUR,JPY
+client_command_pattern = (
+    r"^(?P<command_name>[A-Z]+) "
+    r"(?P<market_date>[0-9]{4}-[0-9]{2}-[0-9]{2}"
+    r"(?::[0-9]{4}-[0-9]{2}-[0-9]{2})?) "
+    r"(?P<currency_symbol>[A-Z]{3}(?:,[A-Z]{3})*)$"
+)
+
+client_command_regex = re.compile(client_command_pattern)
+
+command_names = ["GET"]
+
+
+class InvalidCommandError(Exception):
+    def __init__(self, command: str) -> None:
+        super().__init__(
+            (
+                f"User entered command {command} does not match the "
+                f"following pattern COMMAND_NAME YYYY-MM-DD CURRENY_SYMBOL, "
+                "with an optional :YYYY-MM-DD end date and comma separated "
+                "currency symbols"
+            )
+        )
+
+
+class InvalidCommandNameError(Exception):
+    def __init__(
+        self, requested_command_name: str, available_command_names: list[str]
+    ) -> None:
+        super().__init__(
+            (
+                f"User entered command {requested_command_name} "
+                "is not in the list "
+                f"of available commands {available_command_names}"
+            )
+        )
+
+
+class BatchTooLargeError(Exception):
+    def __init__(self, rate_count: int, max_rate_count: int) -> None:
+        super().__init__(
+            (
+                f"User entered command asks for {rate_count} rates, "
+                f"more than the limit of {max_rate_count} rates"
+            )
+        )
+
+
+class InvalidDateError(Exception):
+    def __init__(self, market_date: str) -> None:
+        super().__init__(
+            (
+                f"User entered date {market_date} is not a date of the "
+                "ECB business day calendar"
+            )
+        )
+
+
+def parse_client_command(command: str) -> tuple[str, str, str]:
+    command_match = client_command_regex.match(command)
+
+    if not command_match:
+        raise InvalidCommandError(command)
+
+    command_parts_dict = command_match.groupdict()
+    command_name = command_parts_dict["command_name"]
+    market_date = command_parts_dict["market_date"]
+    currency_symbol = command_parts_dict["currency_symbol"]
+
+    if command_name not in command_names:
+        raise InvalidCommandNameError(command_name, command_names)
+
+    return command_name, market_date, currency_symbol
+
+
+def is_batch_command(market_date: str, currency_symbol: str) -> bool:
+    return ":" in market_date or "," in currency_symbol
+
+
+def batch_response(
+    cache_keys: list[tuple[str, str]],
+    rates: dict[tuple[str, str], float],
+    include_dates: bool,
+) -> str:
+    """one line response for a batch command
+
+    "USD: 1.0, EUR: 0.84" for one date, each rate is prefixed with its date
+    for a range of dates. Rates the Rates API does not have are N/A.
+    """
+
+    rate_responses: list[str] = []
+    for market_date, currency_symbol in cache_keys:
+        currency_rate = rates.get((market_date, currency_symbol), "N/A")
+        rate_response = f"{currency_symbol}: {currency_rate}"
+        if include_dates:
+            rate_response = f"{market_date} {rate_response}"
+        rate_responses.append(rate_response)
+
+    return ", ".join(rate_responses)
+
+
+def error_response(exc: Exception) -> str:
+    """log the error and return the response sent to the client"""
+
+    if isinstance(exc, InvalidCommandError):
+        logging.log(logging.INFO, "Invalid Command", exc_info=exc)
+        return "Invalid Command"
+    if isinstance(exc, InvalidCommandNameError):
+        logging.log(logging.INFO, "Invalid Command Name", exc_info=exc)
+        return "Invalid Command Name"
+    if isinstance(exc, BatchTooLargeError):
+        logging.log(logging.INFO, "Batch Too Large", exc_info=exc)
+        return "Batch Too Large"
+    if isinstance(exc, InvalidDateError):
+        logging.log(logging.INFO, "Invalid Date", exc_info=exc)
+        return "Invalid Date"
+    if isinstance(exc, UpstreamClientError):
+        # the client asked for a rate the Rates API does not have
+        logging.log(logging.WARNING, "Rate Not Found", exc_info=exc)
+        return "Rate Not Found"
+    if isinstance(exc, UpstreamUnavailableError):
+        logging.log(logging.WARNING, "Rates Unavailable", exc_info=exc)
+        return "Rates Unavailable"
+    logging.log(logging.ERROR, "Unknown Error", exc_info=exc)
+    return "Unknown Error"
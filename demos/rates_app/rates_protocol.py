@@ -0,0 +1,68 @@
+"""rates protocol module
+
+The original protocol sends one command per send and reads one response per
+recv, which only works while every command arrives in exactly one TCP
+segment. The framed protocol (version 2) ends every command and response
+with a newline, so a client can pipeline many commands in one send and the
+server answers all the complete commands it has received in one sendall.
+
+A client switches a connection to the framed protocol by sending
+"PROTOCOL 2\\n" after the welcome message, the server answers "OK\\n".
+Connections that never send it keep the original protocol.
+"""
+
+FRAMED_PROTOCOL_COMMAND = "PROTOCOL 2"
+FRAMED_PROTOCOL_REQUEST = (FRAMED_PROTOCOL_COMMAND + "\n").encode("UTF-8")
+FRAME_DELIMITER = b"\n"
+
+
+class FrameTooLargeError(Exception):
+    def __init__(self, max_frame_size: int) -> None:
+        super().__init__(
+            f"Client sent more than {max_frame_size} bytes without a newline"
+        )
+
+
+class CommandFramer:
+    """splits the bytes received on a connection into commands"""
+
+    def __init__(self, max_frame_size: int = 65536) -> None:
+        self.framed = False
+        self.max_frame_size = max_frame_size
+        self.__buffer = bytearray()
+
+    def commands(self, data: bytes) -> list[str]:
+        """every complete command in the received data
+
+        In the original protocol the data is one command. In the framed
+        protocol it is every newline terminated command, a trailing partial
+        command is kept until the rest of it is received.
+        """
+
+        if not self.framed:
+            if not data.startswith(FRAMED_PROTOCOL_REQUEST):
+                return [data.decode("UTF-8")]
+            self.framed = True
+            return [FRAMED_PROTOCOL_COMMAND] + self.commands(
+                data[len(FRAMED_PROTOCOL_REQUEST) :]
+            )
+
+        self.__buffer += data
+        frames_end = self.__buffer.rfind(FRAME_DELIMITER) + 1
+
+        if len(self.__buffer) - frames_end > self.max_frame_size:
+            raise FrameTooLargeError(self.max_frame_size)
+
+        frames = self.__buffer[:frames_end].decode("UTF-8").split("\n")[:-1]
+        del self.__buffer[:frames_end]
+
+        return [frame.rstrip("\r") for frame in frames if frame.strip()]
+
+    def encode(self, responses: list[str]) -> bytes:
+        """the responses to send back in one sendall"""
+
+        if not self.framed:
+            return "".join(responses).encode("UTF-8")
+        return "".join(response + "\n" for response in responses).encode(
+            "UTF-8"
+        )
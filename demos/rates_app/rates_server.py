@@ -1,18 +1,51 @@
 """rate server module"""
 
-from typing import Optional, cast
+from http.server import ThreadingHTTPServer
+from typing import Callable, cast
+import dataclasses
 import multiprocessing as mp
 from multiprocessing.sharedctypes import Synchronized
 import sys
 import socket
 import threading
-import re
-import requests
 import logging
-
-from rates_app.database import SessionLocal, engine, Base
+import time
+
+from rates_api.business_days import get_calendar
+from rates_app.cache_warmer import CacheWarmer
+from rates_app.connection_pool import (
+    BACKLOG_POLICIES,
+    ConnectionPool,
+    ConnectionStats,
+    ServerOptions,
+)
+from rates_app.database import SessionLocal, engine
+from rates_app.metrics import ServerMetrics, StageTimings
+from rates_app.metrics_server import prometheus_text, start_metrics_server
+from rates_app.migrations import migrate_database
 
 from rates_app.models import ExchangeRate
+from rates_app.rate_cache import CacheStats, RateCache
+from rates_app.rate_lookup import RateLookup, batch_cache_keys
+from rates_app.rates_commands import (
+    InvalidCommandNameError,
+    batch_response,
+    command_names,
+    error_response,
+    is_batch_command,
+    parse_client_command,
+)
+from rates_app.rates_protocol import (
+    FRAMED_PROTOCOL_COMMAND,
+    CommandFramer,
+    FrameTooLargeError,
+)
+from rates_app.rates_server_async import async_rate_server
+from rates_app.upstream_client import (
+    UpstreamClient,
+    UpstreamOptions,
+    UpstreamStats,
+)
 
 
 # Task 1 - Cache Rate Results
@@ -33,248 +66,604 @@ from rates_app.models import ExchangeRate
 # prompt. Name the command "clear".
 
 
-client_command_pattern = (
-    r"^(?P<command_name>[A-Z]+) "
-    r"(?P<market_date>[0-9]{4}-[0-9]{2}-[0-9]{2}) "
-    r"(?P<currency_symbol>[A-Z]{3})$"
-)
-
-
-class InvalidCommandError(Exception):
-    def __init__(self, command: str) -> None:
-        super().__init__(
-            (
-                f"User entered command {command} does not match the "
-                f"following pattern COMMAND_NAME YYYY-MM-DD CURRENY_SYMBOL"
-            )
-        )
-
+class ClientConnectionThread(threading.Thread):
+    """worker thread serving the connections from the connection pool"""
 
-class InvalidCommandNameError(Exception):
     def __init__(
-        self, requested_command_name: str, available_command_names: list[str]
+        self,
+        connection_pool: ConnectionPool,
+        counter: Synchronized,
+        rate_lookup: RateLookup,
+        server_metrics: ServerMetrics,
     ) -> None:
-        super().__init__(
-            (
-                f"User entered command {requested_command_name} "
-                "is not in the list "
-                f"of available commands {available_command_names}"
-            )
-        )
-
-
-class ClientConnectionThread(threading.Thread):
-    def __init__(self, conn: socket.socket, counter: Synchronized) -> None:
-        threading.Thread.__init__(self)
-        self.__conn = conn
-        self.__command_names = ["GET"]
-        self.__client_command_regex = re.compile(client_command_pattern)
+        threading.Thread.__init__(self, daemon=True)
+        self.__connection_pool = connection_pool
         self.__counter = counter
+        self.__rate_lookup = rate_lookup
+        self.__server_metrics = server_metrics
 
     def parse_client_command(self, command: str) -> tuple[str, str, str]:
-        command_match = self.__client_command_regex.match(command)
-
-        if not command_match:
-            raise InvalidCommandError(command)
-
-        command_parts_dict = command_match.groupdict()
-        command_name = command_parts_dict["command_name"]
-        market_date = command_parts_dict["market_date"]
-        currency_symbol = command_parts_dict["currency_symbol"]
-
-        return command_name, market_date, currency_symbol
+        return parse_client_command(command)
 
     def process_client_command(
         self, command_name: str, market_date: str, currency_symbol: str
     ) -> str:
-        if command_name not in self.__command_names:
-            raise InvalidCommandNameError(command_name, self.__command_names)
-
-        with SessionLocal() as db_session:
-            exchange_rate = (
-                db_session.query(ExchangeRate)
-                .filter_by(
-                    market_date=market_date, currency_symbol=currency_symbol
-                )
-                .first()
+        if command_name not in command_names:
+            raise InvalidCommandNameError(command_name, command_names)
+
+        if is_batch_command(market_date, currency_symbol):
+            cache_keys = batch_cache_keys(market_date, currency_symbol)
+            return batch_response(
+                cache_keys,
+                self.__rate_lookup.get_rates(cache_keys),
+                include_dates=":" in market_date,
             )
 
-            if exchange_rate:
-                return f"{currency_symbol}: {exchange_rate.currency_rate}"
-
-        resp = requests.get(
-            (
-                "http://127.0.0.1:8080"
-                f"/api/{market_date}"
-                f"?base=USD&symbols={currency_symbol}"
-            ),
-            timeout=60,
+        currency_rate = self.__rate_lookup.get_rate(
+            market_date, currency_symbol
         )
 
-        currency_rate = float(resp.json()["rates"][currency_symbol])
+        return f"{currency_symbol}: {currency_rate}"
 
-        with SessionLocal() as db_session:
-            exchange_rate = ExchangeRate(
-                market_date=market_date,
-                currency_symbol=currency_symbol,
-                currency_rate=currency_rate,
-            )
-            db_session.add(exchange_rate)
-            db_session.commit()
+    def respond(self, command: str, stage_timings: StageTimings) -> str:
+        if command == "count":
+            return f"{self.__counter.value} connected clients"
 
-        return f"{currency_symbol}: {currency_rate}"
+        if command == FRAMED_PROTOCOL_COMMAND:
+            return "OK"
+
+        started = time.perf_counter()
+        try:
+            command_parts = self.parse_client_command(command)
+            stage_timings.append(("parse", time.perf_counter() - started))
+            return self.process_client_command(*command_parts)
+        except Exception as exc:
+            return error_response(exc)
+        finally:
+            stage_timings.append(("command", time.perf_counter() - started))
 
     def run(self) -> None:
+        while True:
+            conn = self.__connection_pool.next_connection()
+            try:
+                self.serve(conn)
+            except TimeoutError:
+                ConnectionStats.add(self.__connection_pool.stats.timed_out)
+            except OSError:
+                # the client went away, or the connection was shed
+                pass
+            finally:
+                self.__connection_pool.release(conn)
+
+    def serve(self, conn: socket.socket) -> None:
         # conn.sendall("Connected to the Rates Server".encode("UTF-8"))
-        self.__conn.sendall(b"Connected to the Rates Server")
+        conn.sendall(b"Connected to the Rates Server")
 
-        while True:
-            command = self.__conn.recv(2048).decode("UTF-8")
+        command_framer = CommandFramer()
+        connected = True
 
-            if command == "count":
-                self.__conn.sendall(
-                    f"{self.__counter.value} connected clients".encode("UTF-8")
-                )
-                continue
+        while connected:
+            data = conn.recv(65536)
 
-            if not command or command == "exit":
+            if not data:
                 break
 
             try:
-                response = self.process_client_command(
-                    *self.parse_client_command(command)
-                )
+                commands = command_framer.commands(data)
+            except (FrameTooLargeError, UnicodeDecodeError) as exc:
+                logging.log(logging.INFO, "Invalid Frame", exc_info=exc)
+                break
 
-            except InvalidCommandError as exc:
-                logging.log(logging.INFO, "Invalid Command", exc_info=exc)
-                response = "Invalid Command"
-            except InvalidCommandNameError as exc:
-                logging.log(logging.INFO, "Invalid Command Name", exc_info=exc)
-                response = "Invalid Command Name"
-            except Exception as exc:
-                logging.log(logging.ERROR, "Unknown Error", exc_info=exc)
-                response = "Unknown Error"
+            for position, command in enumerate(commands):
+                if not command or command == "exit":
+                    connected = False
+                    commands = commands[:position]
+                    break
 
-            finally:
-                self.__conn.sendall(response.encode("UTF-8"))
+            if commands:
+                with self.__connection_pool.busy(conn):
+                    self.answer(conn, command_framer, commands)
 
-        with self.__counter.get_lock():
-            self.__counter.value -= 1
+    def answer(
+        self,
+        conn: socket.socket,
+        command_framer: CommandFramer,
+        commands: list[str],
+    ) -> None:
+        """answer every complete command received in one sendall"""
+
+        stage_timings: StageTimings = []
+        self.__server_metrics.commands_started(len(commands))
+        try:
+            responses = [
+                self.respond(command, stage_timings) for command in commands
+            ]
+
+            write_started = time.perf_counter()
+            conn.sendall(command_framer.encode(responses))
+            stage_timings.append(
+                ("write", time.perf_counter() - write_started)
+            )
+        finally:
+            self.__server_metrics.commands_finished(
+                len(commands), stage_timings
+            )
 
 
-def rate_server(host: str, port: int, counter: Synchronized) -> None:
+def rate_server(
+    host: str,
+    port: int,
+    counter: Synchronized,
+    rate_cache: RateCache,
+    upstream_client: UpstreamClient,
+    server_metrics: ServerMetrics,
+    server_options: ServerOptions,
+    connection_stats: ConnectionStats,
+) -> None:
     with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as socket_server:
+        # allow restarting the server while connections from the previous
+        # server process are in TIME_WAIT
+        socket_server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        if server_options.reuse_port:
+            socket_server.setsockopt(
+                socket.SOL_SOCKET, socket.SO_REUSEPORT, 1
+            )
         socket_server.bind((host, port))
-        socket_server.listen()
+        socket_server.listen(server_options.listen_backlog)
 
         print(f"server is listening on {host}:{port}")
 
+        rate_lookup = RateLookup(rate_cache, upstream_client, server_metrics)
+        connection_pool = ConnectionPool(
+            server_options, connection_stats, counter
+        )
+
+        # a fixed number of worker threads serve the connections, so a
+        # connection storm queues up instead of starting a thread each
+        for _ in range(server_options.max_connections):
+            ClientConnectionThread(
+                connection_pool, counter, rate_lookup, server_metrics
+            ).start()
+
         while True:
             conn, addr = socket_server.accept()
             print(f"client from {addr} connected")
-            a_thread = ClientConnectionThread(conn, counter)
-            a_thread.start()
+            connection_pool.admit(conn)
 
-            with counter.get_lock():
-                counter.value += 1
+
+# "start thread" (the default) serves connections on a pool of worker
+# threads, "start async" runs every connection on one asyncio event loop.
+# Either takes the backlog policy, the worker count (the connections served
+# at once), the queue size and the rate cache size and TTL, for example:
+# start thread 2 policy=reject workers=32 queue=128 cache=50000 ttl=600
+server_modes = {"thread": rate_server, "async": async_rate_server}
 
 
 def command_start_server(
-    server_process: mp.Process | None,
+    server_processes: list[mp.Process],
     host: str,
     port: int,
     counter: Synchronized,
-) -> mp.Process:
+    rate_cache: RateCache,
+    upstream_client: UpstreamClient,
+    server_metrics: ServerMetrics,
+    server_options: ServerOptions,
+    connection_stats: ConnectionStats,
+    server_mode: str = "thread",
+    process_count: int = 1,
+) -> list[mp.Process]:
     """command start server"""
 
-    if server_process and server_process.is_alive():
+    if any(
+        server_process.is_alive() for server_process in server_processes
+    ):
         print("server is already running")
+    elif server_mode not in server_modes:
+        print(f"server mode must be one of {', '.join(server_modes)}")
+    elif process_count < 1:
+        print("server process count must be at least 1")
+    elif process_count > 1 and not hasattr(socket, "SO_REUSEPORT"):
+        print("multiple server processes need SO_REUSEPORT")
     else:
-        # step 1 - create a new process object to start the rates server
-        server_process = mp.Process(
-            target=rate_server, args=(host, port, counter)
-        )
-        # step 2 - start the new process object
-        server_process.start()
-        print("server started")
+        if process_count > 1:
+            # every server process binds its own listening socket to the
+            # port, and the kernel balances new connections across them
+            server_options = dataclasses.replace(
+                server_options, reuse_port=True
+            )
 
-    return server_process
+        # build the ECB calendar before the server processes are started,
+        # forked ones inherit it and the first command does not wait for it
+        get_calendar("ECB")
+
+        # step 1 - create the process objects to run the rates server, the
+        # counters and the cache invalidation generation are shared values
+        # so they are the same in every server process
+        server_processes = [
+            mp.Process(
+                target=server_modes[server_mode],
+                args=(
+                    host,
+                    port,
+                    counter,
+                    rate_cache,
+                    upstream_client,
+                    server_metrics,
+                    server_options,
+                    connection_stats,
+                ),
+            )
+            for _ in range(process_count)
+        ]
+        # step 2 - start the new process objects
+        for server_process in server_processes:
+            server_process.start()
+        if process_count == 1:
+            print(f"server started ({server_mode})")
+        else:
+            print(f"server started ({server_mode}, {process_count} processes)")
+
+    return server_processes
 
 
 def command_stop_server(
-    server_process: Optional[mp.Process],
-) -> Optional[mp.Process]:
+    server_processes: list[mp.Process],
+) -> list[mp.Process]:
     """command stop server"""
 
-    if not server_process or not server_process.is_alive():
+    if not any(
+        server_process.is_alive() for server_process in server_processes
+    ):
         print("server is not running")
     else:
-        server_process.terminate()
+        stop_server_processes(server_processes)
         print("server stopped")
 
-    return None
+    return []
 
 
-def command_server_status(server_process: mp.Process | None) -> None:
+def stop_server_processes(server_processes: list[mp.Process]) -> None:
+    for server_process in server_processes:
+        if server_process.is_alive():
+            server_process.terminate()
+    for server_process in server_processes:
+        server_process.join()
+
+
+def command_server_status(server_processes: list[mp.Process]) -> None:
     """command server status"""
 
-    if server_process and server_process.is_alive():
-        print("server is running")
+    running = sum(
+        server_process.is_alive() for server_process in server_processes
+    )
+    if running:
+        print(
+            f"server is running ({running} of "
+            f"{len(server_processes)} processes)"
+        )
     else:
         print("server is not running")
 
 
+def parse_start_count(
+    option_name: str, option_value: str, minimum: int = 1
+) -> int:
+    if not option_value.isdigit() or int(option_value) < minimum:
+        raise ValueError(
+            f"{option_name} must be a number of at least {minimum}"
+        )
+    return int(option_value)
+
+
+def parse_start_seconds(option_name: str, option_value: str) -> float:
+    try:
+        seconds = float(option_value)
+    except ValueError:
+        seconds = 0.0
+    if not seconds > 0.0:
+        raise ValueError(f"{option_name} must be a number of seconds")
+    return seconds
+
+
+def parse_start_args(
+    start_args: list[str], server_options: ServerOptions, rate_cache: RateCache
+) -> tuple[str, int, ServerOptions, RateCache]:
+    """server mode, process count and options of the start command arguments
+
+    start [thread|async] [PROCESSES] [policy=POLICY] [workers=N] [queue=N]
+    [cache=N] [ttl=SECONDS]
+    The rate cache with a changed size or TTL shares the stats of rate_cache,
+    so clearing it still clears the caches of every server process. Raises
+    ValueError for an argument that is not one of these.
+    """
+
+    server_mode = "thread"
+    process_count = 1
+    cache_max_size = rate_cache.max_size
+    cache_ttl_seconds = rate_cache.ttl_seconds
+    for start_arg in start_args:
+        option_name, _, option_value = start_arg.partition("=")
+        if start_arg.isdigit():
+            process_count = int(start_arg)
+        elif not option_value:
+            server_mode = start_arg
+        elif option_name == "policy":
+            if option_value not in BACKLOG_POLICIES:
+                raise ValueError(
+                    "backlog policy must be one of "
+                    f"{', '.join(BACKLOG_POLICIES)}"
+                )
+            server_options = dataclasses.replace(
+                server_options, backlog_policy=option_value
+            )
+        elif option_name == "workers":
+            server_options = dataclasses.replace(
+                server_options,
+                max_connections=parse_start_count(option_name, option_value),
+            )
+        elif option_name == "queue":
+            server_options = dataclasses.replace(
+                server_options,
+                queue_size=parse_start_count(option_name, option_value),
+            )
+        elif option_name == "cache":
+            # a size of 0 turns the in-memory cache off
+            cache_max_size = parse_start_count(option_name, option_value, 0)
+        elif option_name == "ttl":
+            cache_ttl_seconds = parse_start_seconds(option_name, option_value)
+        else:
+            raise ValueError(f"unknown start option {start_arg}")
+
+    if (cache_max_size, cache_ttl_seconds) != (
+        rate_cache.max_size,
+        rate_cache.ttl_seconds,
+    ):
+        rate_cache = RateCache(
+            cache_max_size, cache_ttl_seconds, rate_cache.stats
+        )
+    return server_mode, process_count, server_options, rate_cache
+
+
 def command_client_count(counter: Synchronized) -> None:
     print(f"{counter.value} connected clients")
 
 
-def command_clear_cache() -> None:
+def command_connection_stats(
+    counter: Synchronized, connection_stats: ConnectionStats
+) -> None:
+    print(f"{counter.value} connected clients, {connection_stats}")
+
+
+def command_cache_stats(cache_stats: CacheStats) -> None:
+    print(f"cache: {cache_stats}")
+
+
+def command_upstream_stats(upstream_client: UpstreamClient) -> None:
+    # the circuit breaker state belongs to each server process, the stats
+    # are shared
+    print(f"upstream: {upstream_client.stats}")
+    for bucket_line in upstream_client.stats.latency.bucket_lines():
+        print(bucket_line)
+
+
+def command_server_stats(
+    server_metrics: ServerMetrics,
+    counter: Synchronized,
+    cache_stats: CacheStats,
+    upstream_stats: UpstreamStats,
+) -> None:
+    """command server stats"""
+
+    print(
+        f"commands: {server_metrics.commands.value} total, "
+        f"{server_metrics.commands_per_second():.1f}/s since the last stats, "
+        f"{server_metrics.in_flight.value} in flight, "
+        f"{counter.value} connected clients"
+    )
+    print(f"cache: {cache_stats}")
+    for stage, histogram in server_metrics.latency.items():
+        print(f"{stage}: {histogram}")
+    print(f"upstream requests: {upstream_stats.latency}")
+
+
+def command_metrics_server(
+    metrics_server: ThreadingHTTPServer | None,
+    host: str,
+    metrics_port: str,
+    render: Callable[[], str],
+) -> ThreadingHTTPServer | None:
+    """serve the metrics for Prometheus on http://host:port/metrics"""
+
+    if metrics_server is not None:
+        print(
+            "metrics are already served on port "
+            f"{metrics_server.server_address[1]}"
+        )
+        return metrics_server
+    if not metrics_port.isdigit():
+        print("metrics port must be a number")
+        return None
+
+    try:
+        metrics_server = start_metrics_server(host, int(metrics_port), render)
+    except OSError as exc:
+        print(f"cannot serve the metrics: {exc}")
+        return None
+
+    print(f"metrics served on http://{host}:{metrics_port}/metrics")
+    return metrics_server
+
+
+def command_warm_cache(
+    cache_warmer: CacheWarmer,
+    start_date: str,
+    end_date: str,
+    currency_symbols: str,
+) -> None:
+    """command warm cache"""
+
+    try:
+        # the arguments are checked like a batch command for the range
+        parse_client_command(
+            f"GET {start_date}:{end_date} {currency_symbols}"
+        )
+        progress = cache_warmer.warm(
+            start_date,
+            end_date,
+            list(dict.fromkeys(currency_symbols.split(","))),
+        )
+    except Exception as exc:
+        print(f"cannot warm the cache: {exc}")
+        return
+
+    print(f"warming {progress.total_chunks} chunks in the background")
+
+
+def command_warm_status(cache_warmer: CacheWarmer) -> None:
+    if cache_warmer.progress is None:
+        print("the cache has not been warmed")
+    else:
+        print(cache_warmer.progress)
+
+
+def command_clear_cache(rate_cache: RateCache) -> None:
     with SessionLocal() as db_session:
         db_session.query(ExchangeRate).delete()
         db_session.commit()
+        # the in-memory cache is cleared with the database, so the
+        # server processes cannot serve rates that are no longer stored
+        rate_cache.clear()
         print("cache cleared")
 
 
 def main() -> None:
     """Main Function"""
 
-    Base.metadata.create_all(bind=engine)
+    migrate_database(engine)
 
     try:
         host = "127.0.0.1"
         port = 5050
-        server_process: Optional[mp.Process] = None
+        server_processes: list[mp.Process] = []
         counter: Synchronized = cast(Synchronized, mp.Value("i", 0))
+        # the defaults of the start command, changed with its cache and ttl
+        # options
+        cache_max_size = 10_000
+        cache_ttl_seconds = 3600.0
+        cache_stats = CacheStats()
+        rate_cache = RateCache(cache_max_size, cache_ttl_seconds, cache_stats)
+        upstream_client = UpstreamClient(
+            UpstreamOptions(
+                base_url="http://127.0.0.1:8080",
+                pool_size=16,
+                connect_timeout_seconds=2.0,
+                read_timeout_seconds=10.0,
+                failure_threshold=5,
+                reset_timeout_seconds=30.0,
+                serve_stale=True,
+            ),
+            UpstreamStats(),
+        )
+        # the defaults of the start command, the backlog policy, the worker
+        # count and the queue size can be changed with its options
+        server_options = ServerOptions(
+            max_connections=64,
+            backlog_policy=BACKLOG_POLICIES[0],
+            queue_size=64,
+            idle_timeout_seconds=300.0,
+            listen_backlog=128,
+        )
+        connection_stats = ConnectionStats()
+        server_metrics = ServerMetrics()
+        # started with the metrics admin command
+        metrics_server: ThreadingHTTPServer | None = None
+        # the warmer stores the rates in the database, which every server
+        # process reads on a miss of its in-memory cache, so it gets an
+        # empty cache of its own instead of counting in the shared stats
+        cache_warmer = CacheWarmer(
+            RateLookup(RateCache(0, 0.0, CacheStats()), upstream_client),
+            concurrency=4,
+        )
 
         while True:
             command = input("> ")
 
-            match command:
-                case "start":
-                    server_process = command_start_server(
-                        server_process, host, port, counter
+            match command.split():
+                case ["start", *start_args]:
+                    try:
+                        (
+                            server_mode,
+                            process_count,
+                            start_options,
+                            start_cache,
+                        ) = parse_start_args(
+                            start_args, server_options, rate_cache
+                        )
+                    except ValueError as exc:
+                        print(exc)
+                        continue
+                    server_processes = command_start_server(
+                        server_processes,
+                        host,
+                        port,
+                        counter,
+                        start_cache,
+                        upstream_client,
+                        server_metrics,
+                        start_options,
+                        connection_stats,
+                        server_mode,
+                        process_count,
                     )
-                case "stop":
-                    server_process = command_stop_server(server_process)
-                case "status":
-                    command_server_status(server_process)
-                case "count":
+                case ["stop"]:
+                    server_processes = command_stop_server(server_processes)
+                case ["status"]:
+                    command_server_status(server_processes)
+                case ["count"]:
                     command_client_count(counter)
-                case "clear":
-                    command_clear_cache()
-                case "exit":
-                    if server_process and server_process.is_alive():
-                        server_process.terminate()
+                case ["connections"]:
+                    command_connection_stats(counter, connection_stats)
+                case ["cache"]:
+                    command_cache_stats(cache_stats)
+                case ["stats"]:
+                    command_server_stats(
+                        server_metrics,
+                        counter,
+                        cache_stats,
+                        upstream_client.stats,
+                    )
+                case ["upstream"]:
+                    command_upstream_stats(upstream_client)
+                case ["metrics", metrics_port]:
+                    metrics_server = command_metrics_server(
+                        metrics_server,
+                        host,
+                        metrics_port,
+                        lambda: prometheus_text(
+                            server_metrics,
+                            counter,
+                            connection_stats,
+                            cache_stats,
+                            upstream_client.stats,
+                        ),
+                    )
+                case ["warm"]:
+                    command_warm_status(cache_warmer)
+                case ["warm", start_date, end_date, currency_symbols]:
+                    command_warm_cache(
+                        cache_warmer, start_date, end_date, currency_symbols
+                    )
+                case ["clear"]:
+                    command_clear_cache(rate_cache)
+                case ["exit"]:
+                    stop_server_processes(server_processes)
                     break
                 case _:
                     print("Invalid Command")
 
     except KeyboardInterrupt:
-        # step 5 - terminate the "server_process" if the
-        # "server_process" is an object and is alive
-        if server_process and server_process.is_alive():
-            server_process.terminate()
-        pass
+        # step 5 - terminate the server processes that are alive
+        stop_server_processes(server_processes)
 
     sys.exit(0)
 
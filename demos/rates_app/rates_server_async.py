@@ -0,0 +1,507 @@
+"""asyncio rate server module
+
+An asyncio implementation of the rate server. It speaks the same protocol as
+rate_server, but every connection is a coroutine on one event loop instead
+of an OS thread, so thousands of idle or slow clients cost little memory.
+Database queries run on a bounded thread pool and rates are downloaded from
+the Rates API with a non-blocking HTTP client.
+"""
+
+from collections.abc import Iterator
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from multiprocessing.sharedctypes import Synchronized
+from typing import Any
+from urllib.parse import urlsplit
+import asyncio
+import json
+import logging
+import time
+
+from rates_app.connection_pool import (
+    SERVER_BUSY_MESSAGE,
+    ConnectionStats,
+    ServerOptions,
+)
+from rates_app.metrics import ServerMetrics, StageTimings
+from rates_app.rate_cache import RateCache, RateCacheKey
+from rates_app.rate_lookup import (
+    RateLookup,
+    batch_cache_keys,
+    batch_rates,
+    rates_api_batch_path,
+    rates_api_path,
+    resolve_market_date,
+    response_rate,
+)
+from rates_app.rates_commands import (
+    batch_response,
+    error_response,
+    is_batch_command,
+    parse_client_command,
+)
+from rates_app.rates_protocol import (
+    FRAMED_PROTOCOL_COMMAND,
+    CommandFramer,
+    FrameTooLargeError,
+)
+from rates_app.upstream_client import (
+    UpstreamClient,
+    UpstreamClientError,
+    UpstreamUnavailableError,
+)
+
+
+class HTTPStatusError(Exception):
+    def __init__(self, url: str, status: int) -> None:
+        super().__init__(f"GET {url} returned HTTP status {status}")
+        self.status = status
+
+
+def decode_chunked(body: bytes) -> bytes:
+    decoded = bytearray()
+    while True:
+        size_line, _, body = body.partition(b"\r\n")
+        chunk_size = int(size_line.split(b";")[0], 16)
+        if chunk_size == 0:
+            return bytes(decoded)
+        decoded += body[:chunk_size]
+        body = body[chunk_size + 2 :]
+
+
+async def http_get_json(
+    url: str, connect_timeout: float = 60, read_timeout: float = 60
+) -> Any:
+    """non-blocking HTTP GET of a JSON document
+
+    A minimal HTTP/1.1 client for the local Rates API, one connection per
+    request. Raises HTTPStatusError for responses other than 200.
+    """
+
+    url_parts = urlsplit(url)
+    path = url_parts.path + (f"?{url_parts.query}" if url_parts.query else "")
+
+    reader, writer = await asyncio.wait_for(
+        asyncio.open_connection(url_parts.hostname, url_parts.port or 80),
+        connect_timeout,
+    )
+    try:
+        writer.write(
+            (
+                f"GET {path} HTTP/1.1\r\n"
+                f"Host: {url_parts.netloc}\r\n"
+                "Accept: application/json\r\n"
+                "Connection: close\r\n\r\n"
+            ).encode("ascii")
+        )
+        await writer.drain()
+        response = await asyncio.wait_for(reader.read(), read_timeout)
+    finally:
+        writer.close()
+
+    head, _, body = response.partition(b"\r\n\r\n")
+    status_line, *header_lines = head.decode("iso-8859-1").split("\r\n")
+    status = int(status_line.split()[1])
+    if status != 200:
+        raise HTTPStatusError(url, status)
+
+    headers = {
+        name.strip().lower(): value.strip()
+        for name, _, value in (line.partition(":") for line in header_lines)
+    }
+    if headers.get("transfer-encoding") == "chunked":
+        body = decode_chunked(body)
+
+    return json.loads(body)
+
+
+class AsyncRateLookup:
+    """RateLookup for the event loop
+
+    The in-memory cache is checked on the event loop, database queries run
+    on the executor, and concurrent misses for the same rate await one load.
+    """
+
+    def __init__(
+        self, rate_lookup: RateLookup, executor: ThreadPoolExecutor
+    ) -> None:
+        self.__rate_lookup = rate_lookup
+        self.__executor = executor
+        self.__rate_loads: dict[RateCacheKey, asyncio.Future[float]] = {}
+
+    async def fetch_json(self, path: str) -> Any:
+        """http_get_json through the circuit breaker of the upstream client
+
+        Raises UpstreamUnavailableError and UpstreamClientError like
+        UpstreamClient.get_json.
+        """
+
+        upstream_client = self.__rate_lookup.upstream_client
+        options = upstream_client.options
+
+        with self.__rate_lookup.upstream_request():
+            upstream_client.before_request()
+
+            started = time.perf_counter()
+            try:
+                document = await http_get_json(
+                    options.base_url + path,
+                    options.connect_timeout_seconds,
+                    options.read_timeout_seconds,
+                )
+            except HTTPStatusError as exc:
+                upstream_client.after_request(
+                    started, failed=exc.status >= 500
+                )
+                if exc.status >= 500:
+                    raise UpstreamUnavailableError(str(exc)) from exc
+                raise UpstreamClientError(str(exc)) from exc
+            except (OSError, asyncio.TimeoutError) as exc:
+                upstream_client.after_request(started, failed=True)
+                raise UpstreamUnavailableError(str(exc)) from exc
+
+            upstream_client.after_request(started, failed=False)
+        return document
+
+    async def get_rate(self, market_date: str, currency_symbol: str) -> float:
+        market_date = resolve_market_date(market_date)
+
+        cache_key = (market_date, currency_symbol)
+        cached_rate = self.__rate_lookup.rate_cache.get(cache_key)
+        if cached_rate is not None:
+            return cached_rate
+
+        rate_load = self.__rate_loads.get(cache_key)
+        if rate_load is None:
+            rate_load = asyncio.ensure_future(
+                self.load_rate(market_date, currency_symbol)
+            )
+            self.__rate_loads[cache_key] = rate_load
+            rate_load.add_done_callback(
+                lambda _: self.__rate_loads.pop(cache_key, None)
+            )
+
+        # a client disconnecting must not cancel the load other clients
+        # are waiting for
+        return await asyncio.shield(rate_load)
+
+    async def get_rates(
+        self, cache_keys: list[RateCacheKey]
+    ) -> dict[RateCacheKey, float]:
+        """RateLookup.get_rates for the event loop"""
+
+        loop = asyncio.get_running_loop()
+
+        rates = self.__rate_lookup.cached_rates(cache_keys)
+
+        missing_keys = [key for key in cache_keys if key not in rates]
+        if missing_keys:
+            rates.update(
+                await loop.run_in_executor(
+                    self.__executor,
+                    self.__rate_lookup.query_rates,
+                    missing_keys,
+                )
+            )
+            missing_keys = [key for key in missing_keys if key not in rates]
+
+        if missing_keys:
+            try:
+                fetched_rates = batch_rates(
+                    missing_keys,
+                    await self.fetch_json(rates_api_batch_path(missing_keys)),
+                )
+            except UpstreamUnavailableError as exc:
+                rates.update(self.__rate_lookup.stale_rates(missing_keys, exc))
+                return rates
+
+            await loop.run_in_executor(
+                self.__executor, self.__rate_lookup.store_rates, fetched_rates
+            )
+            rates.update(fetched_rates)
+
+        return rates
+
+    async def load_rate(self, market_date: str, currency_symbol: str) -> float:
+        loop = asyncio.get_running_loop()
+
+        currency_rate = await loop.run_in_executor(
+            self.__executor,
+            self.__rate_lookup.query_rate,
+            market_date,
+            currency_symbol,
+        )
+        if currency_rate is not None:
+            return currency_rate
+
+        try:
+            rates = await self.fetch_json(
+                rates_api_path(market_date, currency_symbol)
+            )
+        except UpstreamUnavailableError as exc:
+            return self.__rate_lookup.stale_rate(
+                (market_date, currency_symbol), exc
+            )
+        currency_rate = response_rate(rates, market_date, currency_symbol)
+
+        await loop.run_in_executor(
+            self.__executor,
+            self.__rate_lookup.store_rate,
+            market_date,
+            currency_symbol,
+            currency_rate,
+        )
+        return currency_rate
+
+
+async def respond(
+    command: str,
+    counter: Synchronized,
+    rate_lookup: AsyncRateLookup,
+    stage_timings: StageTimings,
+) -> str:
+    if command == "count":
+        return f"{counter.value} connected clients"
+
+    if command == FRAMED_PROTOCOL_COMMAND:
+        return "OK"
+
+    started = time.perf_counter()
+    try:
+        _, market_date, currency_symbol = parse_client_command(command)
+        stage_timings.append(("parse", time.perf_counter() - started))
+
+        if is_batch_command(market_date, currency_symbol):
+            cache_keys = batch_cache_keys(market_date, currency_symbol)
+            return batch_response(
+                cache_keys,
+                await rate_lookup.get_rates(cache_keys),
+                include_dates=":" in market_date,
+            )
+
+        currency_rate = await rate_lookup.get_rate(
+            market_date, currency_symbol
+        )
+        return f"{currency_symbol}: {currency_rate}"
+    except Exception as exc:
+        return error_response(exc)
+    finally:
+        stage_timings.append(("command", time.perf_counter() - started))
+
+
+class AsyncConnectionAdmission:
+    """ServerOptions admission control for the event loop
+
+    Works like the ConnectionPool of the thread server, except that
+    connections waiting for a slot are already accepted, so with the queue
+    policy a connection is rejected once queue_size connections wait, the
+    same as with the reject policy.
+    """
+
+    def __init__(
+        self, options: ServerOptions, stats: ConnectionStats
+    ) -> None:
+        self.options = options
+        self.stats = stats
+        self.__slots = asyncio.Semaphore(options.max_connections)
+        self.__waiting = 0
+        # last activity time of the connections being served
+        self.__active: dict[asyncio.StreamWriter, float] = {}
+        # connections whose commands are being handled
+        self.__busy: set[asyncio.StreamWriter] = set()
+
+    async def admit(self, writer: asyncio.StreamWriter) -> bool:
+        if (
+            self.__slots.locked()
+            and self.__waiting >= self.options.queue_size
+        ):
+            idle_writers = [
+                idle_writer
+                for idle_writer in self.__active
+                if idle_writer not in self.__busy
+            ]
+            if self.options.backlog_policy == "shed" and idle_writers:
+                idle_writer = min(idle_writers, key=self.__active.__getitem__)
+                del self.__active[idle_writer]
+                ConnectionStats.add(self.stats.shed)
+                idle_writer.close()
+            else:
+                ConnectionStats.add(self.stats.rejected)
+                writer.write(SERVER_BUSY_MESSAGE)
+                writer.close()
+                return False
+
+        self.__waiting += 1
+        ConnectionStats.add(self.stats.queued)
+        try:
+            await self.__slots.acquire()
+        finally:
+            self.__waiting -= 1
+            ConnectionStats.add(self.stats.queued, -1)
+
+        self.__active[writer] = time.monotonic()
+        return True
+
+    @contextmanager
+    def busy(self, writer: asyncio.StreamWriter) -> Iterator[None]:
+        """mark a connection busy while its commands are handled"""
+
+        self.__busy.add(writer)
+        try:
+            yield
+        finally:
+            self.__busy.discard(writer)
+            if writer in self.__active:
+                self.__active[writer] = time.monotonic()
+
+    def release(self, writer: asyncio.StreamWriter) -> None:
+        self.__active.pop(writer, None)
+        self.__busy.discard(writer)
+        self.__slots.release()
+
+
+async def handle_client(
+    reader: asyncio.StreamReader,
+    writer: asyncio.StreamWriter,
+    counter: Synchronized,
+    rate_lookup: AsyncRateLookup,
+    server_metrics: ServerMetrics,
+    admission: AsyncConnectionAdmission,
+) -> None:
+    print(f"client from {writer.get_extra_info('peername')} connected")
+
+    if not await admission.admit(writer):
+        return
+
+    with counter.get_lock():
+        counter.value += 1
+
+    try:
+        writer.write(b"Connected to the Rates Server")
+        await writer.drain()
+
+        command_framer = CommandFramer()
+        connected = True
+
+        while connected:
+            data = await asyncio.wait_for(
+                reader.read(65536), admission.options.idle_timeout_seconds
+            )
+
+            if not data:
+                break
+
+            try:
+                commands = command_framer.commands(data)
+            except (FrameTooLargeError, UnicodeDecodeError) as exc:
+                logging.log(logging.INFO, "Invalid Frame", exc_info=exc)
+                break
+
+            for position, command in enumerate(commands):
+                if not command or command == "exit":
+                    connected = False
+                    commands = commands[:position]
+                    break
+
+            if not commands:
+                continue
+
+            # pipelined commands are looked up concurrently, and every
+            # complete command received is answered in one write
+            with admission.busy(writer):
+                stage_timings: StageTimings = []
+                server_metrics.commands_started(len(commands))
+                try:
+                    responses = await asyncio.gather(
+                        *(
+                            respond(
+                                command, counter, rate_lookup, stage_timings
+                            )
+                            for command in commands
+                        )
+                    )
+
+                    write_started = time.perf_counter()
+                    writer.write(command_framer.encode(responses))
+                    await writer.drain()
+                    stage_timings.append(
+                        ("write", time.perf_counter() - write_started)
+                    )
+                finally:
+                    server_metrics.commands_finished(
+                        len(commands), stage_timings
+                    )
+
+    except TimeoutError:
+        ConnectionStats.add(admission.stats.timed_out)
+    except ConnectionError:
+        pass
+    finally:
+        with counter.get_lock():
+            counter.value -= 1
+        admission.release(writer)
+        writer.close()
+
+
+async def serve(
+    host: str,
+    port: int,
+    counter: Synchronized,
+    rate_cache: RateCache,
+    upstream_client: UpstreamClient,
+    server_metrics: ServerMetrics,
+    server_options: ServerOptions,
+    connection_stats: ConnectionStats,
+    db_workers: int,
+) -> None:
+    with ThreadPoolExecutor(max_workers=db_workers) as executor:
+        rate_lookup = AsyncRateLookup(
+            RateLookup(rate_cache, upstream_client, server_metrics), executor
+        )
+        admission = AsyncConnectionAdmission(server_options, connection_stats)
+
+        server = await asyncio.start_server(
+            lambda reader, writer: handle_client(
+                reader,
+                writer,
+                counter,
+                rate_lookup,
+                server_metrics,
+                admission,
+            ),
+            host,
+            port,
+            backlog=server_options.listen_backlog,
+            reuse_port=server_options.reuse_port,
+        )
+
+        print(f"async server is listening on {host}:{port}")
+
+        async with server:
+            await server.serve_forever()
+
+
+def async_rate_server(
+    host: str,
+    port: int,
+    counter: Synchronized,
+    rate_cache: RateCache,
+    upstream_client: UpstreamClient,
+    server_metrics: ServerMetrics,
+    server_options: ServerOptions,
+    connection_stats: ConnectionStats,
+    db_workers: int = 8,
+) -> None:
+    asyncio.run(
+        serve(
+            host,
+            port,
+            counter,
+            rate_cache,
+            upstream_client,
+            server_metrics,
+            server_options,
+            connection_stats,
+            db_workers,
+        )
+    )
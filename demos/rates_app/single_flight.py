@@ -0,0 +1,52 @@
+"""single flight module"""
+
+from typing import Callable, Generic, Hashable, TypeVar, cast
+import threading
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+
+class _Call(Generic[V]):
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.result: V | None = None
+        self.error: BaseException | None = None
+
+
+class SingleFlight(Generic[K, V]):
+    """coalesces concurrent calls for the same key into one call
+
+    The first thread to ask for a key runs the function. Threads asking for
+    the same key while it runs wait for it and get the same result (or the
+    same exception) instead of running the function again.
+    """
+
+    def __init__(self) -> None:
+        self.__lock = threading.Lock()
+        self.__calls: dict[K, _Call[V]] = {}
+
+    def do(self, key: K, func: Callable[[], V]) -> V:
+        with self.__lock:
+            call = self.__calls.get(key)
+            is_leader = call is None
+            if call is None:
+                call = _Call()
+                self.__calls[key] = call
+
+        if not is_leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return cast(V, call.result)
+
+        try:
+            call.result = func()
+            return call.result
+        except BaseException as exc:
+            call.error = exc
+            raise
+        finally:
+            with self.__lock:
+                del self.__calls[key]
+            call.done.set()
@@ -0,0 +1,114 @@
+from pathlib import Path
+from typing import cast
+import time
+
+import pytest
+
+from rates_app.cache_warmer import CacheWarmer, WarmProgress, warm_chunks
+from rates_app.rate_cache import CacheStats, RateCache, RateCacheKey
+from rates_app.rate_lookup import RateLookup
+from rates_app.rates_server import command_warm_cache, command_warm_status
+from rates_app.upstream_client import (
+    UpstreamClient,
+    UpstreamOptions,
+    UpstreamStats,
+)
+from rates_app.upstream_stub import UpstreamStubServer, synthetic_rate
+
+
+class FailingRateLookup:
+    """answers every chunk with 1.0, except the chunk with failing_date"""
+
+    def __init__(self, failing_date: str) -> None:
+        self.failing_date = failing_date
+
+    def get_rates(
+        self, cache_keys: list[RateCacheKey]
+    ) -> dict[RateCacheKey, float]:
+        if (self.failing_date, "EUR") in cache_keys:
+            raise RuntimeError(f"no rates for {self.failing_date}")
+        return dict.fromkeys(cache_keys, 1.0)
+
+
+def wait_for_warm(cache_warmer: CacheWarmer) -> WarmProgress:
+    deadline = time.monotonic() + 10.0
+    while cache_warmer.running:
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+    assert cache_warmer.progress is not None
+    return cache_warmer.progress
+
+
+def test_chunks_hold_whole_dates() -> None:
+    # April 2 and 5 2021 are the Easter holidays of the ECB calendar
+    chunks = warm_chunks("2021-04-01", "2021-04-09", ["EUR", "USD"], 5)
+
+    assert [len(chunk) for chunk in chunks] == [4, 4, 2]
+    assert chunks[0] == [
+        ("2021-04-01", "EUR"),
+        ("2021-04-01", "USD"),
+        ("2021-04-06", "EUR"),
+        ("2021-04-06", "USD"),
+    ]
+    assert chunks[-1] == [("2021-04-09", "EUR"), ("2021-04-09", "USD")]
+
+
+def test_chunk_smaller_than_a_date_holds_one_date() -> None:
+    chunks = warm_chunks("2021-04-07", "2021-04-08", ["EUR", "USD", "JPY"], 2)
+
+    assert [len(chunk) for chunk in chunks] == [3, 3]
+
+
+def test_failed_chunk_does_not_stop_the_others() -> None:
+    # more than max_batch_rates rates, so the range is split into chunks
+    chunks = warm_chunks("2000-01-03", "2021-12-31", ["EUR"])
+    assert len(chunks) > 1
+    cache_warmer = CacheWarmer(
+        cast(RateLookup, FailingRateLookup(chunks[0][0][0])), concurrency=2
+    )
+
+    cache_warmer.warm("2000-01-03", "2021-12-31", ["EUR"])
+    progress = wait_for_warm(cache_warmer)
+
+    assert progress.total_chunks == len(chunks)
+    assert progress.failed_chunks == 1
+    assert progress.done_chunks == len(chunks) - 1
+    assert progress.rates == sum(len(chunk) for chunk in chunks[1:])
+    assert progress.finished is not None
+
+
+def test_warm_command(
+    rates_database: Path,
+    upstream_stub: UpstreamStubServer,
+    capsys: pytest.CaptureFixture[str],
+) -> None:
+    rate_lookup = RateLookup(
+        RateCache(100, 60.0, CacheStats()),
+        UpstreamClient(
+            UpstreamOptions(
+                base_url=f"http://127.0.0.1:{upstream_stub.server_address[1]}"
+            ),
+            UpstreamStats(),
+        ),
+    )
+    cache_warmer = CacheWarmer(rate_lookup)
+
+    command_warm_status(cache_warmer)
+    assert capsys.readouterr().out == "the cache has not been warmed\n"
+
+    command_warm_cache(cache_warmer, "2021-13-01", "2021-04-09", "EUR")
+    assert capsys.readouterr().out.startswith("cannot warm the cache: ")
+
+    command_warm_cache(cache_warmer, "2021-04-01", "2021-04-09", "EUR,USD,EUR")
+    assert capsys.readouterr().out == "warming 1 chunks in the background\n"
+    wait_for_warm(cache_warmer)
+    capsys.readouterr()
+
+    command_warm_status(cache_warmer)
+    assert capsys.readouterr().out.startswith(
+        "warm 2021-04-01 to 2021-04-09 EUR,USD: "
+        "1 of 1 chunks, 0 failed, 10 rates, "
+    )
+    assert rate_lookup.query_rate("2021-04-09", "USD") == synthetic_rate(
+        "2021-04-09", "USD"
+    )
@@ -0,0 +1,165 @@
+from multiprocessing.sharedctypes import Synchronized
+from typing import cast
+import multiprocessing as mp
+import socket
+import threading
+import time
+
+from rates_app.connection_pool import (
+    SERVER_BUSY_MESSAGE,
+    ConnectionPool,
+    ConnectionStats,
+    ServerOptions,
+)
+from rates_app.metrics import ServerMetrics
+from rates_app.rate_cache import CacheStats, RateCache
+from rates_app.rate_lookup import RateLookup
+from rates_app.rates_server import ClientConnectionThread
+from rates_app.upstream_client import (
+    UpstreamClient,
+    UpstreamOptions,
+    UpstreamStats,
+)
+
+
+class FakeSocket:
+    """records what the pool does to a connection"""
+
+    def __init__(self) -> None:
+        self.sent = b""
+        self.timeout: float | None = None
+        self.closed = False
+        self.shut_down = False
+
+    def sendall(self, data: bytes) -> None:
+        self.sent += data
+
+    def settimeout(self, timeout: float | None) -> None:
+        self.timeout = timeout
+
+    def shutdown(self, how: int) -> None:
+        self.shut_down = True
+
+    def close(self) -> None:
+        self.closed = True
+
+
+def new_pool(
+    backlog_policy: str, idle_timeout_seconds: float | None = 300.0
+) -> ConnectionPool:
+    return ConnectionPool(
+        ServerOptions(
+            backlog_policy=backlog_policy,
+            queue_size=1,
+            idle_timeout_seconds=idle_timeout_seconds,
+        ),
+        ConnectionStats(),
+        cast(Synchronized, mp.Value("i", 0)),
+    )
+
+
+def serve(pool: ConnectionPool) -> FakeSocket:
+    return cast(FakeSocket, pool.next_connection())
+
+
+def admit(pool: ConnectionPool, conn: FakeSocket) -> None:
+    pool.admit(cast(socket.socket, conn))
+
+
+def test_queue_policy_waits_for_room() -> None:
+    pool = new_pool("queue")
+    first, second = FakeSocket(), FakeSocket()
+    admit(pool, first)
+
+    admitting = threading.Thread(target=admit, args=(pool, second))
+    admitting.start()
+    admitting.join(0.1)
+    assert admitting.is_alive()
+
+    assert serve(pool) is first
+    assert first.timeout == 300.0
+    admitting.join(5)
+    assert not admitting.is_alive()
+    assert serve(pool) is second
+    assert not second.closed
+    assert pool.stats.queued.value == 0
+    assert pool.stats.rejected.value == 0
+
+
+def test_reject_policy_answers_server_busy() -> None:
+    pool = new_pool("reject")
+    first, second = FakeSocket(), FakeSocket()
+    admit(pool, first)
+    admit(pool, second)
+
+    assert second.sent == SERVER_BUSY_MESSAGE
+    assert second.closed
+    assert not first.closed
+    assert pool.stats.rejected.value == 1
+    assert pool.stats.queued.value == 1
+
+
+def test_shed_policy_closes_the_oldest_idle_connection() -> None:
+    pool = new_pool("shed")
+    oldest, idle, waiting, new = (FakeSocket() for _ in range(4))
+    for conn in (oldest, idle):
+        admit(pool, conn)
+        serve(pool)
+        time.sleep(0.001)
+    admit(pool, waiting)
+
+    # the oldest connection is busy with a command, so the other one is shed
+    with pool.busy(cast(socket.socket, oldest)):
+        admitting = threading.Thread(target=admit, args=(pool, new))
+        admitting.start()
+        # the worker of the shed connection takes the next one
+        assert serve(pool) is waiting
+        admitting.join(5)
+
+    assert idle.shut_down
+    assert not oldest.shut_down
+    assert serve(pool) is new
+    assert pool.stats.shed.value == 1
+
+
+def test_shed_policy_waits_when_every_connection_is_busy() -> None:
+    pool = new_pool("shed")
+    busy, waiting, new = FakeSocket(), FakeSocket(), FakeSocket()
+    admit(pool, busy)
+    serve(pool)
+    admit(pool, waiting)
+
+    with pool.busy(cast(socket.socket, busy)):
+        admitting = threading.Thread(target=admit, args=(pool, new))
+        admitting.start()
+        admitting.join(0.1)
+        assert admitting.is_alive()
+        serve(pool)
+        admitting.join(5)
+
+    assert not busy.shut_down
+    assert pool.stats.shed.value == 0
+
+
+def test_idle_connection_times_out() -> None:
+    pool = new_pool("queue", idle_timeout_seconds=0.05)
+    counter = cast(Synchronized, mp.Value("i", 0))
+    ClientConnectionThread(
+        pool,
+        counter,
+        RateLookup(
+            RateCache(8, 60.0, CacheStats()),
+            UpstreamClient(UpstreamOptions(), UpstreamStats()),
+        ),
+        ServerMetrics(),
+    ).start()
+
+    client, server = socket.socketpair()
+    with client:
+        pool.admit(server)
+        assert client.recv(65536) == b"Connected to the Rates Server"
+        # the server closes the connection once it has been idle too long
+        client.settimeout(5)
+        assert client.recv(65536) == b""
+
+    assert pool.stats.timed_out.value == 1
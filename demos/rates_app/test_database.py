@@ -0,0 +1,36 @@
+from pathlib import Path
+import os
+
+import pytest
+
+from rates_app.database import (
+    DATABASE_PATH_VARIABLE,
+    SessionLocal,
+    engine,
+    use_database,
+)
+from rates_app.migrations import migrate_database
+from rates_app.models import ExchangeRate
+
+
+def test_use_database(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    database_path = tmp_path / "rates_app.sqlite3"
+    monkeypatch.delenv(DATABASE_PATH_VARIABLE, raising=False)
+
+    try:
+        migrate_database(use_database(str(database_path)))
+        with SessionLocal() as db_session:
+            db_session.add(
+                ExchangeRate(
+                    market_date="2021-04-08",
+                    currency_symbol="EUR",
+                    currency_rate=0.84,
+                )
+            )
+            db_session.commit()
+            assert db_session.query(ExchangeRate).count() == 1
+    finally:
+        SessionLocal.configure(bind=engine)
+
+    assert database_path.exists()
+    assert os.environ[DATABASE_PATH_VARIABLE] == str(database_path)
@@ -0,0 +1,58 @@
+from rates_app.metrics import LatencyHistogram, ServerMetrics
+
+
+def test_bucket_bounds_are_inclusive() -> None:
+    histogram = LatencyHistogram(buckets=(0.001, 0.01))
+    for seconds in (0.0005, 0.001, 0.005, 0.01, 0.5):
+        histogram.observe(seconds)
+
+    counts, total_seconds = histogram.snapshot()
+    assert counts == [2, 2, 1]
+    assert round(total_seconds, 6) == 0.5165
+    assert histogram.count() == 5
+
+
+def test_percentiles() -> None:
+    histogram = LatencyHistogram(buckets=(0.001, 0.01))
+    assert histogram.percentile(0.5) == 0.0
+
+    for seconds in [0.0005] * 98 + [0.005, 0.5]:
+        histogram.observe(seconds)
+
+    assert histogram.percentile(0.5) == 0.001
+    assert histogram.percentile(0.99) == 0.01
+    assert histogram.percentile(1.0) == float("inf")
+
+
+def test_prometheus_buckets_are_cumulative() -> None:
+    histogram = LatencyHistogram(buckets=(0.001, 0.01))
+    for seconds in (0.0005, 0.005, 0.5):
+        histogram.observe(seconds)
+
+    assert histogram.prometheus_lines("latency", 'stage="parse"') == [
+        'latency_bucket{stage="parse",le="0.001"} 1',
+        'latency_bucket{stage="parse",le="0.01"} 2',
+        'latency_bucket{stage="parse",le="+Inf"} 3',
+        'latency_sum{stage="parse"} 0.5055',
+        'latency_count{stage="parse"} 3',
+    ]
+
+
+def test_commands_finished_records_every_stage() -> None:
+    server_metrics = ServerMetrics()
+    server_metrics.commands_started(2)
+    server_metrics.commands_finished(
+        2,
+        [
+            ("parse", 0.00001),
+            ("upstream", 0.02),
+            ("upstream", 0.02),
+            ("command", 0.03),
+        ],
+    )
+
+    assert server_metrics.commands.value == 2
+    assert server_metrics.in_flight.value == 0
+    assert server_metrics.latency["parse"].snapshot()[0][0] == 1
+    assert server_metrics.latency["upstream"].count() == 2
+    assert server_metrics.latency["database"].count() == 0
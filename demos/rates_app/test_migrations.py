@@ -0,0 +1,73 @@
+from pathlib import Path
+
+from sqlalchemy import Engine, create_engine, inspect, text
+import pytest
+
+from rates_app.migrations import SCHEMA_VERSION, migrate_database
+
+
+@pytest.fixture
+def engine(tmp_path: Path) -> Engine:
+    return create_engine(f"sqlite:///{tmp_path / 'rates_app.sqlite3'}")
+
+
+def user_version(engine: Engine) -> int:
+    with engine.connect() as connection:
+        return int(
+            connection.execute(text("PRAGMA user_version")).scalar_one()
+        )
+
+
+def unique_indexes(engine: Engine) -> list[list[str | None]]:
+    return [
+        index["column_names"]
+        for index in inspect(engine).get_indexes("exchange_rates")
+        if index["unique"]
+    ]
+
+
+def test_new_database(engine: Engine) -> None:
+    migrate_database(engine)
+
+    assert user_version(engine) == SCHEMA_VERSION
+    assert unique_indexes(engine) == [["market_date", "currency_symbol"]]
+
+
+def test_existing_database_is_upgraded(engine: Engine) -> None:
+    # the table as created before the schema was versioned
+    with engine.begin() as connection:
+        connection.execute(
+            text(
+                "CREATE TABLE exchange_rates (id INTEGER PRIMARY KEY, "
+                "market_date VARCHAR NOT NULL, "
+                "currency_symbol VARCHAR NOT NULL, "
+                "currency_rate FLOAT NOT NULL)"
+            )
+        )
+        connection.execute(
+            text(
+                "INSERT INTO exchange_rates "
+                "(market_date, currency_symbol, currency_rate) VALUES "
+                "('2021-04-07', 'USD', 1.19), "
+                "('2021-04-07', 'USD', 1.5), "
+                "('2021-04-07', 'JPY', 130.0)"
+            )
+        )
+
+    migrate_database(engine)
+    # running it again leaves the upgraded database alone
+    migrate_database(engine)
+
+    assert user_version(engine) == SCHEMA_VERSION
+    assert unique_indexes(engine) == [["market_date", "currency_symbol"]]
+    with engine.connect() as connection:
+        rows = connection.execute(
+            text(
+                "SELECT market_date, currency_symbol, currency_rate "
+                "FROM exchange_rates ORDER BY id"
+            )
+        ).all()
+    assert [tuple(row) for row in rows] == [
+        ("2021-04-07", "USD", 1.19),
+        ("2021-04-07", "JPY", 130.0),
+    ]
@@ -0,0 +1,54 @@
+import time
+
+from rates_app.rate_cache import CacheStats, RateCache
+
+
+def test_least_recently_used_is_evicted() -> None:
+    rate_cache = RateCache(2, 60.0, CacheStats())
+    rate_cache.put(("2021-04-07", "USD"), 1.19)
+    rate_cache.put(("2021-04-08", "USD"), 1.1873)
+    assert rate_cache.get(("2021-04-07", "USD")) == 1.19
+    rate_cache.put(("2021-04-09", "USD"), 1.1888)
+
+    assert rate_cache.get(("2021-04-08", "USD")) is None
+    assert rate_cache.get(("2021-04-07", "USD")) == 1.19
+    assert len(rate_cache) == 2
+    assert str(rate_cache.stats) == (
+        "2 hits, 1 misses, 1 evictions, 66.7% hit ratio"
+    )
+
+
+def test_expired_rate_is_stale() -> None:
+    rate_cache = RateCache(2, 0.0, CacheStats())
+    rate_cache.put(("2021-04-07", "USD"), 1.19)
+    time.sleep(0.001)
+
+    assert rate_cache.get(("2021-04-07", "USD")) is None
+    assert rate_cache.get_stale(("2021-04-07", "USD")) == 1.19
+
+
+def test_clear_empties_caches_sharing_the_stats() -> None:
+    cache_stats = CacheStats()
+    rate_cache = RateCache(2, 60.0, cache_stats)
+    other_cache = RateCache(2, 60.0, cache_stats)
+    rate_cache.put(("2021-04-07", "USD"), 1.19)
+    other_cache.put(("2021-04-07", "USD"), 1.19)
+
+    rate_cache.clear()
+
+    assert len(rate_cache) == 0
+    assert other_cache.get_stale(("2021-04-07", "USD")) is None
+
+
+def test_clear_reaches_a_cache_in_another_process() -> None:
+    cache_stats = CacheStats()
+    rate_cache = RateCache(2, 60.0, cache_stats)
+    # what a server process unpickles, the settings and the shared stats
+    other_cache = RateCache.__new__(RateCache)
+    other_cache.__setstate__(rate_cache.__getstate__())
+    other_cache.put(("2021-04-07", "USD"), 1.19)
+
+    rate_cache.clear()
+
+    assert other_cache.get(("2021-04-07", "USD")) is None
+    assert len(other_cache) == 0
@@ -0,0 +1,37 @@
+import pytest
+
+from rates_app.rate_lookup import batch_cache_keys, resolve_market_date
+from rates_app.rates_commands import InvalidDateError, error_response
+
+
+def test_resolve_market_date_business_day() -> None:
+    assert resolve_market_date("2021-04-09") == "2021-04-09"
+
+
+def test_resolve_market_date_weekend() -> None:
+    assert resolve_market_date("2021-04-11") == "2021-04-09"
+
+
+@pytest.mark.parametrize(
+    "market_date", ["1989-12-29", "2051-01-03", "2021-02-30"]
+)
+def test_resolve_market_date_invalid(market_date: str) -> None:
+    with pytest.raises(InvalidDateError) as exc_info:
+        resolve_market_date(market_date)
+    assert error_response(exc_info.value) == "Invalid Date"
+
+
+def test_batch_cache_keys() -> None:
+    assert batch_cache_keys("2021-04-08:2021-04-12", "USD,JPY,USD") == [
+        ("2021-04-08", "USD"),
+        ("2021-04-08", "JPY"),
+        ("2021-04-09", "USD"),
+        ("2021-04-09", "JPY"),
+        ("2021-04-12", "USD"),
+        ("2021-04-12", "JPY"),
+    ]
+
+
+def test_batch_cache_keys_outside_calendar() -> None:
+    with pytest.raises(InvalidDateError):
+        batch_cache_keys("2049-01-03:2051-01-03", "USD")
@@ -0,0 +1,36 @@
+import gc
+import socket
+import threading
+import warnings
+
+import pytest
+
+from rates_app.connection_pool import SERVER_BUSY_MESSAGE
+from rates_app.rates_client import RatesConnection
+
+
+def test_busy_server_connection_is_closed() -> None:
+    with socket.create_server(("127.0.0.1", 0)) as busy_server:
+
+        def reject() -> None:
+            conn, _ = busy_server.accept()
+            with conn:
+                conn.sendall(SERVER_BUSY_MESSAGE)
+
+        rejecting = threading.Thread(target=reject)
+        rejecting.start()
+        with warnings.catch_warnings(record=True) as caught_warnings:
+            warnings.simplefilter("always", ResourceWarning)
+            with pytest.raises(OSError):
+                RatesConnection(
+                    "127.0.0.1", busy_server.getsockname()[1], timeout=5
+                )
+            gc.collect()
+        rejecting.join()
+
+    # an unclosed socket warns when it is collected
+    assert not [
+        caught_warning
+        for caught_warning in caught_warnings
+        if issubclass(caught_warning.category, ResourceWarning)
+    ]
@@ -0,0 +1,78 @@
+import pytest
+
+from rates_app.rate_lookup import (
+    batch_cache_keys,
+    batch_rates,
+    max_batch_rates,
+    rates_api_batch_path,
+)
+from rates_app.rates_commands import (
+    BatchTooLargeError,
+    InvalidCommandError,
+    InvalidCommandNameError,
+    batch_response,
+    error_response,
+    is_batch_command,
+    parse_client_command,
+)
+
+
+def test_parse_batch_command() -> None:
+    assert parse_client_command("GET 2021-04-01:2021-04-08 EUR,JPY") == (
+        "GET",
+        "2021-04-01:2021-04-08",
+        "EUR,JPY",
+    )
+    assert is_batch_command("2021-04-01:2021-04-08", "EUR")
+    assert is_batch_command("2021-04-08", "EUR,JPY")
+    assert not is_batch_command("2021-04-08", "EUR")
+
+
+@pytest.mark.parametrize(
+    "command, error",
+    [
+        ("GET 2021-04-08 EUR,", InvalidCommandError),
+        ("GET 2021-04-08: EUR", InvalidCommandError),
+        ("PUT 2021-04-08 EUR", InvalidCommandNameError),
+    ],
+)
+def test_parse_invalid_command(
+    command: str, error: type[Exception]
+) -> None:
+    with pytest.raises(error):
+        parse_client_command(command)
+
+
+def test_batch_limit() -> None:
+    # 2021 has 258 ECB business days, 19 symbols are within the limit and
+    # 20 are not
+    symbols = [f"US{letter}" for letter in "ABCDEFGHIJKLMNOPQRST"]
+    assert len(
+        batch_cache_keys("2021-01-01:2021-12-31", ",".join(symbols[:19]))
+    ) == 258 * 19
+
+    with pytest.raises(BatchTooLargeError) as exc_info:
+        batch_cache_keys("2021-01-01:2021-12-31", ",".join(symbols))
+    assert str(max_batch_rates) in str(exc_info.value)
+    assert error_response(exc_info.value) == "Batch Too Large"
+
+
+def test_batch_path_and_response() -> None:
+    cache_keys = batch_cache_keys("2021-04-08:2021-04-09", "USD,JPY")
+    assert rates_api_batch_path(cache_keys) == (
+        "/api/range?start=2021-04-08&end=2021-04-09&base=USD&symbols=USD,JPY"
+    )
+
+    rates = batch_rates(
+        cache_keys,
+        {
+            "rates": {
+                "2021-04-08": {"USD": 1.0, "JPY": 109.25},
+                "2021-04-09": {"USD": 1.0},
+            }
+        },
+    )
+    assert batch_response(cache_keys, rates, include_dates=True) == (
+        "2021-04-08 USD: 1.0, 2021-04-08 JPY: 109.25, "
+        "2021-04-09 USD: 1.0, 2021-04-09 JPY: N/A"
+    )
@@ -0,0 +1,40 @@
+import pytest
+
+from rates_app.rates_protocol import CommandFramer, FrameTooLargeError
+
+
+def test_original_protocol_is_one_command_per_recv() -> None:
+    framer = CommandFramer()
+
+    assert framer.commands(b"GET 2021-04-08 EUR") == ["GET 2021-04-08 EUR"]
+    assert framer.encode(["EUR: 0.84"]) == b"EUR: 0.84"
+
+
+def test_pipelined_commands() -> None:
+    framer = CommandFramer()
+
+    assert framer.commands(
+        b"PROTOCOL 2\nGET 2021-04-08 EUR\r\nGET 2021-04-08 JPY\n"
+    ) == ["PROTOCOL 2", "GET 2021-04-08 EUR", "GET 2021-04-08 JPY"]
+    assert framer.framed
+    assert framer.encode(["OK", "EUR: 0.84"]) == b"OK\nEUR: 0.84\n"
+
+
+def test_partial_command_waits_for_the_rest() -> None:
+    framer = CommandFramer()
+    framer.commands(b"PROTOCOL 2\n")
+
+    assert framer.commands(b"GET 2021-04-08 EUR\nGET 2021") == [
+        "GET 2021-04-08 EUR"
+    ]
+    assert framer.commands(b"-04-08 JPY") == []
+    assert framer.commands(b"\n\n") == ["GET 2021-04-08 JPY"]
+
+
+def test_frame_too_large() -> None:
+    framer = CommandFramer(max_frame_size=16)
+    framer.commands(b"PROTOCOL 2\n")
+
+    assert framer.commands(b"x" * 16) == []
+    with pytest.raises(FrameTooLargeError):
+        framer.commands(b"x")
@@ -0,0 +1,176 @@
+from collections.abc import Callable
+from multiprocessing.sharedctypes import Synchronized
+from pathlib import Path
+from typing import cast
+import multiprocessing as mp
+import socket
+import time
+
+import pytest
+
+from rates_app.connection_pool import ConnectionStats, ServerOptions
+from rates_app.metrics import ServerMetrics
+from rates_app.rate_cache import CacheStats, RateCache
+from rates_app.rates_server import (
+    command_client_count,
+    command_server_stats,
+    command_start_server,
+    command_stop_server,
+    parse_start_args,
+)
+from rates_app.upstream_client import (
+    UpstreamClient,
+    UpstreamOptions,
+    UpstreamStats,
+)
+from rates_app.upstream_stub import UpstreamStubServer, synthetic_rate
+
+
+@pytest.fixture
+def rate_cache() -> RateCache:
+    return RateCache(10_000, 3600.0, CacheStats())
+
+
+def test_start_defaults(rate_cache: RateCache) -> None:
+    server_options = ServerOptions()
+
+    assert parse_start_args([], server_options, rate_cache) == (
+        "thread",
+        1,
+        server_options,
+        rate_cache,
+    )
+
+
+def test_start_options(rate_cache: RateCache) -> None:
+    server_mode, process_count, server_options, start_cache = (
+        parse_start_args(
+            [
+                "async",
+                "2",
+                "policy=shed",
+                "workers=8",
+                "queue=16",
+                "cache=500",
+                "ttl=0.5",
+            ],
+            ServerOptions(),
+            rate_cache,
+        )
+    )
+
+    assert (server_mode, process_count) == ("async", 2)
+    assert server_options.backlog_policy == "shed"
+    assert server_options.max_connections == 8
+    assert server_options.queue_size == 16
+    assert (start_cache.max_size, start_cache.ttl_seconds) == (500, 0.5)
+    # clearing the default cache still clears the started one
+    assert start_cache.stats is rate_cache.stats
+
+
+@pytest.mark.parametrize(
+    "start_arg",
+    [
+        "policy=drop",
+        "workers=0",
+        "queue=many",
+        "cache=-1",
+        "ttl=0",
+        "ttl=soon",
+        "size=8",
+    ],
+)
+def test_invalid_start_option(start_arg: str, rate_cache: RateCache) -> None:
+    with pytest.raises(ValueError):
+        parse_start_args([start_arg], ServerOptions(), rate_cache)
+
+
+def connect(port: int) -> socket.socket:
+    """connect once a server process listens on the port"""
+
+    deadline = time.monotonic() + 10.0
+    while True:
+        try:
+            return socket.create_connection(("127.0.0.1", port), 5.0)
+        except ConnectionRefusedError:
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(0.05)
+
+
+def wait_for(condition: Callable[[], bool]) -> None:
+    deadline = time.monotonic() + 5.0
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+def test_server_processes_share_the_counters(
+    rates_database: Path,
+    upstream_stub: UpstreamStubServer,
+    rate_cache: RateCache,
+    capsys: pytest.CaptureFixture[str],
+) -> None:
+    with socket.socket() as free_socket:
+        free_socket.bind(("127.0.0.1", 0))
+        port = free_socket.getsockname()[1]
+    counter = cast(Synchronized, mp.Value("i", 0))
+    server_metrics = ServerMetrics()
+    upstream_client = UpstreamClient(
+        UpstreamOptions(
+            base_url=f"http://127.0.0.1:{upstream_stub.server_address[1]}"
+        ),
+        UpstreamStats(),
+    )
+
+    server_processes = command_start_server(
+        [],
+        "127.0.0.1",
+        port,
+        counter,
+        rate_cache,
+        upstream_client,
+        server_metrics,
+        ServerOptions(max_connections=8),
+        ConnectionStats(),
+        process_count=2,
+    )
+    try:
+        assert len(server_processes) == 2
+        clients = [connect(port) for _ in range(6)]
+        for client in clients:
+            assert client.recv(65536) == b"Connected to the Rates Server"
+            client.sendall(b"GET 2021-04-08 EUR")
+            assert client.recv(65536) == (
+                f"EUR: {synthetic_rate('2021-04-08', 'EUR')}".encode()
+            )
+
+        # the kernel spreads the clients across both processes, the count
+        # is the same whichever process answers it
+        clients[-1].sendall(b"count")
+        assert clients[-1].recv(65536) == b"6 connected clients"
+        # a command is counted as finished after its reply is sent
+        wait_for(lambda: server_metrics.in_flight.value == 0)
+        capsys.readouterr()
+        command_client_count(counter)
+        command_server_stats(
+            server_metrics, counter, rate_cache.stats, upstream_client.stats
+        )
+        stats_output = capsys.readouterr().out
+        assert "6 connected clients\n" in stats_output
+        assert "commands: 7 total" in stats_output
+        assert rate_cache.stats.hits.value + rate_cache.stats.misses.value == 6
+
+        for client in clients:
+            client.close()
+        wait_for(lambda: counter.value == 0)
+    finally:
+        assert command_stop_server(server_processes) == []
+
+    assert not any(
+        server_process.is_alive() for server_process in server_processes
+    )
+    assert all(
+        server_process.exitcode is not None
+        for server_process in server_processes
+    )
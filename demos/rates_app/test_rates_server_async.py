@@ -0,0 +1,247 @@
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from multiprocessing.sharedctypes import Synchronized
+from pathlib import Path
+from typing import Any, Iterator, cast
+import asyncio
+import multiprocessing as mp
+import threading
+
+import pytest
+
+from rates_app.connection_pool import (
+    SERVER_BUSY_MESSAGE,
+    ConnectionStats,
+    ServerOptions,
+)
+from rates_app.metrics import ServerMetrics
+from rates_app.rate_cache import CacheStats, RateCache
+from rates_app.rate_lookup import RateLookup
+from rates_app.rates_server_async import (
+    AsyncConnectionAdmission,
+    AsyncRateLookup,
+    HTTPStatusError,
+    decode_chunked,
+    handle_client,
+    http_get_json,
+)
+from rates_app.upstream_client import (
+    UpstreamClient,
+    UpstreamOptions,
+    UpstreamStats,
+)
+from rates_app.upstream_stub import UpstreamStubServer, synthetic_rate
+
+
+class JsonHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self) -> None:
+        body = b'{"date": "2021-04-08", "rates": {"EUR": 0.84}}'
+        self.close_connection = True
+        if self.path == "/missing":
+            self.send_response(404)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        if self.path == "/chunked":
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            for chunk in (body[:10], body[10:]):
+                self.wfile.write(b"%x\r\n%s\r\n" % (len(chunk), chunk))
+            self.wfile.write(b"0\r\n\r\n")
+        else:
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    def log_message(self, format: str, *args: object) -> None:
+        pass
+
+
+@pytest.fixture
+def json_server_url() -> Iterator[str]:
+    with ThreadingHTTPServer(("127.0.0.1", 0), JsonHandler) as json_server:
+        threading.Thread(target=json_server.serve_forever, daemon=True).start()
+        yield f"http://127.0.0.1:{json_server.server_address[1]}"
+        json_server.shutdown()
+
+
+class FakeWriter:
+    """the parts of asyncio.StreamWriter used by the admission control"""
+
+    def __init__(self) -> None:
+        self.written = b""
+        self.closed = False
+
+    def write(self, data: bytes) -> None:
+        self.written += data
+
+    def close(self) -> None:
+        self.closed = True
+
+
+def new_counter() -> Synchronized:
+    return cast(Synchronized, mp.Value("i", 0))
+
+
+def test_decode_chunked() -> None:
+    assert (
+        decode_chunked(b"4\r\nWiki\r\n6;name=value\r\npedia \r\n0\r\n\r\n")
+        == b"Wikipedia "
+    )
+
+
+@pytest.mark.parametrize("path", ["/plain", "/chunked"])
+def test_http_get_json(json_server_url: str, path: str) -> None:
+    assert asyncio.run(http_get_json(json_server_url + path)) == {
+        "date": "2021-04-08",
+        "rates": {"EUR": 0.84},
+    }
+
+
+def test_http_get_json_status(json_server_url: str) -> None:
+    with pytest.raises(HTTPStatusError) as exc_info:
+        asyncio.run(http_get_json(json_server_url + "/missing"))
+    assert exc_info.value.status == 404
+
+
+def test_concurrent_lookups_share_one_load(
+    rates_database: Path, upstream_stub: UpstreamStubServer
+) -> None:
+    upstream_stub.options.latency_seconds = 0.05
+    upstream_client = UpstreamClient(
+        UpstreamOptions(
+            base_url=f"http://127.0.0.1:{upstream_stub.server_address[1]}"
+        ),
+        UpstreamStats(),
+    )
+    rate_lookup = RateLookup(
+        RateCache(100, 60.0, CacheStats()), upstream_client
+    )
+
+    async def lookups() -> list[float]:
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            async_lookup = AsyncRateLookup(rate_lookup, executor)
+            return await asyncio.gather(
+                *(async_lookup.get_rate("2021-04-08", "JPY") for _ in range(8))
+            )
+
+    assert asyncio.run(lookups()) == [synthetic_rate("2021-04-08", "JPY")] * 8
+    assert upstream_client.stats.latency.count() == 1
+    # the load stored the rate, a later lookup is answered from the database
+    assert rate_lookup.query_rate("2021-04-08", "JPY") == synthetic_rate(
+        "2021-04-08", "JPY"
+    )
+
+
+def test_admission_limits() -> None:
+    async def admissions() -> None:
+        connection_stats = ConnectionStats()
+        admission = AsyncConnectionAdmission(
+            ServerOptions(
+                max_connections=1, backlog_policy="queue", queue_size=1
+            ),
+            connection_stats,
+        )
+        writers = [FakeWriter() for _ in range(3)]
+
+        assert await admission.admit(cast(Any, writers[0]))
+        # no slot is free, the second connection waits for one
+        waiting = asyncio.ensure_future(admission.admit(cast(Any, writers[1])))
+        await asyncio.sleep(0)
+        assert not waiting.done()
+        assert connection_stats.queued.value == 1
+
+        # the queue is full, the third connection is turned away
+        assert not await admission.admit(cast(Any, writers[2]))
+        assert writers[2].written == SERVER_BUSY_MESSAGE
+        assert writers[2].closed
+        assert connection_stats.rejected.value == 1
+
+        admission.release(cast(Any, writers[0]))
+        assert await waiting
+        assert connection_stats.queued.value == 0
+
+    asyncio.run(admissions())
+
+
+def test_handle_client() -> None:
+    counter = new_counter()
+    rate_cache = RateCache(100, 60.0, CacheStats())
+    rate_cache.put(("2021-04-08", "EUR"), 0.84)
+    rate_cache.put(("2021-04-08", "JPY"), 109.25)
+    server_metrics = ServerMetrics()
+
+    async def session() -> None:
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            rate_lookup = AsyncRateLookup(
+                RateLookup(
+                    rate_cache,
+                    UpstreamClient(UpstreamOptions(), UpstreamStats()),
+                ),
+                executor,
+            )
+            admission = AsyncConnectionAdmission(
+                ServerOptions(), ConnectionStats()
+            )
+            handlers: list[asyncio.Task[None]] = []
+
+            def start_handler(
+                reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+            ) -> None:
+                handlers.append(
+                    asyncio.ensure_future(
+                        handle_client(
+                            reader,
+                            writer,
+                            counter,
+                            rate_lookup,
+                            server_metrics,
+                            admission,
+                        )
+                    )
+                )
+
+            server = await asyncio.start_server(start_handler, "127.0.0.1", 0)
+            port = server.sockets[0].getsockname()[1]
+            async with server:
+                reader, writer = await asyncio.open_connection(
+                    "127.0.0.1", port
+                )
+                welcome = await reader.read(65536)
+                assert welcome == b"Connected to the Rates Server"
+
+                # the original protocol, one command per send
+                writer.write(b"GET 2021-04-08 EUR")
+                assert await reader.read(65536) == b"EUR: 0.84"
+
+                # pipelined commands, the last one in two parts
+                writer.write(
+                    b"PROTOCOL 2\nGET 2021-04-08 JPY\ncount\nGET 2021-04-0"
+                )
+                replies = b""
+                while replies.count(b"\n") < 3:
+                    replies += await reader.read(65536)
+                assert replies == b"OK\nJPY: 109.25\n1 connected clients\n"
+
+                writer.write(b"8 EUR\nGET 2021-04-08 EUR,JPY\n")
+                replies = b""
+                while replies.count(b"\n") < 2:
+                    replies += await reader.read(65536)
+                assert replies == b"EUR: 0.84\nEUR: 0.84, JPY: 109.25\n"
+
+                # the client goes away without an exit command
+                writer.close()
+                await writer.wait_closed()
+                await asyncio.wait_for(handlers[0], 5)
+
+    asyncio.run(session())
+
+    assert counter.value == 0
+    # PROTOCOL 2 and count are commands too
+    assert server_metrics.commands.value == 6
+    assert server_metrics.in_flight.value == 0
@@ -0,0 +1,55 @@
+from concurrent.futures import ThreadPoolExecutor
+import threading
+
+import pytest
+
+from rates_app.single_flight import SingleFlight
+
+
+def test_concurrent_calls_share_one_call() -> None:
+    single_flight: SingleFlight[str, float] = SingleFlight()
+    calls = 0
+    release = threading.Event()
+
+    def load() -> float:
+        nonlocal calls
+        calls += 1
+        release.wait(5)
+        return 1.19
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        futures = [
+            executor.submit(single_flight.do, "USD", load) for _ in range(8)
+        ]
+        # give the waiting threads time to join the leader's call
+        threading.Event().wait(0.1)
+        release.set()
+        results = [future.result() for future in futures]
+
+    assert results == [1.19] * 8
+    assert calls == 1
+
+
+def test_error_is_raised_to_every_caller() -> None:
+    single_flight: SingleFlight[str, float] = SingleFlight()
+    release = threading.Event()
+
+    def load() -> float:
+        release.wait(5)
+        raise LookupError("no rate")
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        futures = [
+            executor.submit(single_flight.do, "USD", load) for _ in range(4)
+        ]
+        threading.Event().wait(0.1)
+        release.set()
+        for future in futures:
+            with pytest.raises(LookupError):
+                future.result()
+
+
+def test_next_call_runs_again() -> None:
+    single_flight: SingleFlight[str, int] = SingleFlight()
+    assert single_flight.do("USD", lambda: 1) == 1
+    assert single_flight.do("USD", lambda: 2) == 2
@@ -0,0 +1,123 @@
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import logging
+import socket
+import time
+
+import pytest
+
+from rates_app.rate_cache import CacheStats, RateCache
+from rates_app.rate_lookup import RateLookup, response_rate
+from rates_app.rates_commands import error_response
+from rates_app.rates_server_async import AsyncRateLookup
+from rates_app.upstream_client import (
+    CircuitBreaker,
+    UpstreamClient,
+    UpstreamClientError,
+    UpstreamOptions,
+    UpstreamStats,
+    UpstreamUnavailableError,
+)
+from rates_app.upstream_stub import UpstreamStubServer
+
+
+def test_circuit_transitions() -> None:
+    circuit_breaker = CircuitBreaker(2, 0.05)
+
+    circuit_breaker.record_failure()
+    assert circuit_breaker.state == "closed"
+    assert circuit_breaker.allow_request()
+    circuit_breaker.record_failure()
+    assert circuit_breaker.state == "open"
+    assert not circuit_breaker.allow_request()
+
+    # one trial request after the reset timeout, a failed trial opens the
+    # circuit again
+    time.sleep(0.06)
+    assert circuit_breaker.allow_request()
+    assert circuit_breaker.state == "half-open"
+    assert not circuit_breaker.allow_request()
+    circuit_breaker.record_failure()
+    assert circuit_breaker.state == "open"
+    assert not circuit_breaker.allow_request()
+
+    # a successful trial closes it
+    time.sleep(0.06)
+    assert circuit_breaker.allow_request()
+    circuit_breaker.record_success()
+    assert circuit_breaker.state == "closed"
+    assert circuit_breaker.allow_request()
+
+
+def test_success_resets_the_failure_count() -> None:
+    circuit_breaker = CircuitBreaker(2, 30.0)
+
+    circuit_breaker.record_failure()
+    circuit_breaker.record_success()
+    circuit_breaker.record_failure()
+
+    assert circuit_breaker.state == "closed"
+
+
+def test_open_circuit_fails_fast() -> None:
+    # a port nothing listens on
+    with socket.socket() as unused_socket:
+        unused_socket.bind(("127.0.0.1", 0))
+        port = unused_socket.getsockname()[1]
+
+    upstream_client = UpstreamClient(
+        UpstreamOptions(
+            base_url=f"http://127.0.0.1:{port}", failure_threshold=1
+        ),
+        UpstreamStats(),
+    )
+
+    for _ in range(2):
+        with pytest.raises(UpstreamUnavailableError):
+            upstream_client.get_json("/api/2021-04-08")
+
+    assert upstream_client.circuit_breaker.state == "open"
+    assert upstream_client.stats.failures.value == 1
+    assert upstream_client.stats.fast_failures.value == 1
+
+
+def test_client_error_is_not_a_failure(
+    upstream_stub: UpstreamStubServer, caplog: pytest.LogCaptureFixture
+) -> None:
+    upstream_client = UpstreamClient(
+        UpstreamOptions(
+            base_url=f"http://127.0.0.1:{upstream_stub.server_address[1]}",
+            failure_threshold=1,
+        ),
+        UpstreamStats(),
+    )
+
+    # the stub answers a date it cannot parse with a 400
+    with pytest.raises(UpstreamClientError) as exc_info:
+        upstream_client.get_json("/api/2021-13-01?base=USD&symbols=EUR")
+
+    assert upstream_client.circuit_breaker.state == "closed"
+    assert upstream_client.stats.failures.value == 0
+    with caplog.at_level(logging.INFO):
+        assert error_response(exc_info.value) == "Rate Not Found"
+    assert [record.levelno for record in caplog.records] == [logging.WARNING]
+
+    async def fetch() -> None:
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            await AsyncRateLookup(
+                RateLookup(RateCache(0, 0.0, CacheStats()), upstream_client),
+                executor,
+            ).fetch_json("/api/2021-13-01?base=USD&symbols=EUR")
+
+    with pytest.raises(UpstreamClientError):
+        asyncio.run(fetch())
+    assert upstream_client.circuit_breaker.state == "closed"
+
+
+def test_missing_currency_is_a_client_error() -> None:
+    with pytest.raises(UpstreamClientError):
+        response_rate(
+            {"date": "2021-04-08", "base": "USD", "rates": {}},
+            "2021-04-08",
+            "XYZ",
+        )
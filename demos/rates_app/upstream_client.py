@@ -0,0 +1,212 @@
+"""upstream client module
+
+The rate server downloads cache misses from the Rates API through one
+UpstreamClient per server process. Requests share a pool of keep-alive
+connections with separate connect and read timeouts, and a circuit breaker
+fails requests fast while the Rates API is unhealthy instead of tying up a
+thread per request until it times out.
+"""
+
+from dataclasses import dataclass
+from multiprocessing.sharedctypes import Synchronized
+from typing import Any, cast
+import multiprocessing as mp
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from rates_app.metrics import LatencyHistogram
+
+
+class UpstreamUnavailableError(Exception):
+    pass
+
+
+class UpstreamClientError(Exception):
+    """the Rates API answered, but has no rate for the request"""
+
+
+@dataclass
+class UpstreamOptions:
+    base_url: str = "http://127.0.0.1:8080"
+    pool_size: int = 16
+    connect_timeout_seconds: float = 2.0
+    read_timeout_seconds: float = 10.0
+    # consecutive failures that open the circuit
+    failure_threshold: int = 5
+    # how long the circuit stays open before a trial request is let through
+    reset_timeout_seconds: float = 30.0
+    # answer with an expired cache entry when the upstream is unavailable
+    serve_stale: bool = True
+
+
+class UpstreamStats:
+    """upstream counters shared by the server processes and the admin prompt"""
+
+    def __init__(self) -> None:
+        self.latency = LatencyHistogram()
+        self.failures: Synchronized = cast(Synchronized, mp.Value("q", 0))
+        self.fast_failures: Synchronized = cast(
+            Synchronized, mp.Value("q", 0)
+        )
+        self.stale: Synchronized = cast(Synchronized, mp.Value("q", 0))
+
+    @staticmethod
+    def increment(counter: Synchronized) -> None:
+        with counter.get_lock():
+            counter.value += 1
+
+    def __str__(self) -> str:
+        return (
+            f"{self.latency}, {self.failures.value} failures, "
+            f"{self.fast_failures.value} fast failures, "
+            f"{self.stale.value} stale rates served"
+        )
+
+
+class CircuitBreaker:
+    """closed, open and half-open circuit for one server process
+
+    After failure_threshold consecutive failures the circuit opens and
+    requests fail fast. Once reset_timeout_seconds have passed one trial
+    request is let through, its success closes the circuit and its failure
+    opens it again.
+    """
+
+    def __init__(
+        self, failure_threshold: int, reset_timeout_seconds: float
+    ) -> None:
+        self.failure_threshold = failure_threshold
+        self.reset_timeout_seconds = reset_timeout_seconds
+        self.__lock = threading.Lock()
+        self.__failures = 0
+        self.__opened_at: float | None = None
+        self.__trial_running = False
+
+    @property
+    def state(self) -> str:
+        with self.__lock:
+            if self.__opened_at is None:
+                return "closed"
+            if self.__trial_running:
+                return "half-open"
+            return "open"
+
+    def allow_request(self) -> bool:
+        with self.__lock:
+            if self.__opened_at is None:
+                return True
+            if (
+                self.__trial_running
+                or time.monotonic() - self.__opened_at
+                < self.reset_timeout_seconds
+            ):
+                return False
+            self.__trial_running = True
+            return True
+
+    def record_success(self) -> None:
+        with self.__lock:
+            self.__failures = 0
+            self.__opened_at = None
+            self.__trial_running = False
+
+    def record_failure(self) -> None:
+        with self.__lock:
+            self.__failures += 1
+            if (
+                self.__trial_running
+                or self.__failures >= self.failure_threshold
+            ):
+                self.__opened_at = time.monotonic()
+            self.__trial_running = False
+
+
+class UpstreamClient:
+    """pooled, thread-safe client of the Rates API
+
+    Only the options and the shared stats are passed to a new server
+    process, the session and the circuit breaker belong to the process.
+    """
+
+    def __init__(self, options: UpstreamOptions, stats: UpstreamStats) -> None:
+        self.options = options
+        self.stats = stats
+        self.__init_session()
+
+    def __init_session(self) -> None:
+        self.circuit_breaker = CircuitBreaker(
+            self.options.failure_threshold, self.options.reset_timeout_seconds
+        )
+        self.__session = requests.Session()
+        # pool_block keeps the number of upstream connections at pool_size
+        # when more threads than that miss the cache at once
+        adapter = HTTPAdapter(
+            pool_connections=1,
+            pool_maxsize=self.options.pool_size,
+            pool_block=True,
+        )
+        self.__session.mount("http://", adapter)
+        self.__session.mount("https://", adapter)
+
+    def __getstate__(self) -> dict[str, Any]:
+        return {"options": self.options, "stats": self.stats}
+
+    def __setstate__(self, state: dict[str, Any]) -> None:
+        self.__dict__.update(state)
+        self.__init_session()
+
+    def before_request(self) -> None:
+        """raise UpstreamUnavailableError while the circuit is open"""
+
+        if not self.circuit_breaker.allow_request():
+            UpstreamStats.increment(self.stats.fast_failures)
+            raise UpstreamUnavailableError("the Rates API circuit is open")
+
+    def after_request(self, started: float, failed: bool) -> None:
+        """record the latency and the outcome of a request"""
+
+        self.stats.latency.observe(time.perf_counter() - started)
+        if failed:
+            UpstreamStats.increment(self.stats.failures)
+            self.circuit_breaker.record_failure()
+        else:
+            self.circuit_breaker.record_success()
+
+    def get_json(self, path: str) -> Any:
+        """GET a JSON document from the Rates API
+
+        Connection errors, timeouts and 5xx responses count as upstream
+        failures and raise UpstreamUnavailableError. A 4xx response, such as
+        a date without rates, is the upstream working as intended, it raises
+        UpstreamClientError and is not a failure of the circuit.
+        """
+
+        self.before_request()
+
+        started = time.perf_counter()
+        try:
+            resp = self.__session.get(
+                self.options.base_url + path,
+                timeout=(
+                    self.options.connect_timeout_seconds,
+                    self.options.read_timeout_seconds,
+                ),
+            )
+        except requests.RequestException as exc:
+            self.after_request(started, failed=True)
+            raise UpstreamUnavailableError(str(exc)) from exc
+
+        self.after_request(started, failed=resp.status_code >= 500)
+        if resp.status_code >= 500:
+            raise UpstreamUnavailableError(
+                f"GET {path} returned HTTP status {resp.status_code}"
+            )
+        if resp.status_code >= 400:
+            raise UpstreamClientError(
+                f"GET {path} returned HTTP status {resp.status_code}"
+            )
+
+        return resp.json()
@@ -0,0 +1,146 @@
+"""upstream stub module
+
+A stand-in for the Rates API for load tests. It answers /api/<date> and
+/api/range like rates_api.rates_app, with synthetic rates that are the same
+for every run, after an injected latency. Failures can be injected too, to
+exercise the circuit breaker of the rate server.
+
+to run the stub, change into the `demos` folder, then
+run the following command:
+python -m rates_app.upstream_stub
+"""
+
+from dataclasses import dataclass
+from datetime import date
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any
+from urllib.parse import parse_qs, urlsplit
+from zlib import crc32
+import json
+import random
+import time
+
+from rates_api.business_days import get_calendar
+
+
+@dataclass
+class StubOptions:
+    latency_seconds: float = 0.0
+    # the latency is latency_seconds plus up to jitter_seconds
+    jitter_seconds: float = 0.0
+    # share of the requests answered with a 503
+    error_rate: float = 0.0
+
+
+def synthetic_rate(market_date: str, currency_symbol: str) -> float:
+    """a rate between 0.5 and 1.5, the same for every run"""
+
+    return 0.5 + crc32(f"{market_date} {currency_symbol}".encode()) / 2**32
+
+
+def synthetic_rates(
+    market_date: str, currency_symbols: list[str]
+) -> dict[str, float]:
+    return {
+        currency_symbol: synthetic_rate(market_date, currency_symbol)
+        for currency_symbol in currency_symbols
+    }
+
+
+class UpstreamStubServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128
+
+    def __init__(self, host: str, port: int, options: StubOptions) -> None:
+        super().__init__((host, port), UpstreamStubHandler)
+        self.options = options
+
+
+class UpstreamStubHandler(BaseHTTPRequestHandler):
+    # HTTP/1.1 keeps the connections of the pooled upstream client open
+    protocol_version = "HTTP/1.1"
+    server: UpstreamStubServer
+
+    def do_GET(self) -> None:
+        options = self.server.options
+        time.sleep(
+            options.latency_seconds + random.random() * options.jitter_seconds
+        )
+        if random.random() < options.error_rate:
+            self.send_json(503, {"error": "injected failure"})
+            return
+
+        url_parts = urlsplit(self.path)
+        query = {
+            name: values[0]
+            for name, values in parse_qs(url_parts.query).items()
+        }
+        currency_symbols = query.get("symbols", "EUR").split(",")
+
+        try:
+            if url_parts.path == "/check":
+                self.send_json(200, {"status": "ok"})
+            elif url_parts.path == "/api/range":
+                self.send_json(
+                    200, self.range_document(query, currency_symbols)
+                )
+            elif url_parts.path.startswith("/api/"):
+                market_date = url_parts.path.removeprefix("/api/")
+                date.fromisoformat(market_date)
+                self.send_json(
+                    200,
+                    {
+                        "date": market_date,
+                        "base": query.get("base", "EUR"),
+                        "rates": synthetic_rates(
+                            market_date, currency_symbols
+                        ),
+                    },
+                )
+            else:
+                self.send_json(404, {"error": "not found"})
+        except (KeyError, ValueError):
+            self.send_json(400, {"error": "bad request"})
+
+    def range_document(
+        self, query: dict[str, str], currency_symbols: list[str]
+    ) -> dict[str, Any]:
+        market_dates = (
+            get_calendar("ECB")
+            .date_range(
+                date.fromisoformat(query["start"]),
+                date.fromisoformat(query["end"]),
+            )
+            .tolist()
+        )
+        return {
+            "start": query["start"],
+            "end": query["end"],
+            "base": query.get("base", "EUR"),
+            "rates": {
+                market_date: synthetic_rates(market_date, currency_symbols)
+                for market_date in market_dates
+            },
+        }
+
+    def send_json(self, status: int, document: dict[str, Any]) -> None:
+        body = json.dumps(document).encode("UTF-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args: object) -> None:
+        # one line per request would dominate a load test
+        pass
+
+
+def upstream_stub(host: str, port: int, options: StubOptions) -> None:
+    with UpstreamStubServer(host, port, options) as stub_server:
+        print(f"upstream stub is listening on {host}:{port}")
+        stub_server.serve_forever()
+
+
+if __name__ == "__main__":
+    upstream_stub("127.0.0.1", 8080, StubOptions(latency_seconds=0.02))